@@ -0,0 +1,168 @@
+"""
+Multi-city sequencing: choose the order in which cities are visited
+"""
+
+import numpy as np
+from data.city_data import CityDistanceMatrix
+from algorithms.route_solvers import held_karp_path, path_length
+
+class CitySequencer:
+    """Order cities to minimise total travel time between them."""
+    
+    def __init__(self, city_matrix, exact_limit=10, max_iterations=1000):
+        """
+        Initialize the city sequencer.
+        
+        Args:
+            city_matrix (CityDistanceMatrix): Precomputed distances and travel
+                times between every pair of cities
+            exact_limit (int): Largest number of cities sequenced exactly
+            max_iterations (int): Maximum number of 2-opt moves for larger trips
+        """
+        self.city_matrix = city_matrix
+        self.travel_times = city_matrix.travel_times
+        self.exact_limit = exact_limit
+        self.max_iterations = max_iterations
+    
+    @classmethod
+    def from_cities(cls, cities_data, **kwargs):
+        """
+        Build a sequencer with a precomputed travel-time matrix for all cities.
+        
+        Args:
+            cities_data (list): List of city dictionaries
+            **kwargs: Passed on to the constructor
+        
+        Returns:
+            CitySequencer: The sequencer
+        """
+        return cls(CityDistanceMatrix(cities_data), **kwargs)
+    
+    def sequence(self, city_indices, start_city=None, end_city=None):
+        """
+        Order cities so that the total travel time of the trip is minimal.
+        
+        Exact (Held-Karp) for up to exact_limit cities; nearest neighbour
+        followed by 2-opt for larger trips.
+        
+        Args:
+            city_indices (list): Indices of the cities to visit
+            start_city (int): City index the trip must start in, or None
+            end_city (int): City index the trip must end in, or None
+        
+        Returns:
+            list: City indices in visiting order
+        """
+        cities = list(dict.fromkeys(city_indices))
+        if len(cities) <= 1:
+            return cities
+        
+        # Fixed endpoints only apply if the city is actually visited
+        start = cities.index(start_city) if start_city in cities else None
+        end = cities.index(end_city) if end_city in cities else None
+        if start is not None and start == end:
+            end = None
+        
+        times = self.travel_times[np.ix_(cities, cities)]
+        
+        if len(cities) <= self.exact_limit:
+            order = held_karp_path(times, start=start, end=end)
+        else:
+            order = self._heuristic_order(times, start, end)
+        
+        return [cities[i] for i in order]
+    
+    def total_travel_time(self, sequence):
+        """
+        Calculate the total travel time of a city sequence.
+        
+        Args:
+            sequence (list): City indices in visiting order
+        
+        Returns:
+            float: Travel time in hours
+        """
+        return path_length(self.travel_times, sequence)
+    
+    def _heuristic_order(self, times, start, end):
+        """
+        Nearest neighbour construction and 2-opt, keeping fixed endpoints in place.
+        
+        Args:
+            times (numpy.ndarray): Travel-time matrix of the cities to order
+            start (int): Local index of the fixed first city, or None
+            end (int): Local index of the fixed last city, or None
+        
+        Returns:
+            list: Local indices in visiting order
+        """
+        n = len(times)
+        if start is not None:
+            starts = [start]
+        else:
+            # Starting at the fixed end city would leave it first, not last
+            starts = [first for first in range(n) if first != end]
+        
+        best_order, best_length = None, float('inf')
+        for first in starts:
+            order = self._nearest_neighbour(times, first, end)
+            length = path_length(times, order)
+            if length < best_length:
+                best_order, best_length = order, length
+        
+        # 2-opt over the interior (travel times are symmetric, so reversing
+        # a segment only changes its two boundary edges); fixed endpoints never move
+        lo = 1 if start is not None else 0
+        hi = n - 2 if end is not None else n - 1
+        order = best_order
+        moves = 0
+        improved = True
+        while improved and moves < self.max_iterations:
+            improved = False
+            for i in range(lo, hi):
+                for j in range(i + 1, hi + 1):
+                    delta = 0.0
+                    if i > 0:
+                        delta += times[order[i - 1], order[j]] - times[order[i - 1], order[i]]
+                    if j < n - 1:
+                        delta += times[order[i], order[j + 1]] - times[order[j], order[j + 1]]
+                    if delta < -1e-9:
+                        order[i:j + 1] = order[i:j + 1][::-1]
+                        moves += 1
+                        improved = True
+                        break
+                if improved:
+                    break
+        
+        return order
+    
+    @staticmethod
+    def _nearest_neighbour(times, first, end):
+        """
+        Build a nearest-neighbour order, saving the fixed end city for last.
+        
+        Args:
+            times (numpy.ndarray): Travel-time matrix
+            first (int): Local index of the first city
+            end (int): Local index of the fixed last city, or None
+        
+        Returns:
+            list: Local indices in visiting order
+        """
+        n = len(times)
+        visited = np.zeros(n, dtype=bool)
+        visited[first] = True
+        if end is not None:
+            visited[end] = True
+        
+        order = [first]
+        current = first
+        while not visited.all():
+            row = np.where(visited, np.inf, times[current])
+            current = int(np.argmin(row))
+            visited[current] = True
+            order.append(current)
+        
+        if end is not None and end != first:
+            order.append(end)
+        return order
@@ -0,0 +1,181 @@
+"""
+Lazily computed, memory-bounded distance matrices for route planning
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from data.city_data import CityDataHelper
+from utils.tracing import span
+
+class LazyDistanceMatrices:
+    """
+    Compute per-city distance matrices on demand and keep them in an LRU cache.
+    
+    The cache may be shared by threads planning different cities at once.
+    """
+    
+    def __init__(self, cities_data, max_bytes=256 * 1024 * 1024, method='haversine',
+                 dtype=np.float64):
+        """
+        Initialize the lazy distance matrices.
+        
+        Args:
+            cities_data (list): List of city dictionaries
+            max_bytes (int): Memory ceiling for all cached full-city matrices
+            method (str): Distance formula, 'haversine' or 'equirectangular'
+            dtype (numpy.dtype): dtype of the distance matrices
+        """
+        self.cities_data = cities_data
+        self.max_bytes = max_bytes
+        self.method = method
+        self.dtype = dtype
+        
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        
+        self._matrices = OrderedDict()  # city_idx -> full distance matrix
+        self._coordinates = {}  # city_idx -> (coords, valid)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+    
+    def __getstate__(self):
+        """Pickle without the lock (planning worker processes get a copy)."""
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+    
+    def __setstate__(self, state):
+        """Restore a pickled copy with a new lock."""
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def __contains__(self, city_idx):
+        """Check whether a distance matrix exists for the city (it has attractions)."""
+        return (0 <= city_idx < len(self.cities_data) and
+                bool(self.cities_data[city_idx].get('attractions')))
+    
+    def __getitem__(self, city_idx):
+        """Get the full distance matrix of a city, computing it if needed."""
+        matrix = self.get(city_idx)
+        if matrix is None:
+            raise KeyError(city_idx)
+        return matrix
+    
+    def get(self, city_idx, default=None):
+        """
+        Get the full distance matrix of a city, computing it on first access.
+        
+        Args:
+            city_idx (int): City index
+            default: Value returned if the city has no attractions
+            
+        Returns:
+            numpy.ndarray: (n, n) distance matrix in kilometers
+        """
+        if city_idx not in self:
+            return default
+        
+        with self._lock:
+            matrix = self._matrices.get(city_idx)
+            if matrix is not None:
+                self.hits += 1
+                self._matrices.move_to_end(city_idx)
+                return matrix
+            self.misses += 1
+        
+        coords, valid = self._get_coordinates(city_idx)
+        with span('distance_matrices.compute', items=len(coords)):
+            matrix = CityDataHelper.calculate_masked_distance_matrix(
+                coords, valid, method=self.method, dtype=self.dtype
+            )
+        with self._lock:
+            self._store(city_idx, matrix)
+        return matrix
+    
+    def get_submatrix(self, city_idx, attraction_indices):
+        """
+        Get distances between a subset of a city's attractions.
+        
+        The sub-matrix is sliced from the full matrix if that is already
+        cached; otherwise only the requested pairs are computed.
+        
+        Args:
+            city_idx (int): City index
+            attraction_indices (list): Indices of attractions within the city
+            
+        Returns:
+            numpy.ndarray: (k, k) distance matrix in kilometers, or None if the
+                city has no attractions
+        """
+        if city_idx not in self:
+            return None
+        
+        indices = np.asarray(attraction_indices, dtype=np.intp)
+        with self._lock:
+            matrix = self._matrices.get(city_idx)
+            if matrix is not None:
+                self.hits += 1
+                self._matrices.move_to_end(city_idx)
+        if matrix is not None:
+            return matrix[np.ix_(indices, indices)]
+        
+        coords, valid = self._get_coordinates(city_idx)
+        return CityDataHelper.calculate_masked_distance_matrix(
+            coords[indices], valid[indices], method=self.method, dtype=self.dtype
+        )
+    
+    def nbytes(self):
+        """
+        Get the memory used by cached full-city matrices.
+        
+        Returns:
+            int: Size in bytes
+        """
+        return self._nbytes
+    
+    def clear(self):
+        """Drop all cached matrices."""
+        with self._lock:
+            self._matrices.clear()
+            self._nbytes = 0
+    
+    def _get_coordinates(self, city_idx):
+        """
+        Get (and memoize) the coordinate array and validity mask of a city.
+        
+        Args:
+            city_idx (int): City index
+            
+        Returns:
+            numpy.ndarray: (n, 2) array of (lat, lng) in degrees
+            numpy.ndarray: Boolean mask of attractions with a valid location
+        """
+        if city_idx not in self._coordinates:
+            attractions = self.cities_data[city_idx]['attractions']
+            self._coordinates[city_idx] = CityDataHelper.get_attraction_coordinates(attractions)
+        return self._coordinates[city_idx]
+    
+    def _store(self, city_idx, matrix):
+        """
+        Add a matrix to the LRU cache, evicting the oldest ones if over budget.
+        
+        Called with the lock held.
+        
+        Args:
+            city_idx (int): City index
+            matrix (numpy.ndarray): Full distance matrix of the city
+        """
+        if matrix.nbytes > self.max_bytes or city_idx in self._matrices:
+            # Too large to keep (or stored meanwhile); the caller still gets the matrix
+            return
+        
+        self._matrices[city_idx] = matrix
+        self._nbytes += matrix.nbytes
+        
+        while self._nbytes > self.max_bytes:
+            _, evicted = self._matrices.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+            self.evictions += 1
@@ -3,12 +3,27 @@ Itinerary optimization module
 """
 
 import numpy as np
-from data.city_data import CityDataHelper
+from data.attraction_store import AttractionStore
+from algorithms.preference_scorer import PreferenceScorer
+from algorithms.city_sequencer import CitySequencer
+from utils.tracing import traced
+
+# Ways of allocating a trip's days across cities
+ALLOCATORS = ('dp', 'greedy')
 
 class ItineraryOptimizer:
     """Optimize the allocation of days across multiple cities."""
     
-    def __init__(self, cities_data, similarity_matrices, preferences, pace):
+    # Value of each further day in a city relative to the day before
+    DAY_VALUE_DECAY = 0.85
+    # Value of a day left once a city's attractions are all seen, relative to a full day
+    IDLE_DAY_VALUE = 0.1
+    # Sightseeing hours in a day
+    HOURS_PER_DAY = 8.0
+    
+    def __init__(self, cities_data, similarity_matrices, preferences, pace,
+                 city_sequencer=None, attraction_store=None, preference_scorer=None,
+                 preference_candidates=None, candidates_per_city=5, allocator='dp'):
         """
         Initialize the itinerary optimizer.
         
@@ -17,11 +32,35 @@ class ItineraryOptimizer:
             similarity_matrices (dict): Dictionary mapping city indices to similarity matrices
             preferences (list): User preferences
             pace (str): Travel pace (relaxed, moderate, fast)
+            city_sequencer (CitySequencer): Sequencer shared with the route planner,
+                so travel days are budgeted for the order actually travelled
+            attraction_store (AttractionStore): Columnar attraction data for
+                cities_data (looked up or built if None)
+            preference_scorer (PreferenceScorer): Scorer shared with the
+                route planner (created if None)
+            preference_candidates (dict): City index -> (rows, scores) of the
+                attractions retrieved from a vector index for the preferences
+                (see SemanticSimilarityCalculator.retrieve_candidates). When
+                given, cities are scored by these semantic matches instead of
+                by category matching.
+            candidates_per_city (int): Best candidates averaged into a city's score
+            allocator (str): 'dp' (optimal allocation within the day budget,
+                transition days included) or 'greedy' (score-proportional
+                allocation, the previous behaviour; may exceed the budget)
         """
+        if allocator not in ALLOCATORS:
+            raise ValueError(f"Unknown allocator: {allocator}. "
+                             f"Valid allocators: {', '.join(ALLOCATORS)}")
+        self.allocator = allocator
         self.cities_data = cities_data
+        self.attraction_store = attraction_store or AttractionStore.from_cities(cities_data)
+        self.preference_scorer = preference_scorer or PreferenceScorer(self.attraction_store)
+        self.preference_candidates = preference_candidates
+        self.candidates_per_city = candidates_per_city
         self.similarity_matrices = similarity_matrices
         self.preferences = preferences
         self.pace = pace
+        self.city_sequencer = city_sequencer or CitySequencer.from_cities(cities_data)
         
         # Set visit duration multipliers based on pace
         self.pace_multipliers = {
@@ -30,12 +69,16 @@ class ItineraryOptimizer:
             'fast': 0.8       # Less time per attraction
         }
     
-    def allocate_days(self, total_days):
+    @traced('itinerary_optimizer.allocate_days', items='total_days')
+    def allocate_days(self, total_days, start_city=None, end_city=None, exclude_cities=None):
         """
         Allocate available days across cities.
         
         Args:
             total_days (int): Total number of days available
+            start_city (int): Index of the city the trip must start in, or None
+            end_city (int): Index of the city the trip must end in, or None
+            exclude_cities (list): Indices of cities that must not be visited
             
         Returns:
             dict: Number of days allocated to each city
@@ -43,14 +86,52 @@ class ItineraryOptimizer:
         # Calculate city scores based on multiple factors
         city_scores = self._calculate_city_scores()
         
+        # Excluded cities get no share of the days
+        for city_idx in exclude_cities or ():
+            city_scores[city_idx] = 0.0
+        
+        if self.allocator == 'dp':
+            return self._allocate_optimally(city_scores, total_days, start_city, end_city)
+        
         # Initial allocation based on city scores
-        raw_allocations = self._get_raw_allocations(city_scores, total_days)
+        raw_allocations = self._get_raw_allocations(city_scores, total_days, exclude_cities)
         
         # Refine allocations to ensure minimum stays and handle travel days
-        final_allocations = self._refine_allocations(raw_allocations, total_days)
+        final_allocations = self._refine_allocations(
+            raw_allocations, total_days, start_city, end_city
+        )
         
         return final_allocations
     
+    def extend_allocation(self, city_allocation, extra_days):
+        """
+        Add days to the cities of an existing allocation.
+        
+        Each extra day goes to the city whose next day is worth the most
+        (see _day_values); no city is added or shortened.
+        
+        Args:
+            city_allocation (dict): Number of days allocated to each city
+            extra_days (int): Days to add
+        
+        Returns:
+            dict: Number of days allocated to each city
+        """
+        allocation = dict(city_allocation)
+        if not allocation or extra_days <= 0:
+            return allocation
+        
+        values = self._day_values(
+            self._calculate_city_scores(), max(allocation.values()) + extra_days
+        )
+        for _ in range(extra_days):
+            city_idx = max(
+                allocation,
+                key=lambda idx: values[idx, allocation[idx] + 1] - values[idx, allocation[idx]]
+            )
+            allocation[city_idx] += 1
+        return allocation
+    
     def _calculate_city_scores(self):
         """
         Calculate scores for each city based on importance, attractions, and preferences.
@@ -85,45 +166,148 @@ class ItineraryOptimizer:
         Returns:
             float: Score from 0-1
         """
-        city = self.cities_data[city_idx]
-        attractions = city['attractions']
+        if self.preference_candidates is not None:
+            # Mean score of the city's best semantic matches; missing ones count as 0
+            _, scores = self.preference_candidates.get(city_idx, (None, np.zeros(0)))
+            return float(np.sum(scores[:self.candidates_per_city])) / self.candidates_per_city
         
-        if not attractions or not self.preferences:
-            return 0.5  # Neutral score if no attractions or preferences
+        # Fraction of the city's attractions matching any preference, computed
+        # for all cities at once from the category inverted index
+        return float(self.preference_scorer.city_scores(self.preferences)[city_idx])
+    
+    def _day_values(self, city_scores, max_days):
+        """
+        Value of spending 0 to max_days days in each city.
         
-        # Count matches between attraction categories and preferences
-        matching_score = 0
-        max_possible = len(attractions)
+        The d-th day in a city is worth score * DAY_VALUE_DECAY ** (d - 1), cut
+        to IDLE_DAY_VALUE of that once the city's attraction hours (at the
+        trip's pace) are used up, so every value curve is concave.
         
-        for attraction in attractions:
-            categories = [cat.lower() for cat in attraction.get('categories', [])]
-            for preference in self.preferences:
-                if preference.lower() in categories:
-                    matching_score += 1
-                    break  # Count each attraction only once
+        Args:
+            city_scores (list): List of scores for each city
+            max_days (int): Most days spent in one city
         
-        # Normalize score
-        if max_possible > 0:
-            return matching_score / max_possible
-        else:
-            return 0
+        Returns:
+            numpy.ndarray: (num_cities, max_days + 1) cumulative values
+        """
+        store = self.attraction_store
+        hours = np.bincount(
+            store.city_ids, weights=store.duration_hours, minlength=len(self.cities_data)
+        )
+        content_days = hours * self.pace_multipliers.get(self.pace, 1.0) / self.HOURS_PER_DAY
+        
+        day = np.arange(1, max_days + 1)
+        filled = np.clip(content_days[:, np.newaxis] - (day - 1), 0, 1)
+        marginal = (np.asarray(city_scores, dtype=np.float64)[:, np.newaxis]
+                    * self.DAY_VALUE_DECAY ** (day - 1)
+                    * np.maximum(filled, self.IDLE_DAY_VALUE))
+        
+        values = np.zeros((len(self.cities_data), max_days + 1))
+        np.cumsum(marginal, axis=1, out=values[:, 1:])
+        return values
+    
+    def _allocate_optimally(self, city_scores, total_days, start_city=None, end_city=None):
+        """
+        Allocate days to maximise the total value of the cities visited.
+        
+        Every leg between two cities takes one transition day, as in
+        RoutePlanner.create_itinerary, so a trip through k cities costs its
+        city days plus k - 1 transition days. Charging each city its days
+        plus one and allowing total_days + 1 makes the allocation exact and
+        never longer than total_days. The start and end cities are always
+        visited, unless both do not fit (then only the start city is).
+        
+        Args:
+            city_scores (list): List of scores for each city (0 = not visited)
+            total_days (int): Total days available, transition days included
+            start_city (int): Index of the city the trip must start in, or None
+            end_city (int): Index of the city the trip must end in, or None
+        
+        Returns:
+            dict: Number of days allocated to each city
+        """
+        values = self._day_values(city_scores, total_days)
+        candidates = [city_idx for city_idx, score in enumerate(city_scores) if score > 0]
+        required = [
+            city_idx for city_idx in dict.fromkeys((start_city, end_city))
+            if city_idx is not None and city_scores[city_idx] > 0
+        ]
+        
+        # The first city is reached without a transition day, hence the extra day
+        while True:
+            allocation = self._solve_allocation(values, candidates, required, total_days + 1)
+            if allocation is not None or not required:
+                return allocation or {}
+            required.pop()
+    
+    def _solve_allocation(self, values, candidates, required, capacity):
+        """
+        Choose each city's days by dynamic programming over (city, days used).
+        
+        A grouped knapsack: visiting a city for d days costs d plus its
+        transition day and is worth values[city, d]. The optimum is exact and
+        takes O(cities * max days) vectorized steps over capacity.
+        
+        Args:
+            values (numpy.ndarray): (num_cities, max_days + 1) cumulative values
+            candidates (list): Indices of the cities that may be visited
+            required (list): Indices of the cities that must be visited
+            capacity (int): Total cost allowed
+        
+        Returns:
+            dict: Number of days allocated to each visited city, or None if
+                the required cities do not fit
+        """
+        best = np.full(capacity + 1, -np.inf)  # Best value by exact cost
+        best[0] = 0.0
+        choices = np.zeros((len(candidates), capacity + 1), dtype=np.int32)
+        
+        for position, city_idx in enumerate(candidates):
+            current = np.full_like(best, -np.inf) if city_idx in required else best.copy()
+            for days in range(1, min(values.shape[1] - 1, capacity - 1) + 1):
+                cost = days + 1
+                option = best[:-cost] + values[city_idx, days]
+                better = option > current[cost:]
+                current[cost:][better] = option[better]
+                choices[position, cost:][better] = days
+            best = current
+        
+        cost = int(np.argmax(best))
+        if best[cost] == -np.inf:
+            return None
+        
+        allocation = {}
+        for position in range(len(candidates) - 1, -1, -1):
+            days = int(choices[position, cost])
+            if days:
+                allocation[candidates[position]] = days
+                cost -= days + 1
+        return dict(sorted(allocation.items()))
     
-    def _get_raw_allocations(self, city_scores, total_days):
+    def _get_raw_allocations(self, city_scores, total_days, exclude_cities=None):
         """
         Get initial raw allocations of days based on scores.
         
         Args:
             city_scores (list): List of scores for each city
             total_days (int): Total days available
+            exclude_cities (list): Indices of cities that must not be visited
             
         Returns:
             dict: Raw allocation of days per city
         """
+        excluded = set(exclude_cities or ())
+        allowed = len(city_scores) - len(excluded)
+        if allowed <= 0:
+            return {}
+        
         # Normalize scores
         total_score = sum(city_scores)
         if total_score == 0:
-            # Equal distribution if all scores are 0
-            normalized_scores = [1.0/len(city_scores) for _ in city_scores]
+            # Equal distribution over the allowed cities if all scores are 0
+            normalized_scores = [
+                0.0 if i in excluded else 1.0/allowed for i in range(len(city_scores))
+            ]
         else:
             normalized_scores = [score/total_score for score in city_scores]
         
@@ -133,18 +317,22 @@ class ItineraryOptimizer:
         # Create allocation dictionary
         raw_allocations = {}
         for i, days in enumerate(fractional_days):
+            if i in excluded:
+                continue
             if days > 0.5:  # Only include cities with at least half a day allocated
                 raw_allocations[i] = days
         
         return raw_allocations
     
-    def _refine_allocations(self, raw_allocations, total_days):
+    def _refine_allocations(self, raw_allocations, total_days, start_city=None, end_city=None):
         """
         Refine raw allocations to ensure minimum stays and account for travel time.
         
         Args:
             raw_allocations (dict): Raw allocation of days per city
             total_days (int): Total days available
+            start_city (int): Index of the city the trip must start in, or None
+            end_city (int): Index of the city the trip must end in, or None
             
         Returns:
             dict: Final allocation of days per city
@@ -175,7 +363,8 @@ class ItineraryOptimizer:
             city_sequence.append(city_idx)
             remaining_days -= min_days
         
-        # Second pass: account for travel days
+        # Second pass: account for travel days along the route actually taken
+        city_sequence = self.city_sequencer.sequence(city_sequence, start_city, end_city)
         travel_days = self._calculate_travel_days(city_sequence)
         remaining_days -= travel_days
         
@@ -219,14 +408,8 @@ class ItineraryOptimizer:
         
         # Calculate travel time between consecutive cities
         for i in range(len(city_sequence) - 1):
-            city1 = self.cities_data[city_sequence[i]]
-            city2 = self.cities_data[city_sequence[i + 1]]
-            
-            # Calculate distance between cities
-            distance = CityDataHelper.calculate_distance_between_cities(city1, city2)
-            
-            # Estimate travel time
-            travel_time, _ = CityDataHelper.estimate_travel_time(distance)
+            # Precomputed travel time between consecutive cities
+            travel_time = self.city_sequencer.travel_times[city_sequence[i], city_sequence[i + 1]]
             
             # Convert to days (assuming 8 hours of effective travel per day)
             travel_days = travel_time / 8.0
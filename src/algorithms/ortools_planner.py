@@ -0,0 +1,126 @@
+"""
+OR-Tools engine that partitions a city's attractions into days and routes them jointly
+"""
+
+import importlib.util
+
+import numpy as np
+
+class OrToolsDayPlanner:
+    """
+    Model a city stay as a prize-collecting multi-vehicle routing problem.
+    
+    Each day is one vehicle whose capacity is the day's sightseeing hours,
+    attractions are optional stops whose drop penalty grows with their score,
+    and the objective is total walking distance plus penalties for skipped
+    attractions. Routes start and end at a virtual depot with zero distance to
+    every attraction, so each day is an open path.
+    """
+    
+    def __init__(self, time_limit=2.0, penalty_km_per_score=100.0):
+        """
+        Initialize the OR-Tools day planner.
+        
+        Args:
+            time_limit (float): Solver time limit in seconds
+            penalty_km_per_score (float): Walking distance (km) the solver may
+                add to keep an attraction with a score of 1.0 in the plan
+        """
+        self.time_limit = time_limit
+        self.penalty_km_per_score = penalty_km_per_score
+    
+    @staticmethod
+    def is_available():
+        """
+        Check whether OR-Tools can be imported.
+        
+        Returns:
+            bool: True if OR-Tools is installed
+        """
+        # OR-Tools is optional and slow to import, so only look for it here
+        # and import it when a plan is actually requested
+        try:
+            return importlib.util.find_spec('ortools') is not None
+        except ValueError:
+            return False
+    
+    def plan(self, distances, durations, scores, num_days, hours_per_day):
+        """
+        Split attractions into days and order each day.
+        
+        Args:
+            distances (numpy.ndarray): (n, n) distance matrix in kilometers
+            durations (list): Visit duration of each attraction in hours
+            scores (list): Score of each attraction (higher is more valuable)
+            num_days (int): Number of days (vehicles)
+            hours_per_day (float): Sightseeing hours available per day
+        
+        Returns:
+            list: One ordered list of attraction indices per day, or None if
+                OR-Tools is unavailable or found no solution in the time limit
+        """
+        if not self.is_available() or num_days <= 0 or len(durations) == 0:
+            return None
+        
+        try:
+            from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+        except ImportError:
+            return None
+        
+        n = len(durations)
+        depot = 0
+        
+        # Integer units: meters for distance, minutes for time
+        node_distances = np.zeros((n + 1, n + 1), dtype=np.int64)
+        node_distances[1:, 1:] = np.rint(np.asarray(distances, dtype=np.float64) * 1000)
+        node_distances = node_distances.tolist()
+        node_minutes = [0] + [int(round(duration * 60)) for duration in durations]
+        
+        manager = pywrapcp.RoutingIndexManager(n + 1, num_days, depot)
+        routing = pywrapcp.RoutingModel(manager)
+        
+        def distance_callback(from_index, to_index):
+            return node_distances[manager.IndexToNode(from_index)][manager.IndexToNode(to_index)]
+        
+        def time_callback(from_index):
+            return node_minutes[manager.IndexToNode(from_index)]
+        
+        distance_index = routing.RegisterTransitCallback(distance_callback)
+        routing.SetArcCostEvaluatorOfAllVehicles(distance_index)
+        
+        time_index = routing.RegisterUnaryTransitCallback(time_callback)
+        capacity = int(round(hours_per_day * 60))
+        # Allow a single long attraction to fill a day on its own
+        capacity = max(capacity, max(node_minutes))
+        routing.AddDimension(time_index, 0, capacity, True, 'Time')
+        
+        # Prize collecting: skipping an attraction costs its scaled score
+        for node in range(1, n + 1):
+            penalty = int(round(max(scores[node - 1], 0) * self.penalty_km_per_score * 1000))
+            routing.AddDisjunction([manager.NodeToIndex(node)], max(penalty, 1))
+        
+        search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+        search_parameters.first_solution_strategy = (
+            routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+        )
+        search_parameters.time_limit.FromMilliseconds(int(self.time_limit * 1000))
+        
+        # Any solution is feasible; one cut short by the time limit is still used
+        solution = routing.SolveWithParameters(search_parameters)
+        if solution is None:
+            return None
+        
+        days = []
+        for vehicle in range(num_days):
+            index = routing.Start(vehicle)
+            route = []
+            while not routing.IsEnd(index):
+                node = manager.IndexToNode(index)
+                if node != depot:
+                    route.append(node - 1)
+                index = solution.Value(routing.NextVar(index))
+            days.append(route)
+        
+        # Busiest days first, like the greedy grouping
+        days.sort(key=len, reverse=True)
+        return days
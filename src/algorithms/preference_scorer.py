@@ -0,0 +1,122 @@
+"""
+Vectorized matching of user preferences against attraction categories
+"""
+
+import numpy as np
+
+class PreferenceScorer:
+    """
+    Score every attraction of every city against a set of preferences at once.
+    
+    Matching uses the attraction store's category inverted index, so the cost
+    per preference is proportional to the number of attractions having that
+    category rather than to the size of the catalog.
+    """
+    
+    def __init__(self, attraction_store, cache_size=32):
+        """
+        Initialize the preference scorer.
+        
+        Args:
+            attraction_store (AttractionStore): Frozen columnar attraction data
+            cache_size (int): Number of recent preference lists whose results are kept
+        """
+        self.store = attraction_store
+        self.cache_size = cache_size
+        self._cache = {}
+        
+        self._city_sizes = np.diff(attraction_store.city_offsets)
+    
+    def match_counts(self, preferences):
+        """
+        Count how many preferences each attraction matches.
+        
+        A preference matches if it equals (case-insensitively) one of the
+        attraction's categories; repeated preferences count repeatedly.
+        
+        Args:
+            preferences (list): User preferences
+        
+        Returns:
+            numpy.ndarray: (n,) int array over all rows of the store
+        """
+        return self._cached('counts', preferences, self._match_counts)
+    
+    def attraction_scores(self, preferences):
+        """
+        Score attractions based on preferences and popularity.
+        
+        The score is 0.4 * popularity / 5 plus 0.6 * the fraction of
+        preferences matched (capped at 1, or 0.5 without preferences).
+        
+        Args:
+            preferences (list): User preferences
+        
+        Returns:
+            numpy.ndarray: (n,) float array over all rows of the store
+        """
+        return self._cached('attraction_scores', preferences, self._attraction_scores)
+    
+    def city_scores(self, preferences):
+        """
+        Score each city by the fraction of its attractions matching any preference.
+        
+        Cities without attractions, and every city when there are no
+        preferences, get a neutral 0.5.
+        
+        Args:
+            preferences (list): User preferences
+        
+        Returns:
+            numpy.ndarray: (num_cities,) float array
+        """
+        return self._cached('city_scores', preferences, self._city_scores)
+    
+    def _match_counts(self, preferences):
+        counts = np.zeros(len(self.store), dtype=np.int32)
+        for preference in preferences:
+            counts[self.store.category_rows(preference.lower())] += 1
+        return counts
+    
+    def _attraction_scores(self, preferences):
+        base_scores = self.store.popularity / 5.0
+        if preferences:
+            pref_scores = np.minimum(self.match_counts(preferences) / len(preferences), 1.0)
+        else:
+            pref_scores = 0.5  # Neutral if no preferences specified
+        return (base_scores * 0.4) + (pref_scores * 0.6)
+    
+    def _city_scores(self, preferences):
+        scores = np.full(len(self._city_sizes), 0.5)
+        if not preferences:
+            return scores
+        
+        matched = np.bincount(
+            self.store.city_ids, weights=self.match_counts(preferences) > 0,
+            minlength=len(self._city_sizes)
+        )
+        has_attractions = self._city_sizes > 0
+        scores[has_attractions] = matched[has_attractions] / self._city_sizes[has_attractions]
+        return scores
+    
+    def _cached(self, kind, preferences, compute):
+        """
+        Return a cached result for a preference list, computing it if needed.
+        
+        Args:
+            kind (str): Which result is requested
+            preferences (list): User preferences
+            compute (callable): Function computing the result from the preferences
+        
+        Returns:
+            numpy.ndarray: The result (shared; do not modify)
+        """
+        key = (kind, tuple(preferences or ()))
+        result = self._cache.get(key)
+        if result is None:
+            if len(self._cache) >= self.cache_size:
+                self._cache.pop(next(iter(self._cache)))
+            result = compute(list(preferences or ()))
+            result.flags.writeable = False
+            self._cache[key] = result
+        return result
@@ -2,31 +2,99 @@
 Route planning module for optimizing daily itineraries
 """
 
-import numpy as np
-from data.city_data import CityDataHelper
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from data.attraction_store import AttractionStore
+from algorithms.preference_scorer import PreferenceScorer
+from algorithms.distance_matrices import LazyDistanceMatrices
+from algorithms.route_solvers import BaseRouteSolver, get_route_solver
+from algorithms.ortools_planner import OrToolsDayPlanner
+from algorithms.city_sequencer import CitySequencer
+from utils.tracing import traced
+
+# Ways of planning the cities of an itinerary concurrently
+PARALLEL_MODES = ('thread', 'process')
+
+# Copy of the RoutePlanner used by a planning worker process
+_worker_planner = None
 
 class RoutePlanner:
     """Plan optimal routes for each day of the itinerary."""
     
-    def __init__(self, cities_data, similarity_matrices):
+    # Attractions per day relative to a moderate pace
+    PACE_MULTIPLIERS = {
+        'relaxed': 0.7,   # Fewer attractions per day
+        'moderate': 1.0,  # Standard number
+        'fast': 1.3       # More attractions per day
+    }
+    
+    def __init__(self, cities_data, similarity_matrices,
+                 distance_cache_bytes=256 * 1024 * 1024, route_solver='auto',
+                 route_max_iterations=1000, route_time_limit=0.05,
+                 day_engine='greedy', day_engine_time_limit=2.0, city_sequencer=None,
+                 distance_matrices=None, attraction_store=None, preference_scorer=None,
+                 executor=None):
         """
         Initialize the route planner.
         
         Args:
             cities_data (list): List of city dictionaries
             similarity_matrices (dict): Dictionary mapping city indices to similarity matrices
+            distance_cache_bytes (int): Memory ceiling for cached city distance matrices
+            route_solver (str or BaseRouteSolver): Solver used to order each day's
+                attractions (see algorithms.route_solvers.ROUTE_SOLVERS)
+            route_max_iterations (int): Iteration budget per day route
+            route_time_limit (float): Time budget in seconds per day route
+            day_engine (str): How attractions are split into days: 'greedy'
+                (by score and duration) or 'ortools' (joint partition and
+                routing, falling back to greedy on timeout)
+            day_engine_time_limit (float): OR-Tools time limit in seconds per city
+            city_sequencer (CitySequencer): Sequencer deciding the order of cities,
+                shared with the itinerary optimizer
+            distance_matrices (LazyDistanceMatrices): Distance matrices to share
+                with other planners over the same cities (created if None)
+            attraction_store (AttractionStore): Columnar attraction data for
+                cities_data (looked up or built if None)
+            preference_scorer (PreferenceScorer): Scorer shared with the
+                itinerary optimizer (created if None)
+            executor (concurrent.futures.Executor): Executor planning the cities
+                of an itinerary concurrently (see create_planning_executor), or
+                None to plan them one after another
         """
         self.cities_data = cities_data
+        self.attraction_store = attraction_store or AttractionStore.from_cities(cities_data)
+        self.preference_scorer = preference_scorer or PreferenceScorer(self.attraction_store)
         self.similarity_matrices = similarity_matrices
-        
-        # Calculate distance matrices for each city
-        self.distance_matrices = {}
-        for city_idx, city in enumerate(cities_data):
-            attractions = city.get('attractions', [])
-            if attractions:
-                self.distance_matrices[city_idx] = CityDataHelper.calculate_distances_between_attractions(attractions)
+        self.city_sequencer = city_sequencer or CitySequencer.from_cities(cities_data)
+        
+        if isinstance(route_solver, BaseRouteSolver):
+            self.route_solver = route_solver
+        else:
+            self.route_solver = get_route_solver(
+                route_solver, max_iterations=route_max_iterations,
+                time_limit=route_time_limit
+            )
+        # Tour lengths before/after solving, one entry per optimized day
+        self.route_stats = []
+        
+        if day_engine not in ('greedy', 'ortools'):
+            raise ValueError(f"Unknown day engine: {day_engine}")
+        if day_engine == 'ortools' and not OrToolsDayPlanner.is_available():
+            print("OR-Tools is not installed; using greedy day planning")
+            day_engine = 'greedy'
+        self.day_engine = day_engine
+        self.ortools_planner = OrToolsDayPlanner(time_limit=day_engine_time_limit)
+        
+        # Distance matrices are computed on first use, only for visited cities
+        self.distance_matrices = distance_matrices or LazyDistanceMatrices(
+            cities_data, max_bytes=distance_cache_bytes
+        )
+        self.executor = executor
     
-    def create_itinerary(self, city_allocation, preferences, pace):
+    @traced('route_planner.create_itinerary', items='city_allocation')
+    def create_itinerary(self, city_allocation, preferences, pace, start_city=None, end_city=None):
         """
         Create a complete day-by-day itinerary.
         
@@ -34,59 +102,128 @@ class RoutePlanner:
             city_allocation (dict): Number of days allocated to each city
             preferences (list): User preferences
             pace (str): Travel pace (relaxed, moderate, fast)
+            start_city (int): Index of the city the trip must start in, or None
+            end_city (int): Index of the city the trip must end in, or None
             
         Returns:
             list: List of daily itineraries
         """
-        # Determine pace multiplier
-        pace_multipliers = {
-            'relaxed': 0.7,   # Fewer attractions per day
-            'moderate': 1.0,  # Standard number
-            'fast': 1.3       # More attractions per day
-        }
-        pace_multiplier = pace_multipliers.get(pace, 1.0)
-        
         # Create empty itinerary
         itinerary = []
         current_day = 1
         
-        # Process cities in descending order of allocated days
-        sorted_allocation = sorted(
-            city_allocation.items(), 
-            key=lambda x: x[1], 
-            reverse=True
+        # Visit cities in the order that minimises travel time between them
+        city_sequence = self.city_sequencer.sequence(
+            list(city_allocation), start_city, end_city
         )
+        sorted_allocation = [(city_idx, city_allocation[city_idx]) for city_idx in city_sequence]
+        
+        # Cities are planned independently (possibly concurrently), then
+        # stitched together in visiting order
+        city_plans = self._plan_cities(sorted_allocation, preferences, pace)
         
         # Track city transitions
         prev_city_idx = None
         
-        for city_idx, num_days in sorted_allocation:
-            city = self.cities_data[city_idx]
-            
+        for (city_idx, _), daily_plans in zip(sorted_allocation, city_plans):
             # Handle transition between cities
             if prev_city_idx is not None:
-                prev_city = self.cities_data[prev_city_idx]
                 transition_day = self._create_transition_day(
-                    current_day, prev_city, city
+                    current_day, prev_city_idx, city_idx
                 )
                 itinerary.append(transition_day)
                 current_day += 1
             
-            # Create daily plans for this city
-            daily_plans = self._plan_city_days(
-                city_idx, int(num_days), preferences, pace_multiplier
-            )
-            
-            # Add daily plans to itinerary
-            for day_plan in daily_plans:
-                day_plan['day'] = current_day
-                itinerary.append(day_plan)
-                current_day += 1
+            for offset, day_plan in enumerate(daily_plans):
+                day_plan['day'] = current_day + offset
+            itinerary.extend(daily_plans)
+            current_day += len(daily_plans)
             
             prev_city_idx = city_idx
         
         return itinerary
     
+    def _plan_cities(self, allocation, preferences, pace):
+        """
+        Plan the days of several cities, concurrently if an executor is set.
+        
+        Args:
+            allocation (list): (city index, days) pairs in visiting order
+            preferences (list): User preferences
+            pace (str): Travel pace (relaxed, moderate, fast)
+        
+        Returns:
+            list: Unnumbered daily plans of each city, in the order of allocation
+        """
+        pace_multiplier = self.PACE_MULTIPLIERS.get(pace, 1.0)
+        tasks = [
+            (city_idx, int(num_days), preferences, pace_multiplier)
+            for city_idx, num_days in allocation
+        ]
+        if self.executor is None or len(tasks) < 2:
+            return [self._plan_city_days(*task) for task in tasks]
+        
+        if isinstance(self.executor, ProcessPoolExecutor):
+            city_plans = []
+            for daily_plans, route_stats in self.executor.map(_plan_city_in_worker, *zip(*tasks)):
+                city_plans.append(daily_plans)
+                self.route_stats.extend(route_stats)
+            return city_plans
+        
+        # Score every city once up front, so threads only read the shared cache
+        self.preference_scorer.attraction_scores(preferences)
+        first_stat = len(self.route_stats)
+        city_plans = list(self.executor.map(lambda task: self._plan_city_days(*task), tasks))
+        
+        # Threads record route stats as they finish; restore the visiting order
+        position = {city_idx: i for i, (city_idx, _) in enumerate(allocation)}
+        self.route_stats[first_stat:] = sorted(
+            self.route_stats[first_stat:], key=lambda entry: position[entry['city_idx']]
+        )
+        return city_plans
+    
+    def _worker_copy(self):
+        """
+        Copy the planner for a worker process.
+        
+        Similarities (unused for planning days), cached distance matrices,
+        route stats and the executor are left out.
+        
+        Returns:
+            RoutePlanner: Shallow copy to be pickled once per worker
+        """
+        worker = copy.copy(self)
+        worker.similarity_matrices = {}
+        worker.executor = None
+        worker.route_stats = []
+        worker.distance_matrices = LazyDistanceMatrices(
+            self.cities_data, max_bytes=self.distance_matrices.max_bytes,
+            method=self.distance_matrices.method, dtype=self.distance_matrices.dtype
+        )
+        return worker
+    
+    def plan_city(self, city_idx, num_days, preferences, pace, first_day=1):
+        """
+        Plan the days spent in one city, independently of the rest of the trip.
+        
+        Args:
+            city_idx (int): City index
+            num_days (int): Number of days allocated to this city
+            preferences (list): User preferences
+            pace (str): Travel pace (relaxed, moderate, fast)
+            first_day (int): Day number of the first day in the city
+        
+        Returns:
+            list: List of daily plans for this city, numbered from first_day
+        """
+        daily_plans = self._plan_city_days(
+            city_idx, int(num_days), preferences, self.PACE_MULTIPLIERS.get(pace, 1.0)
+        )
+        for offset, day_plan in enumerate(daily_plans):
+            day_plan['day'] = first_day + offset
+        return daily_plans
+    
+    @traced('route_planner.plan_city_days', items='num_days')
     def _plan_city_days(self, city_idx, num_days, preferences, pace_multiplier):
         """
         Plan daily itineraries for a specific city.
@@ -101,9 +238,10 @@ class RoutePlanner:
             list: List of daily plans for this city
         """
         city = self.cities_data[city_idx]
-        attractions = city['attractions']
+        store = self.attraction_store
+        first_row, end_row = store.city_range(city_idx)
         
-        if not attractions:
+        if first_row == end_row:
             # Return empty plans if no attractions
             return [{
                 'city': city['name'],
@@ -117,15 +255,95 @@ class RoutePlanner:
         
         # Sort attractions by score (descending)
         sorted_attractions = sorted(
-            zip(range(len(attractions)), attraction_scores),
+            zip(range(end_row - first_row), attraction_scores),
             key=lambda x: x[1],
             reverse=True
         )
         
         # Determine number of attractions to visit per day based on pace
-        total_duration = sum(attr['duration_hours'] for attr in attractions)
+        durations = store.duration_hours[first_row:end_row].tolist()
+        total_duration = sum(durations)
         avg_hours_per_day = 8.0 * pace_multiplier  # Base of 8 hours adjusted by pace
         
+        daily_groups = None
+        routed = False
+        if self.day_engine == 'ortools':
+            # Partition and route jointly; None means fall back to greedy
+            daily_groups = self._plan_days_with_ortools(
+                city_idx, attraction_scores, num_days, avg_hours_per_day
+            )
+            routed = daily_groups is not None
+        
+        if daily_groups is None:
+            daily_groups = self._group_attractions_greedy(
+                durations, sorted_attractions, num_days, avg_hours_per_day
+            )
+        
+        # Fill out days if we have more allocated than needed
+        while len(daily_groups) < num_days:
+            daily_groups.append([])
+        
+        # Second pass: optimize route for each day
+        optimized_plans = []
+        for group in daily_groups:
+            if not group:
+                # Empty day - free time
+                optimized_plans.append({
+                    'city': city['name'],
+                    'country': city['country'],
+                    'attractions': [],
+                    'meals': self._suggest_meals(city, [])
+                })
+                continue
+            
+            # Optimize the route for this group (OR-Tools days are already routed)
+            optimized_route = group if routed else self._optimize_daily_route(city_idx, group)
+            
+            # Create attraction list with timing
+            start_time = 9.0  # 9:00 AM
+            attraction_list = []
+            
+            for idx in optimized_route:
+                # Rows only become dictionaries here, in the day's output
+                attraction = store.to_dict(first_row + idx)
+                
+                # Format start and end times
+                end_time = start_time + durations[idx]
+                attraction['start_time'] = self._format_time(start_time)
+                attraction['end_time'] = self._format_time(end_time)
+                
+                # Add buffer for travel and rest
+                start_time = end_time + 0.5
+                
+                attraction_list.append(attraction)
+            
+            # Generate meal suggestions based on the day's attractions
+            meals = self._suggest_meals(city, attraction_list)
+            
+            # Add to optimized plans
+            optimized_plans.append({
+                'city': city['name'],
+                'country': city['country'],
+                'attractions': attraction_list,
+                'meals': meals
+            })
+        
+        return optimized_plans
+    
+    def _group_attractions_greedy(self, durations, sorted_attractions, num_days,
+                                  avg_hours_per_day):
+        """
+        Greedily split attractions into days by score and duration.
+        
+        Args:
+            durations (list): Visit duration in hours of each attraction in the city
+            sorted_attractions (list): (attraction index, score) pairs, best first
+            num_days (int): Number of days allocated to the city
+            avg_hours_per_day (float): Sightseeing hours available per day
+            
+        Returns:
+            list: Lists of attraction indices, one per day
+        """
         # Create attraction groups that fit within daily time limits
         daily_groups = []
         current_group = []
@@ -137,8 +355,7 @@ class RoutePlanner:
             suitable_found = False
             
             for i, attraction_idx in enumerate(remaining_attractions):
-                attraction = attractions[attraction_idx]
-                new_duration = current_duration + attraction['duration_hours']
+                new_duration = current_duration + durations[attraction_idx]
                 
                 # If this attraction fits in the current day, add it
                 if new_duration <= avg_hours_per_day:
@@ -158,7 +375,7 @@ class RoutePlanner:
                 elif remaining_attractions:
                     shortest_idx = min(
                         range(len(remaining_attractions)),
-                        key=lambda i: attractions[remaining_attractions[i]]['duration_hours']
+                        key=lambda i: durations[remaining_attractions[i]]
                     )
                     attraction_idx = remaining_attractions.pop(shortest_idx)
                     daily_groups.append([attraction_idx])
@@ -169,71 +386,51 @@ class RoutePlanner:
                 # We have days available, create a new day
                 shortest_idx = min(
                     range(len(remaining_attractions)),
-                    key=lambda i: attractions[remaining_attractions[i]]['duration_hours']
+                    key=lambda i: durations[remaining_attractions[i]]
                 )
                 attraction_idx = remaining_attractions.pop(shortest_idx)
                 daily_groups.append([attraction_idx])
             else:
                 # Add to existing days, trying to balance
                 daily_groups.sort(
-                    key=lambda group: sum(attractions[idx]['duration_hours'] for idx in group)
+                    key=lambda group: sum(durations[idx] for idx in group)
                 )
                 shortest_idx = min(
                     range(len(remaining_attractions)),
-                    key=lambda i: attractions[remaining_attractions[i]]['duration_hours']
+                    key=lambda i: durations[remaining_attractions[i]]
                 )
                 attraction_idx = remaining_attractions.pop(shortest_idx)
                 daily_groups[0].append(attraction_idx)
         
-        # Fill out days if we have more allocated than needed
-        while len(daily_groups) < num_days:
-            daily_groups.append([])
+        return daily_groups
+    
+    def _plan_days_with_ortools(self, city_idx, attraction_scores, num_days, avg_hours_per_day):
+        """
+        Split attractions into routed days with the OR-Tools engine.
         
-        # Second pass: optimize route for each day
-        optimized_plans = []
-        for group in daily_groups:
-            if not group:
-                # Empty day - free time
-                optimized_plans.append({
-                    'city': city['name'],
-                    'country': city['country'],
-                    'attractions': [],
-                    'meals': self._suggest_meals(city, [])
-                })
-                continue
-            
-            # Optimize the route for this group
-            optimized_route = self._optimize_daily_route(city_idx, group)
-            
-            # Create attraction list with timing
-            start_time = 9.0  # 9:00 AM
-            attraction_list = []
-            
-            for idx in optimized_route:
-                attraction = attractions[idx].copy()
-                
-                # Format start and end times
-                end_time = start_time + attraction['duration_hours']
-                attraction['start_time'] = self._format_time(start_time)
-                attraction['end_time'] = self._format_time(end_time)
-                
-                # Add buffer for travel and rest
-                start_time = end_time + 0.5
-                
-                attraction_list.append(attraction)
-            
-            # Generate meal suggestions based on the day's attractions
-            meals = self._suggest_meals(city, attraction_list)
+        Args:
+            city_idx (int): City index
+            attraction_scores (list): Score of each attraction
+            num_days (int): Number of days allocated to the city
+            avg_hours_per_day (float): Sightseeing hours available per day
             
-            # Add to optimized plans
-            optimized_plans.append({
-                'city': city['name'],
-                'country': city['country'],
-                'attractions': attraction_list,
-                'meals': meals
-            })
+        Returns:
+            list: Ordered lists of attraction indices, one per day, or None if
+                the engine is unavailable or hit its time limit
+        """
+        daily_groups = self.ortools_planner.plan(
+            self.distance_matrices[city_idx],
+            self.attraction_store.duration_hours[self.attraction_store.city_slice(city_idx)].tolist(),
+            attraction_scores,
+            num_days,
+            avg_hours_per_day
+        )
         
-        return optimized_plans
+        if daily_groups is None:
+            print(f"OR-Tools day planning unavailable or timed out for "
+                  f"{self.cities_data[city_idx]['name']}; using greedy grouping")
+        
+        return daily_groups
     
     def _score_attractions(self, city_idx, preferences):
         """
@@ -246,33 +443,11 @@ class RoutePlanner:
         Returns:
             list: Scores for each attraction
         """
-        city = self.cities_data[city_idx]
-        attractions = city['attractions']
-        
-        scores = []
-        for attraction in attractions:
-            # Base score from popularity
-            base_score = attraction.get('popularity', 3) / 5.0
-            
-            # Preference matching score
-            pref_score = 0
-            if preferences:
-                categories = [cat.lower() for cat in attraction.get('categories', [])]
-                for preference in preferences:
-                    if preference.lower() in categories:
-                        pref_score += 1
-                
-                # Normalize preference score
-                pref_score = min(pref_score / len(preferences), 1.0)
-            else:
-                pref_score = 0.5  # Neutral if no preferences specified
-            
-            # Combined score
-            final_score = (base_score * 0.4) + (pref_score * 0.6)
-            scores.append(final_score)
-        
-        return scores
+        # All cities are scored in one vectorized pass and cached per preferences
+        scores = self.preference_scorer.attraction_scores(preferences)
+        return scores[self.attraction_store.city_slice(city_idx)].tolist()
     
+    @traced('route_planner.optimize_daily_route', items='attraction_indices')
     def _optimize_daily_route(self, city_idx, attraction_indices):
         """
         Optimize the route for a day's attractions.
@@ -290,55 +465,43 @@ class RoutePlanner:
         if len(attraction_indices) <= 2:
             return attraction_indices
         
-        # Get distance matrix for the city
-        distance_matrix = self.distance_matrices.get(city_idx, None)
-        if distance_matrix is None:
+        # Get distances between just this day's attractions
+        sub_distances = self.distance_matrices.get_submatrix(city_idx, attraction_indices)
+        if sub_distances is None:
             return attraction_indices
-        
-        # Extract submatrix for our attractions
-        n = len(attraction_indices)
-        sub_distances = np.zeros((n, n))
-        
-        for i in range(n):
-            for j in range(n):
-                idx1 = attraction_indices[i]
-                idx2 = attraction_indices[j]
-                sub_distances[i, j] = distance_matrix[idx1][idx2]
-        
-        # Simple greedy algorithm for route optimization
-        # Start at the first attraction (index 0)
-        current = 0
-        unvisited = set(range(1, n))
-        route = [current]
-        
-        while unvisited:
-            # Find the closest unvisited attraction
-            next_idx = min(unvisited, key=lambda i: sub_distances[current, i])
-            route.append(next_idx)
-            unvisited.remove(next_idx)
-            current = next_idx
+        result = self.route_solver.solve(sub_distances)
+        self.route_stats.append({
+            'city_idx': city_idx,
+            'attractions': len(attraction_indices),
+            'solver': result['solver'],
+            'initial_length_km': result['initial_length'],
+            'final_length_km': result['final_length'],
+            'iterations': result['iterations']
+        })
         
         # Convert back to original attraction indices
-        optimized_route = [attraction_indices[i] for i in route]
+        optimized_route = [attraction_indices[i] for i in result['route']]
         return optimized_route
     
-    def _create_transition_day(self, day_num, from_city, to_city):
+    def _create_transition_day(self, day_num, from_city_idx, to_city_idx):
         """
         Create a transition day between cities.
         
         Args:
             day_num (int): Day number
-            from_city (dict): Departure city
-            to_city (dict): Arrival city
+            from_city_idx (int): Index of the departure city
+            to_city_idx (int): Index of the arrival city
             
         Returns:
             dict: Transition day details
         """
-        # Calculate distance between cities
-        distance = CityDataHelper.calculate_distance_between_cities(from_city, to_city)
+        from_city = self.cities_data[from_city_idx]
+        to_city = self.cities_data[to_city_idx]
         
-        # Estimate travel time and mode
-        travel_time, travel_mode = CityDataHelper.estimate_travel_time(distance)
+        # Precomputed distance, travel time and mode between the cities
+        city_matrix = self.city_sequencer.city_matrix
+        distance = city_matrix.distance(from_city_idx, to_city_idx)
+        travel_time, travel_mode = city_matrix.travel(from_city_idx, to_city_idx)
         
         # Create transition day information
         transition_day = {
@@ -450,4 +613,56 @@ class RoutePlanner:
         """
         hours = int(time_hours)
         minutes = int((time_hours - hours) * 60)
-        return f"{hours:02d}:{minutes:02d}"
\ No newline at end of file
+        return f"{hours:02d}:{minutes:02d}"
+
+
+def create_planning_executor(route_planner, mode='thread', workers=None):
+    """
+    Create an executor for planning the cities of an itinerary concurrently.
+    
+    Threads share the planner's caches, but the pure-Python route solvers
+    mostly hold the GIL. Worker processes run truly in parallel; each gets
+    a copy of route_planner (catalog, scorer and route options) once, when
+    the pool starts, so the executor can serve every RoutePlanner over the
+    same catalog and options.
+    
+    Args:
+        route_planner (RoutePlanner): Planner whose state worker processes copy
+        mode (str): 'thread' or 'process'
+        workers (int): Number of workers, or None for the executor default
+    
+    Returns:
+        concurrent.futures.Executor: Executor for RoutePlanner(executor=...)
+    
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='plan-city')
+    if mode == 'process':
+        # Spawned (not forked) workers are safe to start from a threaded service
+        return ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker, initargs=(route_planner._worker_copy(),)
+        )
+    raise ValueError(f"Unknown parallel mode: {mode}. "
+                     f"Valid modes: {', '.join(PARALLEL_MODES)}")
+
+def _init_worker(route_planner):
+    """Keep the route planner copy of a new worker process."""
+    global _worker_planner
+    _worker_planner = route_planner
+
+def _plan_city_in_worker(city_idx, num_days, preferences, pace_multiplier):
+    """
+    Plan one city's days in a worker process.
+    
+    Returns:
+        list: Unnumbered daily plans of the city
+        list: Route stats recorded while planning them
+    """
+    _worker_planner.route_stats = []
+    daily_plans = _worker_planner._plan_city_days(
+        city_idx, num_days, preferences, pace_multiplier
+    )
+    return daily_plans, _worker_planner.route_stats
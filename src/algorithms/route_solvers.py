@@ -0,0 +1,579 @@
+"""
+Route solvers for ordering a day's attractions
+
+All solvers work on open paths (a day does not return to its first attraction)
+over a symmetric distance matrix, and report the path length before and after
+solving so callers can see what the optimization bought.
+"""
+
+import time
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+def path_length(distances, route):
+    """
+    Calculate the length of an open path.
+    
+    Args:
+        distances (numpy.ndarray): Square distance matrix
+        route (list): Order in which the nodes are visited
+    
+    Returns:
+        float: Sum of the distances between consecutive nodes
+    """
+    if len(route) < 2:
+        return 0.0
+    route = np.asarray(route, dtype=np.intp)
+    return float(np.sum(distances[route[:-1], route[1:]]))
+
+def nearest_neighbours(distances, k):
+    """
+    Build neighbour lists of the k closest nodes for every node.
+    
+    Args:
+        distances (numpy.ndarray): Square distance matrix
+        k (int): Number of neighbours per node
+    
+    Returns:
+        list: For each node, a list of its nearest nodes (closest first)
+    """
+    n = len(distances)
+    k = min(k, n - 1)
+    if k <= 0:
+        return [[] for _ in range(n)]
+    
+    masked = np.array(distances, dtype=np.float64, copy=True)
+    np.fill_diagonal(masked, np.inf)
+    nearest = np.argpartition(masked, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(masked, nearest, axis=1).argsort(axis=1)
+    return np.take_along_axis(nearest, order, axis=1).tolist()
+
+def held_karp_path(distances, start=None, end=None, deadline=None):
+    """
+    Find the shortest open path through all nodes with bitmask dynamic programming.
+    
+    Args:
+        distances (numpy.ndarray): Square (possibly asymmetric) cost matrix
+        start (int): Node the path must start at, or None for any
+        end (int): Node the path must end at, or None for any
+        deadline (float): time.perf_counter() value to give up at, or None
+    
+    Returns:
+        list: Optimal path, or None if the deadline passed first
+    """
+    n = len(distances)
+    if n == 0:
+        return []
+    
+    full = (1 << n) - 1
+    cost = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+    for node in ([start] if start is not None else range(n)):
+        cost[1 << node, node] = 0.0
+    
+    bits = 1 << np.arange(n)
+    for mask in range(1, full):
+        if mask % 256 == 0 and deadline is not None and time.perf_counter() > deadline:
+            return None
+        
+        ends = cost[mask]
+        if not np.isfinite(ends).any():
+            continue
+        
+        # Best way to reach each node k from any end of this subset
+        extended = ends[:, np.newaxis] + distances
+        best_prev = np.argmin(extended, axis=0)
+        best_cost = extended[best_prev, np.arange(n)]
+        
+        outside = (mask & bits) == 0
+        next_nodes = np.nonzero(outside)[0]
+        next_masks = mask | bits[next_nodes]
+        improved = best_cost[next_nodes] < cost[next_masks, next_nodes]
+        
+        next_nodes = next_nodes[improved]
+        next_masks = next_masks[improved]
+        cost[next_masks, next_nodes] = best_cost[next_nodes]
+        parent[next_masks, next_nodes] = best_prev[next_nodes]
+    
+    # Walk the parents back from the best final node
+    node = end if end is not None else int(np.argmin(cost[full]))
+    mask = full
+    path = []
+    while node != -1:
+        path.append(node)
+        prev = int(parent[mask, node])
+        mask &= ~(1 << node)
+        node = prev
+    path.reverse()
+    
+    return path
+
+class BaseRouteSolver(ABC):
+    """Abstract base class for route solvers."""
+    
+    name = 'base'
+    
+    def __init__(self, max_iterations=1000, time_limit=None):
+        """
+        Initialize the solver.
+        
+        Args:
+            max_iterations (int): Maximum number of iterations (improving moves,
+                start nodes or DP states, depending on the solver)
+            time_limit (float): Maximum wall time in seconds, or None for no limit
+        """
+        self.max_iterations = max_iterations
+        self.time_limit = time_limit
+    
+    def solve(self, distances, initial_route=None):
+        """
+        Find a short open path through all nodes.
+        
+        Args:
+            distances (numpy.ndarray): Square distance matrix
+            initial_route (list): Starting order, defaults to 0..n-1
+        
+        Returns:
+            dict: 'route' (list of node indices), 'initial_length',
+                'final_length', 'iterations' and 'solver'
+        """
+        distances = np.asarray(distances, dtype=np.float64)
+        n = len(distances)
+        route = list(initial_route) if initial_route is not None else list(range(n))
+        initial_length = path_length(distances, route)
+        
+        if n <= 2:
+            best_route, iterations = route, 0
+        else:
+            deadline = None
+            if self.time_limit is not None:
+                deadline = time.perf_counter() + self.time_limit
+            best_route, iterations = self._solve(distances, route, deadline)
+        
+        final_length = path_length(distances, best_route)
+        if final_length > initial_length:
+            # Never hand back something worse than what we were given
+            best_route, final_length = route, initial_length
+        
+        return {
+            'route': best_route,
+            'initial_length': initial_length,
+            'final_length': final_length,
+            'iterations': iterations,
+            'solver': self.name
+        }
+    
+    @abstractmethod
+    def _solve(self, distances, route, deadline):
+        """
+        Solver-specific search.
+        
+        Args:
+            distances (numpy.ndarray): Square distance matrix (float64)
+            route (list): Starting order
+            deadline (float): time.perf_counter() value to stop at, or None
+        
+        Returns:
+            list: Best route found
+            int: Number of iterations used
+        """
+        pass
+    
+    @staticmethod
+    def _out_of_time(deadline):
+        """Check whether the deadline has passed."""
+        return deadline is not None and time.perf_counter() > deadline
+
+
+class NearestNeighbourSolver(BaseRouteSolver):
+    """Greedy nearest-neighbour construction."""
+    
+    name = 'nearest_neighbour'
+    
+    def __init__(self, max_iterations=1000, time_limit=None, all_starts=True):
+        """
+        Initialize the solver.
+        
+        Args:
+            max_iterations (int): Maximum number of start nodes to try
+            time_limit (float): Maximum wall time in seconds
+            all_starts (bool): Try every node as the start and keep the shortest
+                path; if False, only start from the first node of the route
+        """
+        super().__init__(max_iterations, time_limit)
+        self.all_starts = all_starts
+    
+    def _solve(self, distances, route, deadline):
+        starts = route if self.all_starts else route[:1]
+        best_route, best_length = route, float('inf')
+        iterations = 0
+        
+        for start in starts[:self.max_iterations]:
+            candidate = self._construct(distances, start)
+            length = path_length(distances, candidate)
+            if length < best_length:
+                best_route, best_length = candidate, length
+            iterations += 1
+            if self._out_of_time(deadline):
+                break
+        
+        return best_route, iterations
+    
+    @staticmethod
+    def _construct(distances, start):
+        """
+        Build a nearest-neighbour path from a start node.
+        
+        Args:
+            distances (numpy.ndarray): Square distance matrix
+            start (int): First node of the path
+        
+        Returns:
+            list: Path visiting every node
+        """
+        n = len(distances)
+        visited = np.zeros(n, dtype=bool)
+        path = [start]
+        visited[start] = True
+        current = start
+        
+        for _ in range(n - 1):
+            row = np.where(visited, np.inf, distances[current])
+            current = int(np.argmin(row))
+            visited[current] = True
+            path.append(current)
+        
+        return path
+
+
+class HeldKarpSolver(BaseRouteSolver):
+    """Exact bitmask dynamic programming (Held-Karp) for small days."""
+    
+    name = 'held_karp'
+    
+    def __init__(self, max_iterations=None, time_limit=None, max_nodes=12):
+        """
+        Initialize the solver.
+        
+        Args:
+            max_iterations (int): Most DP states to visit, or None for no limit.
+                The DP visits all 2^n subsets of the nodes, so larger problems
+                get the nearest-neighbour path without starting it
+            time_limit (float): Maximum wall time in seconds; if exceeded the
+                nearest-neighbour path is returned instead
+            max_nodes (int): Largest problem solved exactly (memory and time
+                grow as 2^n * n^2)
+        """
+        super().__init__(max_iterations, time_limit)
+        self.max_nodes = max_nodes
+    
+    def _solve(self, distances, route, deadline):
+        n = len(distances)
+        over_budget = self.max_iterations is not None and (1 << n) > self.max_iterations
+        if n > self.max_nodes or over_budget:
+            return NearestNeighbourSolver(time_limit=self.time_limit)._solve(
+                distances, route, deadline
+            )
+        
+        path = held_karp_path(distances, deadline=deadline)
+        if path is None:
+            return NearestNeighbourSolver()._solve(distances, route, None)[0], 0
+        
+        return path, 1 << n
+
+
+class TwoOptSolver(BaseRouteSolver):
+    """2-opt improvement using neighbour lists."""
+    
+    name = 'two_opt'
+    
+    def __init__(self, max_iterations=1000, time_limit=None, neighbours=8):
+        """
+        Initialize the solver.
+        
+        Args:
+            max_iterations (int): Maximum number of improving moves
+            time_limit (float): Maximum wall time in seconds
+            neighbours (int): Size of each node's candidate neighbour list
+        """
+        super().__init__(max_iterations, time_limit)
+        self.neighbours = neighbours
+    
+    def _solve(self, distances, route, deadline):
+        neighbour_lists = nearest_neighbours(distances, self.neighbours)
+        return self._improve(distances.tolist(), list(route), neighbour_lists,
+                             deadline, self.max_iterations)
+    
+    def _improve(self, d, route, neighbour_lists, deadline, budget):
+        """
+        Apply improving segment reversals until none is found or the budget runs out.
+        
+        Args:
+            d (list): Distance matrix as nested lists
+            route (list): Route to improve (modified in place)
+            neighbour_lists (list): Candidate neighbours per node
+            deadline (float): time.perf_counter() value to stop at, or None
+            budget (int): Maximum number of improving moves
+        
+        Returns:
+            list: Improved route
+            int: Number of moves applied
+        """
+        n = len(route)
+        moves = 0
+        improved = True
+        
+        while improved and moves < budget and not self._out_of_time(deadline):
+            improved = False
+            position = {node: i for i, node in enumerate(route)}
+            
+            for i in range(n - 1):
+                b = route[i]
+                if i == 0:
+                    # Reversing a prefix only changes the edge after it
+                    candidates = range(1, n - 1)
+                    a = None
+                else:
+                    a = route[i - 1]
+                    candidates = {position[c] for c in neighbour_lists[a] if position[c] > i}
+                    candidates.add(n - 1)
+                
+                for j in candidates:
+                    if j <= i:
+                        continue
+                    c = route[j]
+                    delta = 0.0
+                    if a is not None:
+                        delta += d[a][c] - d[a][b]
+                    if j < n - 1:
+                        e = route[j + 1]
+                        delta += d[b][e] - d[c][e]
+                    
+                    if delta < -1e-9:
+                        route[i:j + 1] = reversed(route[i:j + 1])
+                        moves += 1
+                        improved = True
+                        break
+                
+                if improved:
+                    break
+        
+        return route, moves
+
+
+class OrOptSolver(BaseRouteSolver):
+    """Or-opt improvement: move segments of 1-3 nodes next to a close neighbour."""
+    
+    name = 'or_opt'
+    
+    def __init__(self, max_iterations=1000, time_limit=None, neighbours=8, max_segment=3):
+        """
+        Initialize the solver.
+        
+        Args:
+            max_iterations (int): Maximum number of improving moves
+            time_limit (float): Maximum wall time in seconds
+            neighbours (int): Size of each node's candidate neighbour list
+            max_segment (int): Longest segment that is moved
+        """
+        super().__init__(max_iterations, time_limit)
+        self.neighbours = neighbours
+        self.max_segment = max_segment
+    
+    def _solve(self, distances, route, deadline):
+        neighbour_lists = nearest_neighbours(distances, self.neighbours)
+        return self._improve(distances.tolist(), list(route), neighbour_lists,
+                             deadline, self.max_iterations)
+    
+    def _improve(self, d, route, neighbour_lists, deadline, budget):
+        """
+        Apply improving segment moves until none is found or the budget runs out.
+        
+        Args:
+            d (list): Distance matrix as nested lists
+            route (list): Route to improve
+            neighbour_lists (list): Candidate neighbours per node
+            deadline (float): time.perf_counter() value to stop at, or None
+            budget (int): Maximum number of improving moves
+        
+        Returns:
+            list: Improved route
+            int: Number of moves applied
+        """
+        n = len(route)
+        moves = 0
+        improved = True
+        
+        while improved and moves < budget and not self._out_of_time(deadline):
+            improved = False
+            
+            for seg_len in range(1, min(self.max_segment, n - 1) + 1):
+                for i in range(n - seg_len + 1):
+                    move = self._best_move(d, route, i, seg_len, neighbour_lists)
+                    if move is not None:
+                        route = move
+                        moves += 1
+                        improved = True
+                        break
+                if improved:
+                    break
+        
+        return route, moves
+    
+    @staticmethod
+    def _best_move(d, route, i, seg_len, neighbour_lists):
+        """
+        Find an improving reinsertion of route[i:i + seg_len].
+        
+        Args:
+            d (list): Distance matrix as nested lists
+            route (list): Current route
+            i (int): Start position of the segment
+            seg_len (int): Segment length
+            neighbour_lists (list): Candidate neighbours per node
+        
+        Returns:
+            list: New route, or None if no improving move was found
+        """
+        segment = route[i:i + seg_len]
+        first, last = segment[0], segment[-1]
+        prev = route[i - 1] if i > 0 else None
+        succ = route[i + seg_len] if i + seg_len < len(route) else None
+        
+        # Gain from cutting the segment out
+        removal_gain = 0.0
+        if prev is not None:
+            removal_gain += d[prev][first]
+        if succ is not None:
+            removal_gain += d[last][succ]
+        if prev is not None and succ is not None:
+            removal_gain -= d[prev][succ]
+        
+        rest = route[:i] + route[i + seg_len:]
+        position = {node: k for k, node in enumerate(rest)}
+        
+        # Candidate gaps: next to a neighbour of either segment end, plus both path ends
+        gaps = {0, len(rest)}
+        for node in neighbour_lists[first] + neighbour_lists[last]:
+            k = position.get(node)
+            if k is not None:
+                gaps.add(k)
+                gaps.add(k + 1)
+        
+        for gap in gaps:
+            if gap == i:
+                continue  # Same place it came from
+            left = rest[gap - 1] if gap > 0 else None
+            right = rest[gap] if gap < len(rest) else None
+            base = d[left][right] if left is not None and right is not None else 0.0
+            
+            for oriented in (segment, segment[::-1]):
+                cost = -base
+                if left is not None:
+                    cost += d[left][oriented[0]]
+                if right is not None:
+                    cost += d[oriented[-1]][right]
+                if cost - removal_gain < -1e-9:
+                    return rest[:gap] + oriented + rest[gap:]
+        
+        return None
+
+
+class LocalSearchSolver(BaseRouteSolver):
+    """Nearest-neighbour construction followed by alternating 2-opt and Or-opt."""
+    
+    name = 'local_search'
+    
+    def __init__(self, max_iterations=1000, time_limit=None, neighbours=8):
+        """
+        Initialize the solver.
+        
+        Args:
+            max_iterations (int): Maximum number of improving moves in total
+            time_limit (float): Maximum wall time in seconds
+            neighbours (int): Size of each node's candidate neighbour list
+        """
+        super().__init__(max_iterations, time_limit)
+        self.neighbours = neighbours
+    
+    def _solve(self, distances, route, deadline):
+        neighbour_lists = nearest_neighbours(distances, self.neighbours)
+        d = distances.tolist()
+        
+        # A handful of nearest-neighbour starts is enough to seed the search
+        route, _ = NearestNeighbourSolver(max_iterations=16)._solve(distances, route, deadline)
+        iterations = 0
+        two_opt = TwoOptSolver(neighbours=self.neighbours)
+        or_opt = OrOptSolver(neighbours=self.neighbours)
+        
+        while iterations < self.max_iterations and not self._out_of_time(deadline):
+            budget = self.max_iterations - iterations
+            route, two_opt_moves = two_opt._improve(d, route, neighbour_lists, deadline, budget)
+            iterations += two_opt_moves
+            
+            budget = self.max_iterations - iterations
+            route, or_opt_moves = or_opt._improve(d, route, neighbour_lists, deadline, budget)
+            iterations += or_opt_moves
+            
+            if or_opt_moves == 0:
+                break
+        
+        return route, iterations
+
+
+class AutoRouteSolver(BaseRouteSolver):
+    """Exact Held-Karp for small days, local search for larger ones."""
+    
+    name = 'auto'
+    
+    def __init__(self, max_iterations=1000, time_limit=None, exact_limit=10):
+        """
+        Initialize the solver.
+        
+        Args:
+            max_iterations (int): Iteration budget passed to the local search
+            time_limit (float): Maximum wall time in seconds
+            exact_limit (int): Largest number of attractions solved exactly
+        """
+        super().__init__(max_iterations, time_limit)
+        self.exact = HeldKarpSolver(time_limit=time_limit, max_nodes=exact_limit)
+        self.local_search = LocalSearchSolver(max_iterations, time_limit)
+        self.exact_limit = exact_limit
+    
+    def _solve(self, distances, route, deadline):
+        if len(distances) <= self.exact_limit:
+            return self.exact._solve(distances, route, deadline)
+        return self.local_search._solve(distances, route, deadline)
+
+
+ROUTE_SOLVERS = {
+    'greedy': lambda **kwargs: NearestNeighbourSolver(all_starts=False, **kwargs),
+    'nearest_neighbour': NearestNeighbourSolver,
+    'exact': HeldKarpSolver,
+    'two_opt': TwoOptSolver,
+    'or_opt': OrOptSolver,
+    'local_search': LocalSearchSolver,
+    'auto': AutoRouteSolver,
+}
+
+def get_route_solver(name, max_iterations=1000, time_limit=None):
+    """
+    Create a route solver by name.
+    
+    Args:
+        name (str): One of the keys of ROUTE_SOLVERS
+        max_iterations (int): Iteration budget
+        time_limit (float): Time budget in seconds, or None
+    
+    Returns:
+        BaseRouteSolver: The solver
+    
+    Raises:
+        ValueError: If the solver name is unknown
+    """
+    if name not in ROUTE_SOLVERS:
+        raise ValueError(
+            f"Unknown route solver '{name}'. Choose from: {', '.join(ROUTE_SOLVERS)}"
+        )
+    return ROUTE_SOLVERS[name](max_iterations=max_iterations, time_limit=time_limit)
@@ -3,20 +3,41 @@ Semantic similarity calculation module
 """
 
 import numpy as np
-from tqdm import tqdm
+from algorithms.similarity_views import LazySimilarityMatrix, knn_graph, weight_graph
+from utils.tracing import traced
+
+SIMILARITY_FORMATS = ('lazy', 'knn', 'dense')
 
 class SemanticSimilarityCalculator:
     """Calculate semantic similarities between attractions."""
     
-    def __init__(self, embedding_model):
+    def __init__(self, embedding_model, batch_size=64, preference_weight=0.5,
+                 similarity_format='lazy', knn_neighbors=10):
         """
         Initialize the similarity calculator.
         
         Args:
             embedding_model: Model that implements get_embeddings method
+            batch_size (int): Texts per batch when the planner encodes every
+                attraction in one pass (see ItineraryPlanner)
+            preference_weight (float): Weight of preference scores in the
+                weighted similarity matrices (0-1)
+            similarity_format (str): How each city's similarities are returned:
+                'lazy' (LazySimilarityMatrix, rows computed on demand), 'knn'
+                (sparse k-nearest-neighbour graph) or 'dense' (full n x n array)
+            knn_neighbors (int): Neighbours per attraction for the 'knn' format
         """
+        if similarity_format not in SIMILARITY_FORMATS:
+            raise ValueError(f"Unknown similarity format: {similarity_format}. "
+                             f"Valid formats: {', '.join(SIMILARITY_FORMATS)}")
+        
         self.embedding_model = embedding_model
+        self.batch_size = batch_size
+        self.preference_weight = preference_weight
+        self.similarity_format = similarity_format
+        self.knn_neighbors = knn_neighbors
     
+    @traced('similarity.calculate_similarities', items='cities_data')
     def calculate_similarities(self, cities_data, preferences):
         """
         Calculate similarity matrices for attractions within each city.
@@ -26,8 +47,12 @@ class SemanticSimilarityCalculator:
             preferences (list): User preferences
             
         Returns:
-            dict: Dictionary mapping city indices to similarity matrices
+            dict: Dictionary mapping city indices to similarities in the
+                configured format
         """
+        # Only the per-city path shows a progress bar
+        from tqdm import tqdm
+        
         similarity_matrices = {}
         preference_embedding = None
         
@@ -48,21 +73,115 @@ class SemanticSimilarityCalculator:
             # Generate embeddings
             embeddings = self.embedding_model.get_embeddings(texts)
             
-            # Calculate similarity matrix
-            similarity_matrix = self._calculate_cosine_similarity(embeddings)
+            similarity_matrices[city_idx] = self._calculate_city_similarity(
+                embeddings, preference_embedding
+            )
+        
+        return similarity_matrices
+    
+    def retrieve_candidates(self, vector_index, preference_embedding, k, cities=None,
+                            countries=None):
+        """
+        Retrieve the attractions best matching the preferences from a vector index.
+        
+        Only the index clusters closest to the preferences are scanned, so
+        the cost does not grow with the size of every city.
+        
+        Args:
+            vector_index (IVFIndex): Index over all attraction embeddings
+            preference_embedding (numpy.ndarray): User preference embedding
+            k (int): Number of candidates over all cities
+            cities (list): Only retrieve from these city indices
+            countries (list): Only retrieve from cities in these countries
+        
+        Returns:
+            dict: City index -> (catalog rows, preference scores in 0-1),
+                best first; cities without candidates are left out
+        """
+        rows, similarities = vector_index.search(
+            preference_embedding, k=k, cities=cities, countries=countries
+        )
+        scores = (similarities + 1) / 2
+        city_ids = vector_index.city_ids[rows]
+        
+        candidates = {}
+        for city_idx in np.unique(city_ids):
+            in_city = city_ids == city_idx
+            candidates[int(city_idx)] = (rows[in_city], scores[in_city])
+        return candidates
+    
+    def similarity_view(self, normalized_embeddings, preference_scores=None, graph=None):
+        """
+        Wrap a city's embeddings in the configured sparse or lazy format.
+        
+        Args:
+            normalized_embeddings (numpy.ndarray or EmbeddingStore): Unit-length
+                attraction embeddings
+            preference_scores (numpy.ndarray): Preference scores (0-1), or None
+            graph (scipy.sparse.csr_matrix): Cosine kNN graph of the city to
+                reuse for the 'knn' format (built if None)
+        
+        Returns:
+            LazySimilarityMatrix or scipy.sparse.csr_matrix: Similarities
+        """
+        if self.similarity_format == 'lazy':
+            return LazySimilarityMatrix(
+                normalized_embeddings, preference_scores, self.preference_weight
+            )
+        
+        if graph is None:
+            graph = knn_graph(normalized_embeddings, self.knn_neighbors)
+        if preference_scores is None:
+            return graph.copy()
+        return weight_graph(graph, preference_scores, self.preference_weight)
+    
+    def _calculate_city_similarity(self, embeddings, preference_embedding):
+        """
+        Calculate the (optionally preference-weighted) similarities of a city.
+        
+        Args:
+            embeddings (numpy.ndarray): Attraction embeddings of the city
+            preference_embedding (numpy.ndarray): User preference embedding, or None
             
-            # Apply preference weighting if available
+        Returns:
+            Similarities in the configured format (see similarity_view);
+                a numpy.ndarray for the 'dense' format
+        """
+        # Per-city blocks are small, so sparse TF-IDF rows are densified here
+        if hasattr(embeddings, 'toarray'):
+            embeddings = embeddings.toarray()
+        if hasattr(preference_embedding, 'toarray'):
+            preference_embedding = preference_embedding.toarray().ravel()
+        
+        if self.similarity_format != 'dense':
+            preference_scores = None
             if preference_embedding is not None:
                 preference_scores = self._calculate_preference_scores(
                     embeddings, preference_embedding
                 )
-                similarity_matrix = self._weight_by_preferences(
-                    similarity_matrix, preference_scores
-                )
-            
-            similarity_matrices[city_idx] = similarity_matrix
+            return self.similarity_view(self._normalize(embeddings), preference_scores)
         
-        return similarity_matrices
+        # Calculate similarity matrix
+        similarity_matrix = self._calculate_cosine_similarity(embeddings)
+        
+        # Apply preference weighting if available
+        if preference_embedding is not None:
+            preference_scores = self._calculate_preference_scores(
+                embeddings, preference_embedding
+            )
+            # The cosine matrix is a fresh array, so weight it in place
+            similarity_matrix = self._weight_by_preferences(
+                similarity_matrix, preference_scores, out=similarity_matrix
+            )
+        
+        return similarity_matrix
+    
+    @staticmethod
+    def _normalize(embeddings):
+        """Scale each embedding to unit length (zero vectors are left as they are)."""
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1  # Avoid division by zero
+        return embeddings / norms
     
     def _calculate_cosine_similarity(self, embeddings):
         """
@@ -74,10 +193,7 @@ class SemanticSimilarityCalculator:
         Returns:
             numpy.ndarray: Similarity matrix
         """
-        # Normalize the embeddings
-        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-        norms[norms == 0] = 1  # Avoid division by zero
-        normalized_embeddings = embeddings / norms
+        normalized_embeddings = self._normalize(embeddings)
         
         # Calculate dot product for cosine similarity
         similarity_matrix = np.dot(normalized_embeddings, normalized_embeddings.T)
@@ -102,10 +218,7 @@ class SemanticSimilarityCalculator:
         else:
             normalized_pref = preference_embedding
         
-        # Normalize the attraction embeddings
-        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-        norms[norms == 0] = 1  # Avoid division by zero
-        normalized_embeddings = embeddings / norms
+        normalized_embeddings = self._normalize(embeddings)
         
         # Calculate similarity with preference
         preference_scores = np.dot(normalized_embeddings, normalized_pref)
@@ -115,31 +228,39 @@ class SemanticSimilarityCalculator:
         
         return preference_scores
     
-    def _weight_by_preferences(self, similarity_matrix, preference_scores, weight=0.5):
+    def _weight_by_preferences(self, similarity_matrix, preference_scores,
+                               weight=None, out=None):
         """
         Weight similarity matrix by preference scores.
         
+        Each entry becomes (1 - weight) * sim[i, j] + weight * (p[i] + p[j]) / 2,
+        computed with broadcasting instead of a Python loop over all pairs.
+        
         Args:
             similarity_matrix (numpy.ndarray): Original similarity matrix
             preference_scores (numpy.ndarray): Preference scores for each attraction
-            weight (float): Weight to apply to preference scores (0-1)
+            weight (float): Weight to apply to preference scores (0-1),
+                defaults to the calculator's preference_weight
+            out (numpy.ndarray): Optional output buffer with the same shape as
+                similarity_matrix; may be similarity_matrix itself to weight in place
             
         Returns:
             numpy.ndarray: Weighted similarity matrix
         """
-        n = len(similarity_matrix)
-        weighted_matrix = similarity_matrix.copy()
-        
-        # Calculate preference weight matrix
-        for i in range(n):
-            for j in range(n):
-                # Take average of both attractions' preference scores
-                pref_factor = (preference_scores[i] + preference_scores[j]) / 2
-                
-                # Apply weighted adjustment
-                weighted_matrix[i, j] = (
-                    (1 - weight) * similarity_matrix[i, j] + 
-                    weight * pref_factor
-                )
+        if weight is None:
+            weight = self.preference_weight
+        
+        if out is None:
+            out = np.array(similarity_matrix, copy=True)
+        elif out is not similarity_matrix:
+            np.copyto(out, similarity_matrix)
+        
+        # Half of each attraction's weighted preference score, added once
+        # along rows and once along columns gives the pairwise average
+        half_scores = np.asarray(preference_scores, dtype=out.dtype) * (weight / 2)
+        
+        out *= (1 - weight)
+        out += half_scores[:, np.newaxis]
+        out += half_scores[np.newaxis, :]
         
-        return weighted_matrix
\ No newline at end of file
+        return out
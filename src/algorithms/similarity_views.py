@@ -0,0 +1,175 @@
+"""
+Memory-bounded representations of per-city attraction similarities
+"""
+
+import numpy as np
+
+def similarity_rows(embeddings, rows):
+    """
+    Cosine similarities of some rows of unit-length embeddings to every row.
+    
+    Args:
+        embeddings (numpy.ndarray or EmbeddingStore): (n, dim) unit-length
+            embeddings, plain or in compact storage
+        rows (slice or numpy.ndarray): Rows to compare
+    
+    Returns:
+        numpy.ndarray: (len(rows), n) similarities
+    """
+    if isinstance(embeddings, np.ndarray):
+        return embeddings[rows] @ embeddings.T
+    return embeddings.similarities(rows)
+
+class LazySimilarityMatrix:
+    """
+    Similarity matrix of one city whose rows are computed when they are read.
+    
+    Only the city's unit-length embeddings (and preference scores) are kept,
+    so memory grows with n * dim instead of n * n (less with float16 or int8
+    EmbeddingStore embeddings). Entries equal those of the
+    dense matrix built by SemanticSimilarityCalculator:
+    (1 - weight) * cos(i, j) + weight * (p[i] + p[j]) / 2, or the plain
+    cosine similarity without preference scores.
+    """
+    
+    def __init__(self, normalized_embeddings, preference_scores=None, weight=0.5):
+        """
+        Initialize the lazy similarity matrix.
+        
+        Args:
+            normalized_embeddings (numpy.ndarray or EmbeddingStore): (n, dim)
+                unit-length embeddings
+            preference_scores (numpy.ndarray): (n,) preference scores in 0-1, or None
+            weight (float): Weight of the preference scores (0-1)
+        """
+        self.embeddings = normalized_embeddings
+        self.weight = weight
+        self._half_scores = None
+        if preference_scores is not None:
+            self._half_scores = np.asarray(
+                preference_scores, dtype=normalized_embeddings.dtype
+            ) * (weight / 2)
+    
+    def __len__(self):
+        return len(self.embeddings)
+    
+    @property
+    def shape(self):
+        """Shape of the full matrix."""
+        return (len(self), len(self))
+    
+    def __getitem__(self, key):
+        """
+        Read rows or entries: m[i], m[i, j], m[i:j] or m[[i, j, ...]].
+        
+        Args:
+            key: Row index, (row, column) pair, slice or index array
+        
+        Returns:
+            numpy.ndarray or float: Requested rows or entry
+        """
+        if isinstance(key, tuple):
+            row_key, column_key = key
+            return self[row_key][..., column_key]
+        if isinstance(key, (int, np.integer)):
+            return self.rows(np.array([key]))[0]
+        return self.rows(np.arange(len(self))[key])
+    
+    def row(self, i):
+        """
+        Compute one row.
+        
+        Args:
+            i (int): Row index
+        
+        Returns:
+            numpy.ndarray: (n,) similarities of attraction i to every attraction
+        """
+        return self[i]
+    
+    def rows(self, indices):
+        """
+        Compute several rows with one matrix product.
+        
+        Args:
+            indices (numpy.ndarray): Row indices
+        
+        Returns:
+            numpy.ndarray: (len(indices), n) similarities
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        block = similarity_rows(self.embeddings, indices)
+        if self._half_scores is not None:
+            block *= (1 - self.weight)
+            block += self._half_scores[indices, np.newaxis]
+            block += self._half_scores[np.newaxis, :]
+        return block
+    
+    def toarray(self):
+        """Materialize the full (n, n) matrix."""
+        return self.rows(np.arange(len(self)))
+
+
+def knn_graph(normalized_embeddings, k, block_size=1024):
+    """
+    Build the k-nearest-neighbour graph of one city by cosine similarity.
+    
+    Rows are scored a block at a time, so peak memory is block_size * n
+    rather than n * n; the result holds n * k entries.
+    
+    Args:
+        normalized_embeddings (numpy.ndarray or EmbeddingStore): (n, dim)
+            unit-length embeddings
+        k (int): Neighbours kept per attraction (itself excluded)
+        block_size (int): Rows scored at a time
+    
+    Returns:
+        scipy.sparse.csr_matrix: (n, n) graph whose row i holds the cosine
+            similarities of the k attractions most similar to i, best first
+    """
+    from scipy.sparse import csr_matrix
+    
+    n = len(normalized_embeddings)
+    k = max(0, min(k, n - 1))
+    dtype = normalized_embeddings.dtype
+    indices = np.empty((n, k), dtype=np.int32)
+    data = np.empty((n, k), dtype=dtype)
+    
+    for start in range(0, n if k > 0 else 0, block_size):
+        end = min(start + block_size, n)
+        block = similarity_rows(normalized_embeddings, slice(start, end))
+        local = np.arange(end - start)
+        block[local, start + local] = -np.inf  # Not its own neighbour
+        
+        best = np.argpartition(-block, k - 1, axis=1)[:, :k]
+        scores = np.take_along_axis(block, best, axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')
+        indices[start:end] = np.take_along_axis(best, order, axis=1)
+        data[start:end] = np.take_along_axis(scores, order, axis=1)
+    
+    indptr = np.arange(n + 1, dtype=np.int64) * k
+    return csr_matrix((data.ravel(), indices.ravel(), indptr), shape=(n, n))
+
+def weight_graph(graph, preference_scores, weight=0.5):
+    """
+    Weight the entries of a similarity graph by preference scores.
+    
+    Each stored entry becomes (1 - weight) * sim[i, j] + weight * (p[i] + p[j]) / 2,
+    as in the dense weighted matrix; neighbours stay those chosen by content.
+    
+    Args:
+        graph (scipy.sparse.csr_matrix): Cosine similarity graph
+        preference_scores (numpy.ndarray): (n,) preference scores in 0-1
+        weight (float): Weight of the preference scores (0-1)
+    
+    Returns:
+        scipy.sparse.csr_matrix: New graph with the same structure
+    """
+    half_scores = np.asarray(preference_scores, dtype=graph.dtype) * (weight / 2)
+    rows = np.repeat(np.arange(graph.shape[0]), np.diff(graph.indptr))
+    
+    weighted = graph.copy()
+    weighted.data *= (1 - weight)
+    weighted.data += half_scores[rows]
+    weighted.data += half_scores[graph.indices]
+    return weighted
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Property check of the day allocators over random synthetic catalogs
+
+Run from the src directory:
+    python -m benchmarks.day_allocation --trials 300 --max-cities 120
+
+Every trial draws a catalog, budget, pace, preferences, start and end
+cities and excluded cities. The allocation is planned into an itinerary by
+the route planner and its length compared with the budget; small trials
+are also solved by exhaustive search. Exits with status 1 if the dp
+allocator exceeds a budget, visits an excluded city, leaves out a start or
+end city that fits, is beaten by the exhaustive search, or allocates
+dozens of cities slower than MAX_ALLOCATE_MS.
+"""
+
+import argparse
+import json
+import sys
+import time
+from functools import lru_cache
+from itertools import combinations
+
+import numpy as np
+
+from algorithms.itinerary_optimizer import ItineraryOptimizer, ALLOCATORS
+from algorithms.route_planner import RoutePlanner
+from benchmarks.synthetic_catalog import iter_cities, CATEGORIES
+
+# Slowest accepted median allocation time of the timing catalog, in milliseconds
+MAX_ALLOCATE_MS = 50.0
+
+def draw_trial(rng, max_cities, exhaustive_cities):
+    """
+    Draw the catalog and request of one trial.
+    
+    Args:
+        rng (numpy.random.Generator): Random generator
+        max_cities (int): Most cities in a catalog
+        exhaustive_cities (int): Most cities of the trials solved exhaustively
+            (half of the trials are this small)
+    
+    Returns:
+        dict: Trial parameters
+    """
+    small = rng.random() < 0.5
+    num_cities = int(rng.integers(1, (exhaustive_cities if small else max_cities) + 1))
+    city_choices = lambda: int(rng.integers(num_cities)) if rng.random() < 0.5 else None
+    return {
+        'cities': num_cities,
+        'attractions': int(rng.integers(1, 25)),
+        'seed': int(rng.integers(2 ** 31)),
+        'days': int(rng.integers(1, 11 if small else 31)),
+        'pace': str(rng.choice(['relaxed', 'moderate', 'fast'])),
+        'preferences': [str(c) for c in rng.choice(CATEGORIES, size=rng.integers(0, 4))],
+        'start_city': city_choices(),
+        'end_city': city_choices(),
+        'exclude_cities': sorted({int(c) for c in rng.integers(num_cities, size=rng.integers(0, 3))}),
+    }
+
+def make_optimizer(trial, allocator):
+    """Build the trial's catalog and an optimizer over it."""
+    cities = list(iter_cities(trial['cities'], trial['attractions'], seed=trial['seed']))
+    return ItineraryOptimizer(
+        cities, {}, trial['preferences'], trial['pace'], allocator=allocator
+    )
+
+def trip_days(optimizer, allocation, start_city=None, end_city=None):
+    """Length of the itinerary the route planner builds from an allocation."""
+    route_planner = RoutePlanner(
+        optimizer.cities_data, {}, route_solver='greedy',
+        city_sequencer=optimizer.city_sequencer,
+        attraction_store=optimizer.attraction_store,
+        preference_scorer=optimizer.preference_scorer
+    )
+    return len(route_planner.create_itinerary(
+        allocation, optimizer.preferences, optimizer.pace, start_city, end_city
+    ))
+
+def exhaustive_value(city_scores, values, total_days, start_city, end_city):
+    """
+    Best total value over every set of cities and split of days.
+    
+    Every leg between two cities takes one transition day. The start and
+    end cities are required as in the dp allocator: both if they fit,
+    otherwise only the start city.
+    
+    Args:
+        city_scores (list): Scores of the cities (0 = not visited)
+        values (numpy.ndarray): Cumulative day values of the cities
+        total_days (int): Day budget
+        start_city (int): Start city, or None
+        end_city (int): End city, or None
+    
+    Returns:
+        float: Best value, or None if no allocation fits
+    """
+    @lru_cache(maxsize=None)
+    def best_days(cities, free):
+        if not cities:
+            return 0.0
+        first, rest = cities[0], cities[1:]
+        return max(values[first, days] + best_days(rest, free - days)
+                   for days in range(1, free - len(rest) + 1))
+    
+    candidates = [city_idx for city_idx, score in enumerate(city_scores) if score > 0]
+    required = [
+        city_idx for city_idx in dict.fromkeys((start_city, end_city))
+        if city_idx is not None and city_scores[city_idx] > 0
+    ]
+    while True:
+        best = None
+        for size in range(len(candidates) + 1):
+            for cities in combinations(candidates, size):
+                if not set(required) <= set(cities):
+                    continue
+                free = total_days - max(0, size - 1)
+                if free < size:
+                    continue
+                value = best_days(cities, free)
+                if best is None or value > best:
+                    best = value
+        if best is not None or not required:
+            return best
+        required.pop()
+
+def check_trial(trial, allocator, exhaustive_cities):
+    """
+    Allocate one trial's days and check the allocation's properties.
+    
+    Returns:
+        dict: Violations found and the allocation time
+    """
+    optimizer = make_optimizer(trial, allocator)
+    start_city, end_city = trial['start_city'], trial['end_city']
+    excluded = set(trial['exclude_cities'])
+    
+    start = time.perf_counter()
+    allocation = optimizer.allocate_days(
+        trial['days'], start_city, end_city, trial['exclude_cities']
+    )
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    city_scores = optimizer._calculate_city_scores()
+    for city_idx in excluded:
+        city_scores[city_idx] = 0.0
+    
+    used = trip_days(optimizer, allocation, start_city, end_city)
+    result = {
+        'ms': elapsed_ms,
+        'over_budget': used - trial['days'] if used > trial['days'] else 0,
+        'excluded_visited': bool(excluded & set(allocation)),
+        'empty_days': any(days < 1 for days in allocation.values()),
+        'endpoint_missed': False,
+        'beaten': False,
+    }
+    
+    # The start city alone always fits; the end city whenever a trip through both does
+    endpoints = [city_idx for city_idx in dict.fromkeys((start_city, end_city))
+                 if city_idx is not None and city_scores[city_idx] > 0]
+    if endpoints and endpoints[0] not in allocation:
+        result['endpoint_missed'] = True
+    if len(endpoints) == 2 and endpoints[1] not in allocation:
+        both = {city_idx: 1 for city_idx in endpoints}
+        result['endpoint_missed'] |= trip_days(optimizer, both, start_city, end_city) <= trial['days']
+    
+    if trial['cities'] <= exhaustive_cities and trial['days'] <= 10:
+        values = optimizer._day_values(city_scores, trial['days'])
+        value = sum(values[city_idx, days] for city_idx, days in allocation.items())
+        best = exhaustive_value(city_scores, values, trial['days'], start_city, end_city)
+        result['beaten'] = best is not None and best > value + 1e-9
+    
+    return result
+
+def time_allocation(cities=50, days=14, repeats=20, seed=0):
+    """
+    Median allocate_days time of the dp allocator over one catalog.
+    
+    Returns:
+        float: Median milliseconds
+    """
+    trial = {'cities': cities, 'attractions': 20, 'seed': seed, 'pace': 'moderate',
+             'preferences': ['art', 'food']}
+    optimizer = make_optimizer(trial, 'dp')
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        optimizer.allocate_days(days)
+        timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+def run_check(trials=300, max_cities=120, exhaustive_cities=6, timing_cities=50, seed=0,
+              max_allocate_ms=MAX_ALLOCATE_MS):
+    """
+    Check every allocator on the same random trials.
+    
+    Args:
+        trials (int): Number of random trials
+        max_cities (int): Most cities in a catalog
+        exhaustive_cities (int): Most cities of the trials solved exhaustively
+        timing_cities (int): Cities of the catalog the dp allocator is timed on
+        seed (int): Random seed
+        max_allocate_ms (float): Slowest accepted median allocation time
+    
+    Returns:
+        dict: Per-allocator violation counts, timing and pass/fail
+    """
+    rng = np.random.default_rng(seed)
+    drawn = [draw_trial(rng, max_cities, exhaustive_cities) for _ in range(trials)]
+    
+    results = {}
+    for allocator in ALLOCATORS:
+        checks = [check_trial(trial, allocator, exhaustive_cities) for trial in drawn]
+        results[allocator] = {
+            'over_budget': sum(1 for check in checks if check['over_budget']),
+            'max_overshoot_days': max(check['over_budget'] for check in checks),
+            'excluded_visited': sum(check['excluded_visited'] for check in checks),
+            'empty_days': sum(check['empty_days'] for check in checks),
+            'endpoint_missed': sum(check['endpoint_missed'] for check in checks),
+            'beaten_by_exhaustive': sum(check['beaten'] for check in checks),
+            'median_ms': float(np.median([check['ms'] for check in checks])),
+        }
+    
+    dp = results['dp']
+    timing_ms = time_allocation(timing_cities, seed=seed)
+    return {
+        'trials': trials,
+        'exhaustive_trials': sum(1 for trial in drawn
+                                 if trial['cities'] <= exhaustive_cities and trial['days'] <= 10),
+        'timing_cities': timing_cities,
+        'timing_ms': timing_ms,
+        'results': results,
+        'passed': (not any(dp[key] for key in ('over_budget', 'excluded_visited', 'empty_days',
+                                               'endpoint_missed', 'beaten_by_exhaustive'))
+                   and timing_ms <= max_allocate_ms),
+    }
+
+def main():
+    """Run the check from the command line."""
+    parser = argparse.ArgumentParser(description='Day allocation property check')
+    parser.add_argument('--trials', type=int, default=300,
+                        help='Number of random trials (default: 300)')
+    parser.add_argument('--max-cities', type=int, default=120,
+                        help='Most cities in a catalog (default: 120)')
+    parser.add_argument('--exhaustive-cities', type=int, default=6,
+                        help='Most cities of the trials solved exhaustively (default: 6)')
+    parser.add_argument('--timing-cities', type=int, default=50,
+                        help='Cities of the catalog the dp allocator is timed on (default: 50)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed (default: 0)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    report = run_check(args.trials, args.max_cities, args.exhaustive_cities,
+                       args.timing_cities, args.seed)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['trials']} trials ({report['exhaustive_trials']} solved exhaustively)")
+        print(f"{'allocator':>9} {'over budget':>11} {'max over':>8} {'excluded':>8} "
+              f"{'endpoints':>9} {'beaten':>6} {'median ms':>9}")
+        for allocator, result in report['results'].items():
+            print(f"{allocator:>9} {result['over_budget']:>11} {result['max_overshoot_days']:>8} "
+                  f"{result['excluded_visited']:>8} {result['endpoint_missed']:>9} "
+                  f"{result['beaten_by_exhaustive']:>6} {result['median_ms']:>9.2f}")
+        print(f"dp allocation of {report['timing_cities']} cities: {report['timing_ms']:.2f} ms "
+              f"(bound {MAX_ALLOCATE_MS:.0f} ms)")
+        print('PASS' if report['passed'] else 'FAIL')
+    
+    sys.exit(0 if report['passed'] else 1)
+
+if __name__ == "__main__":
+    main()
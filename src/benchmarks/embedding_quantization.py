@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Recall and accuracy check of float16 / int8 embedding storage
+
+Run from the src directory:
+    python -m benchmarks.embedding_quantization --attractions 20000 --queries 200
+
+Exits with status 1 if any quantized dtype loses more top-k recall or
+cosine accuracy than its bound allows.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from models.embedding_store import EmbeddingStore
+
+# Smallest mean top-k recall and largest cosine error accepted per dtype
+BOUNDS = {
+    'float16': {'min_recall': 0.99, 'max_error': 2e-3},
+    'int8': {'min_recall': 0.95, 'max_error': 2e-2},
+}
+
+def clustered_embeddings(rng, n, dim, clusters=50, spread=0.6):
+    """
+    Synthetic embeddings grouped around topics, like sentence embeddings.
+    
+    Args:
+        rng (numpy.random.Generator): Random generator
+        n (int): Number of embeddings
+        dim (int): Embedding dimension
+        clusters (int): Number of topics
+        spread (float): Noise around each topic centre
+    
+    Returns:
+        numpy.ndarray: (n, dim) float32 embeddings
+    """
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    topics = rng.integers(0, clusters, size=n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32) * spread
+    return centres[topics] + noise
+
+def top_k(scores, k):
+    """Column-wise indices of the k largest scores, as sets."""
+    best = np.argpartition(-scores, k - 1, axis=0)[:k]
+    return [set(column) for column in best.T]
+
+def run_check(attractions=20000, queries=200, dim=384, k=10, pairwise_rows=100, seed=0):
+    """
+    Compare quantized stores with float32 on preference queries and pairwise rows.
+    
+    Args:
+        attractions (int): Number of attraction embeddings
+        queries (int): Number of preference queries
+        dim (int): Embedding dimension
+        k (int): Results per query for the recall
+        pairwise_rows (int): Rows compared with every row (lazy similarity rows)
+        seed (int): Random seed
+    
+    Returns:
+        dict: Per-dtype memory, recall, errors, kernel time and pass/fail
+    """
+    rng = np.random.default_rng(seed)
+    embeddings = clustered_embeddings(rng, attractions, dim)
+    query_vectors = EmbeddingStore.from_embeddings(
+        clustered_embeddings(rng, queries, dim), 'float32'
+    ).toarray()
+    rows = rng.choice(attractions, size=min(pairwise_rows, attractions), replace=False)
+    
+    reference = EmbeddingStore.from_embeddings(embeddings, 'float32')
+    exact_scores = reference.dot(query_vectors)
+    exact_top = top_k(exact_scores, k)
+    exact_rows = reference.similarities(rows)
+    
+    results = {}
+    for dtype in ('float32', 'float16', 'int8'):
+        store = EmbeddingStore.from_embeddings(embeddings, dtype)
+        start = time.perf_counter()
+        scores = store.dot(query_vectors)
+        dot_s = time.perf_counter() - start
+        
+        recall = np.mean([
+            len(found & expected) / k
+            for found, expected in zip(top_k(scores, k), exact_top)
+        ])
+        result = {
+            'bytes': store.nbytes(),
+            'compression': reference.nbytes() / store.nbytes(),
+            'recall_at_k': float(recall),
+            'max_query_error': float(np.abs(scores - exact_scores).max()),
+            'max_pairwise_error': float(np.abs(store.similarities(rows) - exact_rows).max()),
+            'dot_s': dot_s,
+        }
+        bounds = BOUNDS.get(dtype)
+        result['passed'] = bounds is None or (
+            result['recall_at_k'] >= bounds['min_recall']
+            and max(result['max_query_error'], result['max_pairwise_error']) <= bounds['max_error']
+        )
+        results[dtype] = result
+    
+    return {
+        'attractions': attractions,
+        'queries': queries,
+        'dim': dim,
+        'k': k,
+        'results': results,
+        'passed': all(result['passed'] for result in results.values()),
+    }
+
+def main():
+    """Run the check from the command line."""
+    parser = argparse.ArgumentParser(description='Quantized embedding recall check')
+    parser.add_argument('--attractions', type=int, default=20000,
+                        help='Number of attraction embeddings (default: 20000)')
+    parser.add_argument('--queries', type=int, default=200,
+                        help='Number of preference queries (default: 200)')
+    parser.add_argument('--dim', type=int, default=384,
+                        help='Embedding dimension (default: 384)')
+    parser.add_argument('--k', type=int, default=10,
+                        help='Results per query for the recall (default: 10)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed (default: 0)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    report = run_check(args.attractions, args.queries, args.dim, args.k, seed=args.seed)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{'dtype':>8} {'MB':>8} {'ratio':>6} {f'recall@{args.k}':>10} "
+              f"{'query err':>10} {'pair err':>10} {'dot (s)':>8}")
+        for dtype, result in report['results'].items():
+            print(f"{dtype:>8} {result['bytes'] / 1e6:>8.1f} {result['compression']:>5.1f}x "
+                  f"{result['recall_at_k']:>10.4f} {result['max_query_error']:>10.2e} "
+                  f"{result['max_pairwise_error']:>10.2e} {result['dot_s']:>8.3f}"
+                  + ('' if result['passed'] else '  exceeds bound'))
+        print('PASS' if report['passed'] else 'FAIL')
+    
+    sys.exit(0 if report['passed'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Import-time budget check for cold CLI startup
+
+Run from the src directory:
+    python -m benchmarks.import_time --budget-ms 500
+
+Exits with status 1 if importing main.py takes longer than the budget or
+pulls in a heavy dependency that should only be loaded on demand.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# Dependencies that must only be imported by the backend that needs them
+DEFERRED_MODULES = (
+    'torch',
+    'transformers',
+    'sentence_transformers',
+    'onnxruntime',
+    'sklearn',
+    'scipy',
+    'ortools',
+    'geopy',
+)
+
+SRC_DIR = Path(__file__).resolve().parent.parent
+
+def measure_import(module='main', python=sys.executable):
+    """
+    Import a module in a fresh interpreter under -X importtime.
+    
+    Args:
+        module (str): Module to import
+        python (str): Interpreter to run
+    
+    Returns:
+        tuple: (cumulative import time in ms, set of top-level packages imported)
+    
+    Raises:
+        RuntimeError: If the import fails
+    """
+    result = subprocess.run(
+        [python, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()[-1:] or ['unknown error']
+        raise RuntimeError(f"Importing {module} failed: {error[0]}")
+    
+    total_us = None
+    packages = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue  # Header line
+        
+        name = fields[2].strip()
+        packages.add(name.split('.')[0])
+        if name == module:
+            total_us = int(fields[1])
+    
+    if total_us is None:
+        raise RuntimeError(f"No import time reported for {module}")
+    return total_us / 1000, packages
+
+def run_check(budget_ms, repeats=5):
+    """
+    Measure cold import time of main.py and check it against the budget.
+    
+    Args:
+        budget_ms (float): Largest acceptable import time in milliseconds
+        repeats (int): Fresh interpreters to run (fastest is kept)
+    
+    Returns:
+        dict: Measured time, budget, deferred modules found and pass/fail
+    """
+    timings = []
+    imported = set()
+    for _ in range(repeats):
+        elapsed_ms, packages = measure_import()
+        timings.append(elapsed_ms)
+        imported |= packages
+    
+    best_ms = min(timings)
+    violations = sorted(set(DEFERRED_MODULES) & imported)
+    return {
+        'import_ms': round(best_ms, 1),
+        'budget_ms': budget_ms,
+        'deferred_modules_imported': violations,
+        'passed': best_ms <= budget_ms and not violations
+    }
+
+def main():
+    """Run the check from the command line."""
+    parser = argparse.ArgumentParser(description='CLI import-time budget check')
+    parser.add_argument('--budget-ms', type=float, default=500,
+                        help='Largest acceptable import time of main.py in milliseconds')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='Fresh interpreters to run (fastest is kept)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    result = run_check(args.budget_ms, args.repeats)
+    
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"import main: {result['import_ms']:.1f} ms (budget {args.budget_ms:.0f} ms)")
+        for module in result['deferred_modules_imported']:
+            print(f"  imported eagerly: {module}")
+        print('PASS' if result['passed'] else 'FAIL')
+    
+    sys.exit(0 if result['passed'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Parity and speed check of the ONNX Runtime embedder against PyTorch
+
+Run from the src directory:
+    python -m benchmarks.onnx_parity --export onnx-minilm
+    python -m benchmarks.onnx_parity --onnx-model onnx-minilm --quantize --threads 4
+
+Exits with status 1 if any ONNX variant's embeddings deviate from the
+sentence-transformers ones by more than the cosine bound.
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from data.attraction_data import AttractionDataProcessor
+from models.embedding_model import OnnxEmbeddingModel, TransformerEmbeddingModel
+
+SAMPLE_DATA = Path(__file__).resolve().parent.parent / "data" / "sample_attractions.json"
+
+# Smallest accepted cosine similarity between ONNX and PyTorch embeddings
+MIN_COSINE = {'fp32': 0.999, 'int8': 0.98}
+
+def export_model(model_name, output_dir):
+    """
+    Export a sentence transformer's encoder and tokenizer for OnnxEmbeddingModel.
+    
+    Needs torch and sentence-transformers (and the model weights, which are
+    downloaded if not cached); the exported directory is used offline.
+    
+    Args:
+        model_name (str): Sentence transformer model name
+        output_dir (str or Path): Directory to write model.onnx and tokenizer.json to
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    
+    sentence_model = SentenceTransformer(model_name, device='cpu')
+    encoder = sentence_model[0].auto_model.eval()
+    tokenizer = sentence_model.tokenizer
+    tokenizer.save_pretrained(str(output_dir))
+    
+    input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+    sample = tokenizer(['A museum of modern art'], return_tensors='pt')
+    dynamic_axes = {name: {0: 'batch', 1: 'tokens'} for name in input_names}
+    dynamic_axes['last_hidden_state'] = {0: 'batch', 1: 'tokens'}
+    
+    with torch.no_grad():
+        torch.onnx.export(
+            encoder, tuple(sample[name] for name in input_names),
+            str(output_dir / 'model.onnx'), input_names=input_names,
+            output_names=['last_hidden_state', 'pooler_output'],
+            dynamic_axes=dynamic_axes, opset_version=14
+        )
+
+def _cosines(a, b):
+    """Row-wise cosine similarity of two embedding arrays."""
+    a = a / np.maximum(np.linalg.norm(a, axis=1, keepdims=True), 1e-12)
+    b = b / np.maximum(np.linalg.norm(b, axis=1, keepdims=True), 1e-12)
+    return np.sum(a * b, axis=1)
+
+def _timed_encode(model, texts, batch_size):
+    """Encode texts once and time it."""
+    start = time.perf_counter()
+    embeddings = np.asarray(model.get_embeddings_batched(texts, batch_size=batch_size))
+    return embeddings, time.perf_counter() - start
+
+def run_check(onnx_model_dir, data_path=SAMPLE_DATA, model_name='all-MiniLM-L6-v2',
+              quantize=False, threads=None, batch_size=64, limit=None):
+    """
+    Encode catalog texts with PyTorch and ONNX Runtime and compare.
+    
+    Args:
+        onnx_model_dir (str): Exported ONNX model directory
+        data_path (str or Path): Catalog whose attraction texts are encoded
+        model_name (str): Sentence transformer model the ONNX graph was exported from
+        quantize (bool): Also check the int8 dynamically quantized graph
+        threads (int): ONNX Runtime intra-op threads, or None for its default
+        batch_size (int): Texts per batch for both backends
+        limit (int): Encode at most this many texts
+    
+    Returns:
+        dict: Per-variant cosine deviation, encode time and pass/fail
+    
+    Raises:
+        RuntimeError: If either model cannot be loaded or their outputs differ in shape
+    """
+    texts, _ = AttractionDataProcessor(data_path).get_attraction_texts()
+    texts = texts[:limit] if limit else texts
+    
+    reference_model = TransformerEmbeddingModel(model_name)
+    if reference_model.model is None:
+        raise RuntimeError(f"PyTorch model {model_name} is not available")
+    reference, reference_s = _timed_encode(reference_model, texts, batch_size)
+    
+    results = {'pytorch': {'encode_s': reference_s}}
+    for variant in (('fp32', 'int8') if quantize else ('fp32',)):
+        model = OnnxEmbeddingModel(
+            onnx_model_dir, quantize=variant == 'int8', intra_op_threads=threads,
+            batch_size=batch_size
+        )
+        if model.session is None:
+            raise RuntimeError(f"ONNX model in {onnx_model_dir} is not available")
+        # The first run pays for session warm-up
+        _timed_encode(model, texts[:batch_size], batch_size)
+        embeddings, encode_s = _timed_encode(model, texts, batch_size)
+        if embeddings.shape != reference.shape:
+            raise RuntimeError(f"ONNX embeddings have shape {embeddings.shape}, PyTorch "
+                               f"{reference.shape}; was the graph exported from {model_name}?")
+        
+        cosines = _cosines(embeddings, reference)
+        results[variant] = {
+            'min_cosine': float(cosines.min()),
+            'mean_cosine': float(cosines.mean()),
+            'encode_s': encode_s,
+            'speedup': reference_s / encode_s if encode_s else None,
+            'passed': bool(cosines.min() >= MIN_COSINE[variant]),
+        }
+    
+    return {
+        'texts': len(texts),
+        'model_name': model_name,
+        'threads': threads,
+        'results': results,
+        'passed': all(result.get('passed', True) for result in results.values()),
+    }
+
+def main():
+    """Run the check (or export the model) from the command line."""
+    parser = argparse.ArgumentParser(description='ONNX Runtime embedder parity check')
+    parser.add_argument('--onnx-model', type=str, default=None, metavar='DIR',
+                        help='Exported ONNX model directory to check')
+    parser.add_argument('--export', type=str, default=None, metavar='DIR',
+                        help='Export --model-name to DIR (needs torch) and exit')
+    parser.add_argument('--model-name', type=str, default='all-MiniLM-L6-v2',
+                        help='Sentence transformer model (default: all-MiniLM-L6-v2)')
+    parser.add_argument('--data', type=str, default=str(SAMPLE_DATA),
+                        help='Catalog whose attraction texts are encoded (default: sample data)')
+    parser.add_argument('--limit', type=int, default=None,
+                        help='Encode at most this many texts')
+    parser.add_argument('--quantize', action='store_true',
+                        help='Also check the int8 dynamically quantized graph')
+    parser.add_argument('--threads', type=int, default=None,
+                        help='ONNX Runtime intra-op threads (default: its own)')
+    parser.add_argument('--batch-size', type=int, default=64,
+                        help='Texts per batch (default: 64)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    if args.export:
+        export_model(args.model_name, args.export)
+        print(f"Exported {args.model_name} to {args.export}")
+        return
+    if not args.onnx_model:
+        parser.error('--onnx-model is required unless --export is given')
+    
+    report = run_check(
+        args.onnx_model, args.data, args.model_name, quantize=args.quantize,
+        threads=args.threads, batch_size=args.batch_size, limit=args.limit
+    )
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{report['texts']} texts, PyTorch encode "
+              f"{report['results']['pytorch']['encode_s']:.3f} s")
+        for variant, result in report['results'].items():
+            if variant == 'pytorch':
+                continue
+            print(f"{variant:>5}: min cosine {result['min_cosine']:.5f} "
+                  f"(bound {MIN_COSINE[variant]}), mean {result['mean_cosine']:.5f}, "
+                  f"encode {result['encode_s']:.3f} s ({result['speedup']:.2f}x)")
+        print('PASS' if report['passed'] else 'FAIL')
+    
+    sys.exit(0 if report['passed'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Benchmark of preference weighting: broadcast engine vs. the original loop
+
+Run from the src directory:
+    python -m benchmarks.preference_weighting --sizes 100 500 2000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from algorithms.similarity_calculator import SemanticSimilarityCalculator
+
+def weight_by_preferences_loop(similarity_matrix, preference_scores, weight=0.5):
+    """
+    Reference implementation: the original nested-loop weighting.
+    
+    Args:
+        similarity_matrix (numpy.ndarray): Original similarity matrix
+        preference_scores (numpy.ndarray): Preference scores for each attraction
+        weight (float): Weight to apply to preference scores (0-1)
+    
+    Returns:
+        numpy.ndarray: Weighted similarity matrix
+    """
+    n = len(similarity_matrix)
+    weighted_matrix = similarity_matrix.copy()
+    
+    for i in range(n):
+        for j in range(n):
+            pref_factor = (preference_scores[i] + preference_scores[j]) / 2
+            weighted_matrix[i, j] = (
+                (1 - weight) * similarity_matrix[i, j] +
+                weight * pref_factor
+            )
+    
+    return weighted_matrix
+
+def _best_time(func, repeats):
+    """
+    Time a function, keeping the fastest of several runs.
+    
+    Args:
+        func (callable): Function to time
+        repeats (int): Number of runs
+    
+    Returns:
+        float: Fastest run time in seconds
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run_benchmark(sizes, repeats=3, loop_limit=2000, seed=0):
+    """
+    Time both weighting implementations for each matrix size.
+    
+    Args:
+        sizes (list): Numbers of attractions (matrix side lengths) to test
+        repeats (int): Runs per measurement (fastest is kept)
+        loop_limit (int): Largest size for which the slow loop is timed
+        seed (int): Random seed for the synthetic matrices
+    
+    Returns:
+        list: One result dictionary per size
+    """
+    rng = np.random.default_rng(seed)
+    calculator = SemanticSimilarityCalculator(embedding_model=None)
+    results = []
+    
+    for n in sizes:
+        similarity_matrix = rng.uniform(-1, 1, size=(n, n))
+        preference_scores = rng.uniform(0, 1, size=n)
+        out = np.empty_like(similarity_matrix)
+        
+        vectorized = _best_time(
+            lambda: calculator._weight_by_preferences(
+                similarity_matrix, preference_scores, out=out
+            ),
+            repeats
+        )
+        result = {'n': n, 'vectorized_s': vectorized, 'loop_s': None, 'speedup': None}
+        
+        if n <= loop_limit:
+            expected = weight_by_preferences_loop(similarity_matrix, preference_scores)
+            if not np.allclose(out, expected):
+                raise AssertionError(f"Vectorized weighting differs from loop for n={n}")
+            
+            loop = _best_time(
+                lambda: weight_by_preferences_loop(similarity_matrix, preference_scores),
+                1
+            )
+            result['loop_s'] = loop
+            result['speedup'] = loop / vectorized if vectorized > 0 else None
+        
+        results.append(result)
+    
+    return results
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description='Preference weighting benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[50, 100, 250, 500, 1000, 2000],
+                        help='Matrix sizes to benchmark')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Runs per measurement for the vectorized engine')
+    parser.add_argument('--loop-limit', type=int, default=2000,
+                        help='Largest size for which the original loop is timed')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.sizes, args.repeats, args.loop_limit)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    
+    print(f"{'n':>6} {'loop (s)':>12} {'vectorized (s)':>16} {'speedup':>10}")
+    for result in results:
+        loop = f"{result['loop_s']:.4f}" if result['loop_s'] is not None else '-'
+        speedup = f"{result['speedup']:.0f}x" if result['speedup'] is not None else '-'
+        print(f"{result['n']:>6} {loop:>12} {result['vectorized_s']:>16.6f} {speedup:>10}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Stage-by-stage scaling benchmark over synthetic catalogs
+
+Run from the src directory:
+    python -m benchmarks.scaling --sizes 10x100 100x100 1000x10 --output scaling.json
+    python -m benchmarks.scaling --sizes 10x100 100x100 --compare scaling.json
+
+Each size is CITIESxATTRACTIONS_PER_CITY. A catalog is generated for it
+(benchmarks.synthetic_catalog) and every pipeline stage is timed on its own.
+"""
+
+import argparse
+import json
+import platform
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from algorithms.itinerary_optimizer import ItineraryOptimizer
+from algorithms.preference_scorer import PreferenceScorer
+from algorithms.route_planner import RoutePlanner
+from algorithms.similarity_calculator import SemanticSimilarityCalculator, SIMILARITY_FORMATS
+from benchmarks.synthetic_catalog import write_catalog
+from data.attraction_data import AttractionDataProcessor
+from models.embedding_model import TransformerEmbeddingModel, SimpleEmbeddingModel
+
+STAGES = (
+    'load_catalog',
+    'embeddings',
+    'similarities',
+    'allocate_days',
+    'route_planner_init',
+    'create_itinerary',
+)
+
+def parse_size(text):
+    """
+    Parse a CITIESxATTRACTIONS size.
+    
+    Args:
+        text (str): Size such as '100x50'
+    
+    Returns:
+        tuple: (cities, attractions per city)
+    
+    Raises:
+        argparse.ArgumentTypeError: If the size is malformed
+    """
+    try:
+        cities, attractions = (int(part) for part in text.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Expected CITIESxATTRACTIONS, got {text!r}")
+    if cities <= 0 or attractions <= 0:
+        raise argparse.ArgumentTypeError(f"Sizes must be positive, got {text!r}")
+    return cities, attractions
+
+def _peak_rss_mb():
+    """Peak resident memory of this process so far, in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_pipeline(catalog_path, embedding_model, days, preferences, pace='moderate',
+                 similarity_format='lazy'):
+    """
+    Run the planning pipeline once, timing every stage.
+    
+    Args:
+        catalog_path (Path): Catalog JSON file
+        embedding_model: Model implementing get_embeddings_batched
+        days (int): Trip length
+        preferences (list): Travel preferences
+        pace (str): Travel pace
+        similarity_format (str): Per-city similarity representation
+    
+    Returns:
+        dict: Stage name -> wall time in seconds
+        dict: Days allocated to each city
+    """
+    timings = {}
+    
+    def timed(stage, func):
+        start = time.perf_counter()
+        result = func()
+        timings[stage] = time.perf_counter() - start
+        return result
+    
+    processor = timed('load_catalog', lambda: AttractionDataProcessor(catalog_path))
+    cities_data = processor.get_processed_data()
+    store = processor.get_attraction_store()
+    
+    calculator = SemanticSimilarityCalculator(
+        embedding_model, similarity_format=similarity_format
+    )
+    
+    def encode():
+        texts, _ = processor.get_attraction_texts()
+        return embedding_model.get_embeddings_batched(
+            texts + [" ".join(preferences)], batch_size=calculator.batch_size
+        )
+    embeddings = timed('embeddings', encode)
+    preference_embedding = embeddings[-1]
+    
+    def similarities():
+        matrices = {}
+        for city_idx in range(len(cities_data)):
+            start, end = store.city_range(city_idx)
+            if start < end:
+                matrices[city_idx] = calculator._calculate_city_similarity(
+                    embeddings[start:end], preference_embedding
+                )
+        return matrices
+    similarity_matrices = timed('similarities', similarities)
+    
+    scorer = PreferenceScorer(store)
+    optimizer = ItineraryOptimizer(
+        cities_data, similarity_matrices, preferences, pace,
+        attraction_store=store, preference_scorer=scorer
+    )
+    allocation = timed('allocate_days', lambda: optimizer.allocate_days(days))
+    
+    route_planner = timed('route_planner_init', lambda: RoutePlanner(
+        cities_data, similarity_matrices, city_sequencer=optimizer.city_sequencer,
+        attraction_store=store, preference_scorer=scorer
+    ))
+    timed('create_itinerary', lambda: route_planner.create_itinerary(
+        allocation, preferences, pace
+    ))
+    
+    return timings, allocation
+
+def run_benchmark(sizes, repeats=1, days=14, preferences=('art', 'food'), pace='moderate',
+                  use_transformer=False, similarity_format='lazy', category_skew=1.0,
+                  spread_km=5.0, seed=0, work_dir=None):
+    """
+    Time every stage for each catalog size.
+    
+    Args:
+        sizes (list): (cities, attractions per city) pairs
+        repeats (int): Pipeline runs per size (fastest time per stage is kept)
+        days (int): Trip length
+        preferences (list): Travel preferences
+        pace (str): Travel pace
+        use_transformer (bool): Use the transformer model instead of TF-IDF
+        similarity_format (str): Per-city similarity representation
+        category_skew (float): Zipf exponent of category popularity
+        spread_km (float): Spread of attractions around each city centre
+        seed (int): Catalog random seed
+        work_dir (str): Directory for generated catalogs (temporary if None)
+    
+    Returns:
+        dict: Benchmark configuration and one result per size
+    """
+    embedding_model = TransformerEmbeddingModel() if use_transformer else SimpleEmbeddingModel()
+    preferences = list(preferences)
+    
+    config = {
+        'repeats': repeats,
+        'days': days,
+        'preferences': preferences,
+        'pace': pace,
+        'embedding_model': type(embedding_model).__name__,
+        'similarity_format': similarity_format,
+        'category_skew': category_skew,
+        'spread_km': spread_km,
+        'seed': seed,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+    }
+    results = []
+    
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for cities, attractions in sizes:
+            catalog_path = Path(tmp) / f"catalog_{cities}x{attractions}.json"
+            start = time.perf_counter()
+            write_catalog(
+                catalog_path, cities, attractions, seed=seed,
+                category_skew=category_skew, spread_km=spread_km
+            )
+            generate_s = time.perf_counter() - start
+            
+            best = {}
+            for _ in range(repeats):
+                timings, allocation = run_pipeline(
+                    catalog_path, embedding_model, days, preferences, pace, similarity_format
+                )
+                for stage, seconds in timings.items():
+                    best[stage] = min(best.get(stage, float('inf')), seconds)
+            
+            results.append({
+                'cities': cities,
+                'attractions_per_city': attractions,
+                'total_attractions': cities * attractions,
+                'catalog_bytes': catalog_path.stat().st_size,
+                'generate_s': generate_s,
+                'stages_s': {stage: best[stage] for stage in STAGES},
+                'total_s': sum(best.values()),
+                # Few visited cities make the routing stages cheap
+                'cities_allocated': len(allocation),
+                'peak_rss_mb': round(_peak_rss_mb(), 1),
+            })
+            catalog_path.unlink()
+    
+    return {'config': config, 'results': results}
+
+def compare(current, previous):
+    """
+    Compare stage times with a previous run, matching results by size.
+    
+    Args:
+        current (dict): Output of run_benchmark
+        previous (dict): Earlier output of run_benchmark
+    
+    Returns:
+        list: Per-size dictionaries of stage -> current / previous time ratio
+    """
+    earlier = {
+        (result['cities'], result['attractions_per_city']): result
+        for result in previous['results']
+    }
+    ratios = []
+    for result in current['results']:
+        before = earlier.get((result['cities'], result['attractions_per_city']))
+        if before is None:
+            continue
+        stages = {
+            stage: seconds / before['stages_s'][stage]
+            for stage, seconds in result['stages_s'].items()
+            if before['stages_s'].get(stage)
+        }
+        ratios.append({
+            'cities': result['cities'],
+            'attractions_per_city': result['attractions_per_city'],
+            'ratios': stages,
+        })
+    return ratios
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description='Pipeline scaling benchmark')
+    parser.add_argument('--sizes', type=parse_size, nargs='+',
+                        default=[(10, 100), (100, 100), (10, 1000), (1000, 10)],
+                        help='Catalog sizes as CITIESxATTRACTIONS_PER_CITY')
+    parser.add_argument('--repeats', type=int, default=1,
+                        help='Pipeline runs per size (fastest per stage is kept)')
+    parser.add_argument('--days', type=int, default=14,
+                        help='Trip length (default: 14)')
+    parser.add_argument('--preferences', nargs='+', default=['art', 'food'],
+                        help='Travel preferences (default: art food)')
+    parser.add_argument('--use-transformer', action='store_true',
+                        help='Use the transformer model instead of TF-IDF')
+    parser.add_argument('--similarity', type=str, default='lazy', choices=SIMILARITY_FORMATS,
+                        help='Per-city similarity representation (default: lazy)')
+    parser.add_argument('--category-skew', type=float, default=1.0,
+                        help='Zipf exponent of category popularity (default: 1.0)')
+    parser.add_argument('--spread-km', type=float, default=5.0,
+                        help='Spread of attractions around each city centre in km (default: 5)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Catalog random seed (default: 0)')
+    parser.add_argument('--work-dir', type=str, default=None,
+                        help='Directory for the generated catalogs (default: system temp)')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Write the results as JSON to this file')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Earlier --output file to compare stage times with')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    report = run_benchmark(
+        args.sizes, repeats=args.repeats, days=args.days, preferences=args.preferences,
+        use_transformer=args.use_transformer, similarity_format=args.similarity,
+        category_skew=args.category_skew, spread_km=args.spread_km, seed=args.seed,
+        work_dir=args.work_dir
+    )
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            report['comparison'] = compare(report, json.load(f))
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    
+    print(f"{'size':>12} " + ' '.join(f"{stage:>18}" for stage in STAGES) + f" {'RSS (MB)':>9}")
+    for result in report['results']:
+        size = f"{result['cities']}x{result['attractions_per_city']}"
+        times = ' '.join(f"{result['stages_s'][stage]:>18.4f}" for stage in STAGES)
+        print(f"{size:>12} {times} {result['peak_rss_mb']:>9.1f}")
+    for entry in report.get('comparison', []):
+        size = f"{entry['cities']}x{entry['attractions_per_city']}"
+        ratios = ' '.join(f"{entry['ratios'].get(stage, float('nan')):>17.2f}x" for stage in STAGES)
+        print(f"{'vs ' + size:>12} {ratios}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark of per-city similarity formats: dense matrix vs. lazy rows vs. kNN graph
+
+Run from the src directory:
+    python -m benchmarks.similarity_memory --sizes 1000 5000 20000
+"""
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from algorithms.similarity_calculator import SemanticSimilarityCalculator
+
+def _timed(func):
+    """
+    Run a function once and time it.
+    
+    Args:
+        func (callable): Function to run
+    
+    Returns:
+        tuple: (result, run time in seconds)
+    """
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def run_benchmark(sizes, dim=384, neighbors=10, dense_limit=10000, seed=0):
+    """
+    Build each similarity format for synthetic cities and compare them.
+    
+    Lazy rows and kNN graph entries are checked against the dense matrix
+    for sizes up to dense_limit.
+    
+    Args:
+        sizes (list): Numbers of attractions per city to test
+        dim (int): Embedding dimension
+        neighbors (int): Neighbours per attraction for the kNN graph
+        dense_limit (int): Largest size for which the dense matrix is built
+        seed (int): Random seed for the synthetic embeddings
+    
+    Returns:
+        list: One result dictionary per size
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    
+    for n in sizes:
+        embeddings = rng.standard_normal((n, dim)).astype(np.float32)
+        preference_scores = rng.uniform(0, 1, size=n).astype(np.float32)
+        
+        calculators = {
+            name: SemanticSimilarityCalculator(
+                embedding_model=None, similarity_format=name, knn_neighbors=neighbors
+            )
+            for name in ('dense', 'lazy', 'knn')
+        }
+        normalized = calculators['lazy']._normalize(embeddings)
+        
+        lazy, lazy_s = _timed(
+            lambda: calculators['lazy'].similarity_view(normalized, preference_scores)
+        )
+        graph, knn_s = _timed(
+            lambda: calculators['knn'].similarity_view(normalized, preference_scores)
+        )
+        result = {
+            'n': n,
+            'dense_bytes': n * n * np.dtype(np.float32).itemsize,
+            'dense_s': None,
+            'lazy_bytes': normalized.nbytes,
+            'lazy_s': lazy_s,
+            'knn_bytes': graph.data.nbytes + graph.indices.nbytes + graph.indptr.nbytes,
+            'knn_s': knn_s,
+        }
+        
+        if n <= dense_limit:
+            dense_calculator = calculators['dense']
+            dense, result['dense_s'] = _timed(
+                lambda: dense_calculator._weight_by_preferences(
+                    dense_calculator._calculate_cosine_similarity(embeddings),
+                    preference_scores
+                )
+            )
+            
+            rows = rng.choice(n, size=min(n, 50), replace=False)
+            if not np.allclose(lazy.rows(rows), dense[rows], atol=1e-5):
+                raise AssertionError(f"Lazy rows differ from the dense matrix for n={n}")
+            
+            coo = graph.tocoo()
+            if not np.allclose(coo.data, dense[coo.row, coo.col], atol=1e-5):
+                raise AssertionError(f"kNN graph entries differ from the dense matrix for n={n}")
+        
+        results.append(result)
+    
+    return results
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description='Similarity format benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[500, 2000, 5000, 10000],
+                        help='Attractions per city to benchmark')
+    parser.add_argument('--dim', type=int, default=384,
+                        help='Embedding dimension')
+    parser.add_argument('--neighbors', type=int, default=10,
+                        help='Neighbours per attraction for the kNN graph')
+    parser.add_argument('--dense-limit', type=int, default=10000,
+                        help='Largest size for which the dense matrix is built')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.sizes, args.dim, args.neighbors, args.dense_limit)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    
+    print(f"{'n':>7} {'dense (MB)':>11} {'lazy (MB)':>10} {'knn (MB)':>9} "
+          f"{'dense (s)':>10} {'knn (s)':>8}")
+    for result in results:
+        dense_s = f"{result['dense_s']:.3f}" if result['dense_s'] is not None else '-'
+        print(f"{result['n']:>7} {result['dense_bytes'] / 1e6:>11.1f} "
+              f"{result['lazy_bytes'] / 1e6:>10.1f} {result['knn_bytes'] / 1e6:>9.2f} "
+              f"{dense_s:>10} {result['knn_s']:>8.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Reproducible synthetic attraction catalogs for scaling benchmarks
+
+Run from the src directory:
+    python -m benchmarks.synthetic_catalog --cities 1000 --attractions 100 --output catalog.json
+
+The same arguments and seed always produce the same file. Cities are
+written one at a time, so catalogs much larger than memory can be generated.
+"""
+
+import argparse
+import json
+
+import numpy as np
+
+# Category vocabulary, most common first (as in the sample data)
+CATEGORIES = (
+    'cultural', 'historic', 'outdoor', 'art', 'architecture', 'museum',
+    'religious', 'food', 'indoor', 'local', 'culinary', 'park', 'nature',
+    'relaxation', 'shopping', 'restaurant', 'landmark', 'market', 'beach',
+    'upscale', 'water', 'tour', 'nightlife', 'music', 'sports', 'family',
+)
+
+DURATIONS = (0.5, 1, 1.5, 2, 2, 2, 2.5, 3, 3, 4)
+COSTS = ('Free', '€', '€€', '€€', '€€€')
+BEST_TIMES = (
+    ['morning', 'afternoon'], ['afternoon', 'evening'], ['lunch', 'dinner'],
+    ['morning'], ['afternoon'], ['morning', 'evening'],
+)
+
+_WORDS = (
+    'historic', 'famous', 'quiet', 'vibrant', 'hidden', 'grand', 'local',
+    'modern', 'ancient', 'scenic', 'popular', 'charming', 'lively', 'restored',
+    'collection', 'square', 'gardens', 'views', 'gallery', 'district', 'hall',
+    'harbour', 'tower', 'streets', 'exhibits', 'festival', 'cuisine', 'river',
+)
+
+# Kilometres per degree of latitude
+_KM_PER_DEGREE = 111.32
+
+def category_weights(skew, num_categories=len(CATEGORIES)):
+    """
+    Zipf-like popularity of each category.
+    
+    Args:
+        skew (float): Exponent; 0 makes all categories equally common,
+            larger values concentrate attractions in the first few
+        num_categories (int): Vocabulary size
+    
+    Returns:
+        numpy.ndarray: Probabilities summing to 1
+    """
+    weights = 1.0 / np.arange(1, num_categories + 1) ** skew
+    return weights / weights.sum()
+
+def generate_city(rng, city_idx, attractions, bounds=(36.0, 60.0, -10.0, 30.0),
+                  spread_km=5.0, category_skew=1.0, cities_per_country=10,
+                  missing_location_rate=0.0):
+    """
+    Generate one synthetic city.
+    
+    Args:
+        rng (numpy.random.Generator): Random generator
+        city_idx (int): City number (used in names)
+        attractions (int): Number of attractions
+        bounds (tuple): (lat_min, lat_max, lng_min, lng_max) city centres are drawn from
+        spread_km (float): Standard deviation of attraction distance from the centre
+        category_skew (float): Zipf exponent of category popularity
+        cities_per_country (int): Consecutive cities sharing a country
+        missing_location_rate (float): Fraction of attractions without a location
+    
+    Returns:
+        dict: City in the catalog format
+    """
+    lat_min, lat_max, lng_min, lng_max = bounds
+    center_lat = rng.uniform(lat_min, lat_max)
+    center_lng = rng.uniform(lng_min, lng_max)
+    name = f"City {city_idx:05d}"
+    
+    weights = category_weights(category_skew)
+    num_categories = rng.integers(1, 5, size=attractions)
+    offsets = rng.normal(0.0, spread_km, size=(attractions, 2)) / _KM_PER_DEGREE
+    lng_scale = max(np.cos(np.radians(center_lat)), 0.1)
+    durations = rng.choice(DURATIONS, size=attractions)
+    popularity = rng.integers(1, 6, size=attractions)
+    costs = rng.integers(0, len(COSTS), size=attractions)
+    best_times = rng.integers(0, len(BEST_TIMES), size=attractions)
+    located = rng.random(attractions) >= missing_location_rate
+    
+    city_attractions = []
+    for i in range(attractions):
+        categories = [
+            CATEGORIES[c] for c in
+            rng.choice(len(CATEGORIES), size=num_categories[i], replace=False, p=weights)
+        ]
+        words = rng.choice(_WORDS, size=6)
+        attraction = {
+            'name': f"{name} {categories[0].title()} {i}",
+            'description': (
+                f"A {words[0]} {categories[0]} spot with {words[1]} {words[2]} "
+                f"and {words[3]} {words[4]} near the {words[5]}."
+            ),
+            'categories': categories,
+            'duration_hours': float(durations[i]),
+            'cost': COSTS[costs[i]],
+            'popularity': int(popularity[i]),
+            'best_time': BEST_TIMES[best_times[i]],
+        }
+        if located[i]:
+            attraction['location'] = {
+                'lat': round(center_lat + offsets[i, 0], 6),
+                'lng': round(center_lng + offsets[i, 1] / lng_scale, 6),
+            }
+        city_attractions.append(attraction)
+    
+    return {
+        'name': name,
+        'country': f"Country {city_idx // cities_per_country:04d}",
+        'importance': int(rng.integers(1, 6)),
+        'location': {'lat': round(center_lat, 6), 'lng': round(center_lng, 6)},
+        'attractions': city_attractions,
+    }
+
+def iter_cities(cities, attractions, seed=0, **options):
+    """
+    Generate the cities of a synthetic catalog one at a time.
+    
+    Args:
+        cities (int): Number of cities
+        attractions (int): Attractions per city
+        seed (int): Random seed
+        **options: Passed to generate_city
+    
+    Yields:
+        dict: Cities in the catalog format
+    """
+    # One child generator per city keeps cities independent of each other
+    for city_idx, city_seed in enumerate(np.random.SeedSequence(seed).spawn(cities)):
+        yield generate_city(np.random.default_rng(city_seed), city_idx, attractions, **options)
+
+def write_catalog(path, cities, attractions, seed=0, **options):
+    """
+    Write a synthetic {"cities": [...]} catalog to a JSON file.
+    
+    Args:
+        path (str or Path): Destination file
+        cities (int): Number of cities
+        attractions (int): Attractions per city
+        seed (int): Random seed
+        **options: Passed to generate_city
+    
+    Returns:
+        int: Total number of attractions written
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"cities": [\n')
+        for city_idx, city in enumerate(iter_cities(cities, attractions, seed, **options)):
+            if city_idx:
+                f.write(',\n')
+            json.dump(city, f, ensure_ascii=False)
+        f.write('\n]}\n')
+    return cities * attractions
+
+def main():
+    """Generate a catalog from the command line."""
+    parser = argparse.ArgumentParser(description='Synthetic attraction catalog generator')
+    parser.add_argument('--cities', type=int, default=100,
+                        help='Number of cities (default: 100)')
+    parser.add_argument('--attractions', type=int, default=100,
+                        help='Attractions per city (default: 100)')
+    parser.add_argument('--category-skew', type=float, default=1.0,
+                        help='Zipf exponent of category popularity; 0 is uniform (default: 1.0)')
+    parser.add_argument('--spread-km', type=float, default=5.0,
+                        help='Spread of attractions around each city centre in km (default: 5)')
+    parser.add_argument('--bounds', type=float, nargs=4, default=[36.0, 60.0, -10.0, 30.0],
+                        metavar=('LAT_MIN', 'LAT_MAX', 'LNG_MIN', 'LNG_MAX'),
+                        help='Area city centres are drawn from (default: Europe)')
+    parser.add_argument('--missing-location-rate', type=float, default=0.0,
+                        help='Fraction of attractions without a location (default: 0)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Random seed (default: 0)')
+    parser.add_argument('--output', type=str, required=True,
+                        help='Output JSON file')
+    args = parser.parse_args()
+    
+    total = write_catalog(
+        args.output, args.cities, args.attractions, seed=args.seed,
+        bounds=tuple(args.bounds), spread_km=args.spread_km,
+        category_skew=args.category_skew,
+        missing_location_rate=args.missing_location_rate
+    )
+    print(f"Wrote {args.cities} cities and {total} attractions to {args.output}")
+
+if __name__ == "__main__":
+    main()
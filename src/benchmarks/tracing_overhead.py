@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Per-call overhead of span tracing, disabled and enabled
+
+Run from the src directory:
+    python -m benchmarks.tracing_overhead --calls 1000000
+"""
+
+import argparse
+import json
+import time
+
+from utils import tracing
+
+def _per_call_ns(func, calls, repeats):
+    """
+    Fastest per-call time of a function over several runs.
+    
+    Args:
+        func (callable): Function taking one argument
+        calls (int): Calls per run
+        repeats (int): Runs (the fastest is kept)
+    
+    Returns:
+        float: Nanoseconds per call
+    """
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for i in range(calls):
+            func(i)
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e9
+
+def run_benchmark(calls=1000000, repeats=5):
+    """
+    Compare a plain function with traced copies of it.
+    
+    Args:
+        calls (int): Calls per run
+        repeats (int): Runs per variant (the fastest is kept)
+    
+    Returns:
+        dict: Nanoseconds per call of each variant, and the disabled overhead
+    """
+    def plain(value):
+        return value
+    
+    traced_plain = tracing.traced('overhead.traced')(plain)
+    traced_items = tracing.traced('overhead.traced_items', items='value')(plain)
+    
+    def with_span(value):
+        with tracing.span('overhead.span'):
+            return value
+    
+    tracing.disable()
+    results = {'plain_ns': _per_call_ns(plain, calls, repeats)}
+    for name, func in (('traced', traced_plain), ('traced_items', traced_items),
+                       ('span', with_span)):
+        results[f"{name}_disabled_ns"] = _per_call_ns(func, calls, repeats)
+    
+    # Enabled runs record every call, so fewer are made
+    enabled_calls = max(1, calls // 10)
+    tracing.enable()
+    try:
+        for name, func in (('traced', traced_plain), ('traced_items', traced_items),
+                           ('span', with_span)):
+            results[f"{name}_enabled_ns"] = _per_call_ns(func, enabled_calls, 1)
+    finally:
+        tracing.disable()
+    
+    results['disabled_overhead_ns'] = results['traced_disabled_ns'] - results['plain_ns']
+    return results
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description='Span tracing overhead benchmark')
+    parser.add_argument('--calls', type=int, default=1000000,
+                        help='Calls per run with tracing disabled (default: 1000000)')
+    parser.add_argument('--repeats', type=int, default=5,
+                        help='Runs per variant; the fastest is kept (default: 5)')
+    parser.add_argument('--json', action='store_true',
+                        help='Print results as JSON')
+    args = parser.parse_args()
+    
+    results = run_benchmark(args.calls, args.repeats)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    
+    for name, value in results.items():
+        print(f"{name:<24} {value:>8.1f} ns")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""
+pytest configuration: puts the src directory on sys.path, so tests import
+modules the way main.py does (from algorithms..., from planner ...).
+"""
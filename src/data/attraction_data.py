@@ -6,65 +6,102 @@ import json
 import os
 from pathlib import Path
 
+from data.attraction_store import AttractionStore, AttractionRows
+from data.catalog_stream import iter_catalog_cities
+
 class AttractionDataProcessor:
     """Process and validate attraction data."""
     
-    def __init__(self, data_path):
+    def __init__(self, data_path, cities=None):
         """
         Initialize the attraction data processor.
         
         Args:
             data_path (str or Path): Path to the attraction data JSON file
+            cities (list): Names of the cities to load, or None for all. Other
+                cities are skipped as they are read and never kept in memory.
         """
         self.data_path = Path(data_path)
+        # Normalised name -> name as requested
+        self.city_filter = (
+            {self._city_key(name): name for name in cities} if cities is not None else None
+        )
+        # Attractions of every loaded city, in columnar form
+        self.store = AttractionStore()
         self.cities_data = self._load_data()
-        self._preprocess_data()
+    
+    @staticmethod
+    def _city_key(name):
+        """Normalise a city name for matching against the city filter."""
+        return str(name).strip().casefold()
     
     def _load_data(self):
         """
-        Load attraction data from JSON file.
+        Stream the catalog, validating and normalising one city at a time.
+        
+        Each city's attraction dictionaries are moved into the columnar store
+        as soon as they are processed and replaced by a read-only view.
         
         Returns:
-            dict: The loaded data
+            list: The processed cities that pass the city filter
         
         Raises:
             FileNotFoundError: If the data file cannot be found
-            json.JSONDecodeError: If the data file is not valid JSON
+            ValueError: If the data file is not valid JSON, has no 'cities'
+                list, or a requested city is not in the catalog
         """
+        cities_data = []
         try:
-            with open(self.data_path, 'r', encoding='utf-8') as f:
-                data = json.load(f)
+            for city in iter_catalog_cities(self.data_path):
+                if not isinstance(city, dict):
+                    raise ValueError("Data format error: every city must be a JSON object.")
+                if self.city_filter is not None and (
+                    self._city_key(city.get('name', '')) not in self.city_filter
+                ):
+                    continue
                 
-            # Check if the data has the expected structure
-            if 'cities' not in data:
-                raise ValueError("Data format error: 'cities' key not found in the data.")
-                
-            return data['cities']
+                self._preprocess_city(city)
+                city_idx = self.store.add_city(city['attractions'])
+                city['attractions'] = AttractionRows(self.store, city_idx)
+                cities_data.append(city)
         except FileNotFoundError:
             raise FileNotFoundError(f"Attraction data file not found: {self.data_path}")
         except json.JSONDecodeError:
             raise ValueError(f"Invalid JSON format in attraction data file: {self.data_path}")
+        self.store.freeze()
+        
+        if self.city_filter is not None:
+            loaded = {self._city_key(city['name']) for city in cities_data}
+            missing = [
+                name for key, name in self.city_filter.items() if key not in loaded
+            ]
+            if missing:
+                raise ValueError(f"Cities not found in attraction data: {', '.join(missing)}")
+        
+        return cities_data
     
-    def _preprocess_data(self):
+    def _preprocess_city(self, city):
         """
-        Clean, normalize, and validate the attraction data.
+        Clean, normalize, and validate one city and its attractions.
+        
+        This ensures data quality and consistency and adds derived fields
+        that will be useful for itinerary planning.
         
-        This method processes each city and its attractions to ensure data quality
-        and consistency. It also adds derived fields that will be useful for itinerary planning.
+        Args:
+            city (dict): Raw city data, updated in place
         """
-        for city in self.cities_data:
-            # Validate city data
-            required_city_fields = ['name', 'country', 'attractions']
-            for field in required_city_fields:
-                if field not in city:
-                    raise ValueError(f"Missing required field '{field}' for city: {city.get('name', 'Unknown')}")
-            
-            # Set default importance if not provided
-            if 'importance' not in city:
-                city['importance'] = 3  # Medium importance by default
-            
-            # Process attractions for this city
-            self._process_attractions(city)
+        # Validate city data
+        required_city_fields = ['name', 'country', 'attractions']
+        for field in required_city_fields:
+            if field not in city:
+                raise ValueError(f"Missing required field '{field}' for city: {city.get('name', 'Unknown')}")
+        
+        # Set default importance if not provided
+        if 'importance' not in city:
+            city['importance'] = 3  # Medium importance by default
+        
+        # Process attractions for this city
+        self._process_attractions(city)
     
     def _process_attractions(self, city):
         """
@@ -107,12 +144,18 @@ class AttractionDataProcessor:
                 
             if 'best_time' not in attraction:
                 attraction['best_time'] = ['morning', 'afternoon']  # Default time
-                
-            # Create a rich text representation for embedding
-            attraction['text_for_embedding'] = (
-                f"{attraction['name']}. {attraction['description']} "
-                f"Categories: {', '.join(attraction['categories'])}"
-            )
+            
+            # The rich text representation for embedding is built by the
+            # AttractionStore on demand rather than stored for every attraction
+    
+    def get_attraction_store(self):
+        """
+        Get the columnar store of all loaded attractions.
+        
+        Returns:
+            AttractionStore: Store whose city indices match get_processed_data()
+        """
+        return self.store
     
     def get_processed_data(self):
         """
@@ -131,12 +174,11 @@ class AttractionDataProcessor:
             list: List of attraction text representations
             list: Corresponding city and attraction indices
         """
-        texts = []
+        texts = self.store.embedding_texts()
         indices = []  # [(city_idx, attraction_idx), ...]
         
-        for city_idx, city in enumerate(self.cities_data):
-            for attraction_idx, attraction in enumerate(city['attractions']):
-                texts.append(attraction['text_for_embedding'])
-                indices.append((city_idx, attraction_idx))
+        for city_idx in range(self.store.num_cities):
+            start, end = self.store.city_range(city_idx)
+            indices.extend((city_idx, attraction_idx) for attraction_idx in range(end - start))
         
         return texts, indices
\ No newline at end of file
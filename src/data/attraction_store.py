@@ -0,0 +1,448 @@
+"""
+Columnar (struct-of-arrays) storage for attraction data
+"""
+
+import json
+from array import array
+from collections.abc import Sequence
+
+import numpy as np
+from data.city_data import CityDataHelper
+
+# Fields held in dedicated columns; everything else is kept as interned JSON
+_COLUMN_FIELDS = ('name', 'description', 'duration_hours', 'categories', 'popularity',
+                  'text_for_embedding')
+
+class StringTable:
+    """Immutable list of strings stored as one buffer plus an offset array."""
+    
+    def __init__(self, strings=()):
+        """
+        Initialize the string table.
+        
+        Args:
+            strings (iterable): Strings to store, in row order
+        """
+        strings = list(strings)
+        self._buffer = ''.join(strings)
+        self.offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in strings], out=self.offsets[1:])
+    
+    def __len__(self):
+        return len(self.offsets) - 1
+    
+    def __getitem__(self, row):
+        return self._buffer[self.offsets[row]:self.offsets[row + 1]]
+    
+    def nbytes(self):
+        """
+        Get the approximate memory used by the table.
+        
+        Returns:
+            int: Size in bytes
+        """
+        return len(self._buffer.encode('utf-8')) + self.offsets.nbytes
+
+
+class AttractionRows(Sequence):
+    """
+    Read-only list-like view of one city's attractions in an AttractionStore.
+    
+    Lets code written against lists of attraction dictionaries keep working;
+    each access builds a fresh dictionary from the store's columns.
+    """
+    
+    def __init__(self, store, city_idx):
+        """
+        Initialize the view.
+        
+        Args:
+            store (AttractionStore): Store holding the attractions
+            city_idx (int): City index within the store
+        """
+        self.store = store
+        self.city_idx = city_idx
+    
+    def __len__(self):
+        start, end = self.store.city_range(self.city_idx)
+        return end - start
+    
+    def __getitem__(self, index):
+        start, end = self.store.city_range(self.city_idx)
+        if isinstance(index, slice):
+            return [self.store.to_dict(start + i) for i in range(*index.indices(end - start))]
+        if index < 0:
+            index += end - start
+        if not 0 <= index < end - start:
+            raise IndexError("attraction index out of range")
+        return self.store.to_dict(start + index)
+    
+    def coordinate_arrays(self):
+        """
+        Get the coordinates of the city's attractions without building dictionaries.
+        
+        Returns:
+            numpy.ndarray: (n, 2) array of (lat, lng) in degrees, 0 where missing
+            numpy.ndarray: Boolean mask, True where the attraction has a valid location
+        """
+        rows = self.store.city_slice(self.city_idx)
+        return self.store.coordinates[rows].copy(), self.store.has_location[rows].copy()
+
+
+class AttractionStore:
+    """
+    Attractions of all cities as NumPy columns indexed by global row.
+    
+    Rows of city c are city_offsets[c]:city_offsets[c + 1]. Numeric fields are
+    arrays, categories are interned into a vocabulary and held both as a packed
+    bitmask matrix (for vectorized matching) and as per-row id lists (to keep
+    their original order), names and descriptions live in string tables, and
+    the remaining fields (cost, best time, ...) are interned JSON strings, so
+    rows sharing the same values store them once.
+    Dictionaries are only built by to_dict, when a row is written to output.
+    
+    Build a store with add_city for each city and then freeze, or with
+    from_cities.
+    """
+    
+    def __init__(self):
+        """Initialize an empty store ready for add_city."""
+        self.category_vocabulary = []
+        self.category_index = {}
+        self.frozen = False
+        
+        # Distinct JSON encodings of the non-column fields; '' means none
+        self._extra_vocabulary = ['']
+        self._extra_index = {'': 0}
+        self._encode_json = json.JSONEncoder(ensure_ascii=False).encode
+        
+        # Column builders, replaced by arrays in freeze()
+        self._city_offsets = [0]
+        self._names = []
+        self._descriptions = []
+        self._extra_ids = array('i')
+        self._coordinates = array('d')
+        self._has_location = array('b')
+        self._duration_hours = array('d')
+        self._duration_is_int = array('b')
+        self._popularity = array('d')
+        self._popularity_is_int = array('b')
+        self._category_offsets = array('q', [0])
+        self._category_ids = array('i')
+    
+    @classmethod
+    def from_cities(cls, cities_data):
+        """
+        Get the store behind a list of processed cities, building one if needed.
+        
+        Args:
+            cities_data (list): City dictionaries whose 'attractions' are lists
+                of processed attraction dictionaries or AttractionRows views
+        
+        Returns:
+            AttractionStore: The frozen store (city indices match cities_data)
+        """
+        views = [city.get('attractions') for city in cities_data]
+        if views and all(isinstance(view, AttractionRows) for view in views):
+            store = views[0].store
+            if all(view.store is store and view.city_idx == idx for idx, view in enumerate(views)):
+                return store
+        
+        store = cls()
+        for city in cities_data:
+            store.add_city(city.get('attractions') or [])
+        store.freeze()
+        return store
+    
+    def add_city(self, attractions):
+        """
+        Append the processed attractions of the next city.
+        
+        Args:
+            attractions (list): Processed attraction dictionaries
+        
+        Returns:
+            int: Index of the city in the store
+        
+        Raises:
+            RuntimeError: If the store has already been frozen
+        """
+        if self.frozen:
+            raise RuntimeError("Cannot add cities to a frozen AttractionStore")
+        
+        coords, valid = CityDataHelper.get_attraction_coordinates(attractions)
+        self._coordinates.extend(coords.ravel().tolist())
+        self._has_location.extend(valid.astype(np.int8).tolist())
+        
+        for i, attraction in enumerate(attractions):
+            self._names.append(attraction['name'])
+            self._descriptions.append(attraction['description'])
+            
+            duration = attraction['duration_hours']
+            self._duration_hours.append(float(duration))
+            self._duration_is_int.append(isinstance(duration, int))
+            popularity = attraction.get('popularity', 3)
+            self._popularity.append(float(popularity))
+            self._popularity_is_int.append(isinstance(popularity, int))
+            
+            for category in attraction['categories']:
+                self._category_ids.append(self._intern_category(category))
+            self._category_offsets.append(len(self._category_ids))
+            
+            extras = {
+                key: value for key, value in attraction.items()
+                if key not in _COLUMN_FIELDS
+            }
+            # A plain {'lat', 'lng'} location is rebuilt from the coordinate columns
+            location = extras.get('location')
+            if valid[i] and isinstance(location, dict) and set(location) == {'lat', 'lng'}:
+                del extras['location']
+            self._extra_ids.append(self._intern_extras(self._encode_json(extras) if extras else ''))
+        
+        self._city_offsets.append(len(self._names))
+        return len(self._city_offsets) - 2
+    
+    def freeze(self):
+        """Convert the column builders into NumPy arrays and string tables."""
+        if self.frozen:
+            return
+        
+        self.city_offsets = np.asarray(self._city_offsets, dtype=np.int64)
+        n = int(self.city_offsets[-1])
+        self.city_ids = np.repeat(
+            np.arange(len(self.city_offsets) - 1, dtype=np.int32), np.diff(self.city_offsets)
+        )
+        
+        self.names = StringTable(self._names)
+        self.descriptions = StringTable(self._descriptions)
+        self._extra_ids = np.frombuffer(self._extra_ids, dtype=np.int32).copy()
+        
+        self.coordinates = np.frombuffer(self._coordinates, dtype=np.float64).reshape(n, 2).copy()
+        self.has_location = np.frombuffer(self._has_location, dtype=np.int8).astype(bool)
+        self.duration_hours = np.frombuffer(self._duration_hours, dtype=np.float64).copy()
+        self.popularity = np.frombuffer(self._popularity, dtype=np.float64).copy()
+        self._duration_is_int = np.frombuffer(self._duration_is_int, dtype=np.int8).astype(bool)
+        self._popularity_is_int = np.frombuffer(self._popularity_is_int, dtype=np.int8).astype(bool)
+        
+        self.category_offsets = np.frombuffer(self._category_offsets, dtype=np.int64).copy()
+        self.category_ids = np.frombuffer(self._category_ids, dtype=np.int32).copy()
+        
+        # Packed (n, ceil(V / 8)) bitmask: bit v of row r is set if r has category v
+        mask = np.zeros((n, max(len(self.category_vocabulary), 1)), dtype=bool)
+        rows = np.repeat(np.arange(n), np.diff(self.category_offsets))
+        mask[rows, self.category_ids] = True
+        self.category_bits = np.packbits(mask, axis=1, bitorder='little')
+        
+        # Inverted index: rows of category v are
+        # posting_rows[posting_offsets[v]:posting_offsets[v + 1]], each row once
+        keys = np.unique(self.category_ids.astype(np.int64) * max(n, 1) + rows)
+        self.posting_rows = keys % max(n, 1)
+        self.posting_offsets = np.searchsorted(
+            keys // max(n, 1), np.arange(len(self.category_vocabulary) + 1)
+        ).astype(np.int64)
+        
+        for name in ('_city_offsets', '_names', '_descriptions', '_coordinates',
+                     '_has_location', '_duration_hours', '_popularity', '_category_offsets',
+                     '_category_ids'):
+            setattr(self, name, None)
+        self.frozen = True
+    
+    def __len__(self):
+        return int(self.city_offsets[-1]) if self.frozen else len(self._names)
+    
+    @property
+    def num_cities(self):
+        """Number of cities in the store."""
+        offsets = self.city_offsets if self.frozen else self._city_offsets
+        return len(offsets) - 1
+    
+    def city_range(self, city_idx):
+        """
+        Get the global rows of a city's attractions.
+        
+        Args:
+            city_idx (int): City index
+        
+        Returns:
+            tuple: (start, end) row range
+        """
+        return int(self.city_offsets[city_idx]), int(self.city_offsets[city_idx + 1])
+    
+    def city_slice(self, city_idx):
+        """
+        Get a slice selecting a city's rows from any column.
+        
+        Args:
+            city_idx (int): City index
+        
+        Returns:
+            slice: Row slice
+        """
+        return slice(*self.city_range(city_idx))
+    
+    def categories(self, row):
+        """
+        Get the categories of a row in their original order.
+        
+        Args:
+            row (int): Global row
+        
+        Returns:
+            list: Category names
+        """
+        ids = self.category_ids[self.category_offsets[row]:self.category_offsets[row + 1]]
+        return [self.category_vocabulary[i] for i in ids]
+    
+    def category_mask(self, category, rows=slice(None)):
+        """
+        Get which rows have a category, straight from the packed bitmask.
+        
+        Args:
+            category (str): Category name (already normalised to lower case)
+            rows (slice or numpy.ndarray): Rows to test
+        
+        Returns:
+            numpy.ndarray: Boolean mask over the selected rows
+        """
+        category_id = self.category_index.get(category)
+        if category_id is None:
+            return np.zeros(len(self.category_bits[rows]), dtype=bool)
+        column = self.category_bits[rows, category_id >> 3]
+        return (column >> (category_id & 7)) & 1 == 1
+    
+    def category_rows(self, category):
+        """
+        Look up the rows having a category in the inverted index.
+        
+        Args:
+            category (str): Category name (already normalised to lower case)
+        
+        Returns:
+            numpy.ndarray: Sorted global rows, each at most once
+        """
+        category_id = self.category_index.get(category)
+        if category_id is None:
+            return self.posting_rows[:0]
+        return self.posting_rows[self.posting_offsets[category_id]:self.posting_offsets[category_id + 1]]
+    
+    def category_matrix(self, rows=slice(None)):
+        """
+        Unpack the category bitmask of some rows.
+        
+        Args:
+            rows (slice or numpy.ndarray): Rows to unpack
+        
+        Returns:
+            numpy.ndarray: (rows, len(category_vocabulary)) boolean matrix
+        """
+        return np.unpackbits(
+            self.category_bits[rows], axis=1, count=len(self.category_vocabulary),
+            bitorder='little'
+        ).astype(bool)
+    
+    def text_for_embedding(self, row):
+        """
+        Build the text representation of a row used for embeddings.
+        
+        Args:
+            row (int): Global row
+        
+        Returns:
+            str: Name, description and categories
+        """
+        return (
+            f"{self.names[row]}. {self.descriptions[row]} "
+            f"Categories: {', '.join(self.categories(row))}"
+        )
+    
+    def embedding_texts(self, city_idx=None):
+        """
+        Build embedding texts for one city or the whole store.
+        
+        Args:
+            city_idx (int): City index, or None for every row
+        
+        Returns:
+            list: One text per row
+        """
+        start, end = self.city_range(city_idx) if city_idx is not None else (0, len(self))
+        return [self.text_for_embedding(row) for row in range(start, end)]
+    
+    def to_dict(self, row):
+        """
+        Rebuild the processed attraction dictionary of a row.
+        
+        Args:
+            row (int): Global row
+        
+        Returns:
+            dict: Attraction dictionary, as produced by AttractionDataProcessor
+        """
+        duration = float(self.duration_hours[row])
+        popularity = float(self.popularity[row])
+        attraction = {
+            'name': self.names[row],
+            'description': self.descriptions[row],
+            'categories': self.categories(row),
+            'duration_hours': int(duration) if self._duration_is_int[row] else duration,
+            'popularity': int(popularity) if self._popularity_is_int[row] else popularity,
+        }
+        if self.has_location[row]:
+            lat, lng = self.coordinates[row]
+            attraction['location'] = {'lat': float(lat), 'lng': float(lng)}
+        
+        extras = self._extra_vocabulary[self._extra_ids[row]]
+        if extras:
+            attraction.update(json.loads(extras))
+        attraction['text_for_embedding'] = self.text_for_embedding(row)
+        return attraction
+    
+    def nbytes(self):
+        """
+        Get the approximate memory used by the store's columns.
+        
+        Returns:
+            int: Size in bytes
+        """
+        arrays = (self.city_offsets, self.city_ids, self.coordinates, self.has_location,
+                  self.duration_hours, self.popularity, self._duration_is_int,
+                  self._popularity_is_int, self.category_offsets, self.category_ids,
+                  self.category_bits, self.posting_rows, self.posting_offsets,
+                  self._extra_ids)
+        return (sum(a.nbytes for a in arrays) + self.names.nbytes() +
+                self.descriptions.nbytes() +
+                sum(len(extras.encode('utf-8')) for extras in self._extra_vocabulary))
+    
+    def _intern_category(self, category):
+        """
+        Get the vocabulary id of a category, adding it if new.
+        
+        Args:
+            category (str): Category name
+        
+        Returns:
+            int: Category id
+        """
+        category_id = self.category_index.get(category)
+        if category_id is None:
+            category_id = len(self.category_vocabulary)
+            self.category_index[category] = category_id
+            self.category_vocabulary.append(category)
+        return category_id
+    
+    def _intern_extras(self, encoded):
+        """
+        Get the id of an encoded set of non-column fields, adding it if new.
+        
+        Args:
+            encoded (str): JSON encoding of the fields
+        
+        Returns:
+            int: Extras id
+        """
+        extras_id = self._extra_index.get(encoded)
+        if extras_id is None:
+            extras_id = len(self._extra_vocabulary)
+            self._extra_index[encoded] = extras_id
+            self._extra_vocabulary.append(encoded)
+        return extras_id
@@ -0,0 +1,164 @@
+"""
+Incremental reader for large attraction catalogs
+"""
+
+import json
+
+_WHITESPACE = ' \t\n\r'
+_NUMBER_CHARS = '0123456789+-.eE'
+
+class _JsonStream:
+    """Buffered reader that decodes one JSON value at a time from a text file."""
+    
+    def __init__(self, f, chunk_size):
+        """
+        Initialize the stream.
+        
+        Args:
+            f (file): Text file opened for reading
+            chunk_size (int): Number of characters read at a time
+        """
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+    
+    def _fill(self, min_chars):
+        """
+        Read more input, dropping the consumed part of the buffer.
+        
+        Args:
+            min_chars (int): Number of characters to try to read
+        
+        Returns:
+            bool: False if the end of the file was reached
+        """
+        if self.eof:
+            return False
+        chunk = self.f.read(max(min_chars, self.chunk_size))
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """
+        Skip whitespace and return the next character without consuming it.
+        
+        Returns:
+            str: Next character, or '' at the end of the file
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill(self.chunk_size):
+                return ''
+    
+    def expect(self, chars):
+        """
+        Consume the next character, which must be one of chars.
+        
+        Args:
+            chars (str): Accepted characters
+        
+        Returns:
+            str: The consumed character
+        
+        Raises:
+            json.JSONDecodeError: If another character (or the end of the file) follows
+        """
+        char = self.peek()
+        if not char or char not in chars:
+            raise json.JSONDecodeError(f"Expected one of {chars!r}", self.buffer, self.pos)
+        self.pos += 1
+        return char
+    
+    def decode(self):
+        """
+        Decode the next complete JSON value, reading more input as needed.
+        
+        Returns:
+            object: The decoded value
+        
+        Raises:
+            json.JSONDecodeError: If the input is not valid JSON
+        """
+        self.peek()
+        read = self.chunk_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill(read):
+                    raise
+            else:
+                # A number cut off by the buffer end ('12' of '123', '1.5' of
+                # '1.5e3') still decodes, so only trust it once a delimiter follows
+                if self.eof or self.buffer[end:].strip(_NUMBER_CHARS):
+                    self.pos = end
+                    return value
+                self._fill(read)
+            # Grow reads geometrically so huge values are not re-parsed too often
+            read *= 2
+
+
+def iter_catalog_cities(path, chunk_size=1 << 20):
+    """
+    Yield the cities of a {"cities": [...]} catalog one at a time.
+    
+    Only one city (plus a read buffer) is held in memory at once, so the
+    catalog can be much larger than the memory available to parse it.
+    Top-level keys other than 'cities' are decoded and discarded.
+    
+    Args:
+        path (str or Path): Path to the catalog JSON file
+        chunk_size (int): Number of characters read at a time
+    
+    Yields:
+        dict: Raw city dictionaries in file order
+    
+    Raises:
+        FileNotFoundError: If the file does not exist
+        json.JSONDecodeError: If the file is not valid JSON
+        ValueError: If the file has no top-level 'cities' list
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        stream = _JsonStream(f, chunk_size)
+        stream.expect('{')
+        found = False
+        
+        if stream.peek() == '}':
+            stream.expect('}')
+        else:
+            while True:
+                key = stream.decode()
+                if not isinstance(key, str):
+                    raise json.JSONDecodeError("Expected an object key", stream.buffer, stream.pos)
+                stream.expect(':')
+                
+                if key == 'cities' and stream.peek() == '[':
+                    found = True
+                    stream.expect('[')
+                    if stream.peek() == ']':
+                        stream.expect(']')
+                    else:
+                        while True:
+                            yield stream.decode()
+                            if stream.expect(',]') == ']':
+                                break
+                else:
+                    stream.decode()
+                
+                if stream.expect(',}') == '}':
+                    break
+        
+        if stream.peek():
+            raise json.JSONDecodeError("Extra data", stream.buffer, stream.pos)
+        if not found:
+            raise ValueError("Data format error: 'cities' key not found in the data.")
@@ -2,16 +2,94 @@
 City data processing module for the Intelligent Itinerary Planner
 """
 
-from geopy.distance import great_circle
+import numpy as np
+
+# Mean earth radius in kilometers (same value geopy's great_circle uses)
+EARTH_RADIUS_KM = 6371.009
+
+# Fallback coordinates for well-known cities whose data has neither a
+# location nor any located attractions
+KNOWN_CITY_COORDINATES = {
+    "Paris": (48.8566, 2.3522),
+    "Barcelona": (41.3851, 2.1734),
+    "Rome": (41.9028, 12.4964),
+    "Amsterdam": (52.3676, 4.9041),
+    "London": (51.5074, -0.1278),
+    "Berlin": (52.5200, 13.4050),
+    "Prague": (50.0755, 14.4378),
+    "Vienna": (48.2082, 16.3738),
+    "Budapest": (47.4979, 19.0402),
+    "Athens": (37.9838, 23.7275),
+    "Madrid": (40.4168, -3.7038),
+    "Lisbon": (38.7223, -9.1393),
+    "Dublin": (53.3498, -6.2603),
+    "Stockholm": (59.3293, 18.0686),
+    "Copenhagen": (55.6761, 12.5683),
+    "Oslo": (59.9139, 10.7522),
+    "Helsinki": (60.1699, 24.9384),
+    "Warsaw": (52.2297, 21.0122),
+}
 
 class CityDataHelper:
     """Helper functions for working with city data."""
     
+    @staticmethod
+    def get_city_coordinates(city):
+        """
+        Get representative coordinates for a city.
+        
+        Uses the city's own 'location' ({'lat', 'lng'}) if the dataset has one,
+        otherwise the centroid of its attractions' locations, otherwise a
+        built-in table of well-known cities.
+        
+        Args:
+            city (dict): City data
+            
+        Returns:
+            tuple: (lat, lng) in degrees, or None if the location is unknown
+        """
+        location = city.get('location')
+        if isinstance(location, dict):
+            try:
+                return float(location['lat']), float(location['lng'])
+            except (KeyError, TypeError, ValueError):
+                pass
+        
+        attractions = city.get('attractions') or []
+        if attractions:
+            coords, valid = CityDataHelper.get_attraction_coordinates(attractions)
+            if valid.any():
+                lat, lng = CityDataHelper._centroid(coords[valid])
+                return lat, lng
+        
+        return KNOWN_CITY_COORDINATES.get(city.get('name'))
+    
+    @staticmethod
+    def _centroid(coords):
+        """
+        Calculate the spherical centroid of points given in degrees.
+        
+        Args:
+            coords (numpy.ndarray): (n, 2) array of (lat, lng) in degrees
+            
+        Returns:
+            tuple: (lat, lng) of the centroid in degrees
+        """
+        lat, lng = np.radians(coords[:, 0]), np.radians(coords[:, 1])
+        x = np.mean(np.cos(lat) * np.cos(lng))
+        y = np.mean(np.cos(lat) * np.sin(lng))
+        z = np.mean(np.sin(lat))
+        return (float(np.degrees(np.arctan2(z, np.hypot(x, y)))),
+                float(np.degrees(np.arctan2(y, x))))
+    
     @staticmethod
     def calculate_distance_between_cities(city1, city2):
         """
         Calculate the approximate travel distance between two cities.
         
+        For repeated lookups use CityDistanceMatrix, which computes every
+        pair once.
+        
         Args:
             city1 (dict): First city data
             city2 (dict): Second city data
@@ -19,40 +97,22 @@ class CityDataHelper:
         Returns:
             float: Distance in kilometers between the cities
             
+        Raises:
+            ValueError: If the location of either city is unknown
+            
         Note:
             This is a simplified approach. In a real system, we might use
             an external API for more accurate travel distances/times.
         """
-        # Use representative coordinates for each city
-        # In a real system, these would be stored in the city data
-        city_coords = {
-            "Paris": (48.8566, 2.3522),
-            "Barcelona": (41.3851, 2.1734),
-            "Rome": (41.9028, 12.4964),
-            "Amsterdam": (52.3676, 4.9041),
-            "London": (51.5074, -0.1278),
-            "Berlin": (52.5200, 13.4050),
-            "Prague": (50.0755, 14.4378),
-            "Vienna": (48.2082, 16.3738),
-            "Budapest": (47.4979, 19.0402),
-            "Athens": (37.9838, 23.7275),
-            "Madrid": (40.4168, -3.7038),
-            "Lisbon": (38.7223, -9.1393),
-            "Dublin": (53.3498, -6.2603),
-            "Stockholm": (59.3293, 18.0686),
-            "Copenhagen": (55.6761, 12.5683),
-            "Oslo": (59.9139, 10.7522),
-            "Helsinki": (60.1699, 24.9384),
-            "Warsaw": (52.2297, 21.0122),
-            # Default coordinates if city not found
-            "default": (0, 0)
-        }
-        
-        # Get coordinates for both cities
-        coord1 = city_coords.get(city1['name'], city_coords["default"])
-        coord2 = city_coords.get(city2['name'], city_coords["default"])
+        coord1 = CityDataHelper.get_city_coordinates(city1)
+        coord2 = CityDataHelper.get_city_coordinates(city2)
+        for city, coord in ((city1, coord1), (city2, coord2)):
+            if coord is None:
+                raise ValueError(f"Unknown location for city: {city.get('name', 'Unknown')}")
         
         # Calculate distance using great circle distance (as the crow flies)
+        from geopy.distance import great_circle
+        
         distance = great_circle(coord1, coord2).kilometers
         
         return distance
@@ -86,36 +146,238 @@ class CityDataHelper:
         return round(travel_time, 1), travel_mode
     
     @staticmethod
-    def calculate_distances_between_attractions(attractions):
+    def estimate_travel_times(distances):
         """
-        Calculate distances between attractions within a city.
+        Vectorized version of estimate_travel_time for an array of distances.
+        
+        Args:
+            distances (numpy.ndarray): Distances in kilometers
+            
+        Returns:
+            numpy.ndarray: Estimated travel times in hours (rounded to 0.1)
+            numpy.ndarray: Travel modes ('flight', 'train' or 'bus')
+        """
+        distances = np.asarray(distances, dtype=np.float64)
+        flight = distances > 800
+        train = (distances > 300) & ~flight
+        
+        travel_times = np.select(
+            [flight, train],
+            [2 + distances / 800, 1 + distances / 150],
+            default=0.5 + distances / 100
+        )
+        travel_modes = np.select(
+            [flight, train | (distances > 100)],
+            ['flight', 'train'],
+            default='bus'
+        )
+        
+        return np.round(travel_times, 1), travel_modes
+    
+    @staticmethod
+    def get_attraction_coordinates(attractions):
+        """
+        Extract attraction coordinates into an array.
         
         Args:
             attractions (list): List of attraction dictionaries with location data
             
         Returns:
-            list: 2D matrix of distances between attractions
+            numpy.ndarray: (n, 2) array of (lat, lng) in degrees, 0 where missing
+            numpy.ndarray: Boolean mask, True where the attraction has a valid location
         """
+        # Columnar views (data.attraction_store.AttractionRows) already hold the arrays
+        if hasattr(attractions, 'coordinate_arrays'):
+            return attractions.coordinate_arrays()
+        
         n = len(attractions)
-        distances = [[0 for _ in range(n)] for _ in range(n)]
+        coords = np.zeros((n, 2))
+        valid = np.zeros(n, dtype=bool)
+        
+        for i, attraction in enumerate(attractions):
+            location = attraction.get('location')
+            if not isinstance(location, dict):
+                continue
+            try:
+                coords[i] = (float(location['lat']), float(location['lng']))
+                valid[i] = True
+            except (KeyError, TypeError, ValueError):
+                continue
         
-        for i in range(n):
-            for j in range(i+1, n):
-                # Get locations
-                loc_i = attractions[i].get('location', {'lat': 0, 'lng': 0})
-                loc_j = attractions[j].get('location', {'lat': 0, 'lng': 0})
+        return coords, valid
+    
+    @staticmethod
+    def calculate_distance_matrix(coords_a, coords_b=None, method='haversine',
+                                  dtype=np.float64, block_size=1024):
+        """
+        Calculate great-circle distances between two sets of coordinates.
+        
+        The matrix is filled in square blocks so that temporary arrays never
+        exceed block_size x block_size elements, however many points there are.
+        
+        Args:
+            coords_a (numpy.ndarray): (n, 2) array of (lat, lng) in degrees
+            coords_b (numpy.ndarray): (m, 2) array of (lat, lng) in degrees,
+                defaults to coords_a
+            method (str): 'haversine' (exact) or 'equirectangular' (faster,
+                accurate for the short distances within a city)
+            dtype (numpy.dtype): Output dtype, e.g. numpy.float32 to halve memory
+            block_size (int): Side length of the blocks computed at once
+            
+        Returns:
+            numpy.ndarray: (n, m) matrix of distances in kilometers
+        """
+        if method not in ('haversine', 'equirectangular'):
+            raise ValueError(f"Unknown distance method: {method}")
+        
+        rad_a = np.radians(np.asarray(coords_a, dtype=np.float64).reshape(-1, 2))
+        rad_b = rad_a if coords_b is None else np.radians(
+            np.asarray(coords_b, dtype=np.float64).reshape(-1, 2)
+        )
+        n, m = len(rad_a), len(rad_b)
+        distances = np.empty((n, m), dtype=dtype)
+        
+        for row_start in range(0, n, block_size):
+            lat1 = rad_a[row_start:row_start + block_size, 0][:, np.newaxis]
+            lng1 = rad_a[row_start:row_start + block_size, 1][:, np.newaxis]
+            
+            for col_start in range(0, m, block_size):
+                lat2 = rad_b[col_start:col_start + block_size, 0][np.newaxis, :]
+                lng2 = rad_b[col_start:col_start + block_size, 1][np.newaxis, :]
                 
-                # Calculate distance
-                try:
-                    dist = great_circle(
-                        (loc_i['lat'], loc_i['lng']),
-                        (loc_j['lat'], loc_j['lng'])
-                    ).kilometers
-                    
-                    # Store distance in both directions
-                    distances[i][j] = distances[j][i] = dist
-                except:
-                    # Default distance if calculation fails
-                    distances[i][j] = distances[j][i] = 2.0
-        
-        return distances
\ No newline at end of file
+                dlat = lat2 - lat1
+                dlng = lng2 - lng1
+                
+                if method == 'haversine':
+                    a = (np.sin(dlat / 2) ** 2 +
+                         np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2)
+                    block = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+                else:
+                    # Wrap longitude differences across the antimeridian
+                    dlng = (dlng + np.pi) % (2 * np.pi) - np.pi
+                    x = dlng * np.cos((lat1 + lat2) / 2)
+                    block = EARTH_RADIUS_KM * np.hypot(x, dlat)
+                
+                distances[row_start:row_start + block_size,
+                          col_start:col_start + block_size] = block
+        
+        return distances
+    
+    @staticmethod
+    def calculate_distances_between_attractions(attractions, method='haversine',
+                                                dtype=np.float64, block_size=1024,
+                                                missing_distance=2.0):
+        """
+        Calculate distances between attractions within a city.
+        
+        Args:
+            attractions (list): List of attraction dictionaries with location data
+            method (str): 'haversine' or 'equirectangular'
+            dtype (numpy.dtype): Output dtype (numpy.float64 or numpy.float32)
+            block_size (int): Side length of the blocks computed at once
+            missing_distance (float): Distance in kilometers assumed to and
+                from attractions without a valid location
+            
+        Returns:
+            numpy.ndarray: (n, n) matrix of distances between attractions in kilometers
+        """
+        coords, valid = CityDataHelper.get_attraction_coordinates(attractions)
+        return CityDataHelper.calculate_masked_distance_matrix(
+            coords, valid, method=method, dtype=dtype,
+            block_size=block_size, missing_distance=missing_distance
+        )
+    
+    @staticmethod
+    def calculate_masked_distance_matrix(coords, valid, method='haversine',
+                                         dtype=np.float64, block_size=1024,
+                                         missing_distance=2.0):
+        """
+        Calculate a square distance matrix, substituting a default for unknown locations.
+        
+        Args:
+            coords (numpy.ndarray): (n, 2) array of (lat, lng) in degrees
+            valid (numpy.ndarray): Boolean mask, True where the location is known
+            method (str): 'haversine' or 'equirectangular'
+            dtype (numpy.dtype): Output dtype (numpy.float64 or numpy.float32)
+            block_size (int): Side length of the blocks computed at once
+            missing_distance (float): Distance in kilometers assumed to and
+                from points without a valid location
+            
+        Returns:
+            numpy.ndarray: (n, n) matrix of distances in kilometers
+        """
+        distances = CityDataHelper.calculate_distance_matrix(
+            coords, method=method, dtype=dtype, block_size=block_size
+        )
+        
+        # Distances involving an unknown location fall back to a default
+        if not valid.all():
+            invalid = ~valid
+            distances[invalid, :] = missing_distance
+            distances[:, invalid] = missing_distance
+        np.fill_diagonal(distances, 0)
+        
+        return distances
+
+
+class CityDistanceMatrix:
+    """Distances and travel times between every pair of cities, computed once."""
+    
+    def __init__(self, cities_data, default_distance_km=500.0):
+        """
+        Build the city distance and travel-time matrices.
+        
+        Args:
+            cities_data (list): List of city dictionaries
+            default_distance_km (float): Distance assumed to and from cities
+                whose location is unknown
+        """
+        self.city_names = [city['name'] for city in cities_data]
+        self.index = {name: idx for idx, name in enumerate(self.city_names)}
+        
+        n = len(cities_data)
+        self.coordinates = np.zeros((n, 2))
+        known = np.zeros(n, dtype=bool)
+        for idx, city in enumerate(cities_data):
+            coords = CityDataHelper.get_city_coordinates(city)
+            if coords is not None:
+                self.coordinates[idx] = coords
+                known[idx] = True
+        
+        unknown = [self.city_names[idx] for idx in np.nonzero(~known)[0]]
+        if unknown:
+            print(f"No location for cities {', '.join(unknown)}; "
+                  f"assuming {default_distance_km:.0f} km to other cities")
+        
+        self.distances = CityDataHelper.calculate_masked_distance_matrix(
+            self.coordinates, known, missing_distance=default_distance_km
+        )
+        self.travel_times, self.travel_modes = CityDataHelper.estimate_travel_times(self.distances)
+    
+    def distance(self, city1_idx, city2_idx):
+        """
+        Get the distance between two cities.
+        
+        Args:
+            city1_idx (int): Index of the first city
+            city2_idx (int): Index of the second city
+            
+        Returns:
+            float: Distance in kilometers
+        """
+        return float(self.distances[city1_idx, city2_idx])
+    
+    def travel(self, city1_idx, city2_idx):
+        """
+        Get the estimated travel time and mode between two cities.
+        
+        Args:
+            city1_idx (int): Index of the departure city
+            city2_idx (int): Index of the arrival city
+            
+        Returns:
+            float: Estimated travel time in hours
+            str: Travel mode (flight, train, or bus)
+        """
+        return (float(self.travel_times[city1_idx, city2_idx]),
+                str(self.travel_modes[city1_idx, city2_idx]))
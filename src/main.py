@@ -9,31 +9,153 @@ import sys
 import os
 from pathlib import Path
 
-from data.attraction_data import AttractionDataProcessor
-from models.embedding_model import TransformerEmbeddingModel, SimpleEmbeddingModel
-from algorithms.similarity_calculator import SemanticSimilarityCalculator
-from algorithms.itinerary_optimizer import ItineraryOptimizer
-from algorithms.route_planner import RoutePlanner
-from utils.helpers import format_itinerary_output
+from algorithms.route_solvers import ROUTE_SOLVERS
+from models.embedding_model import EMBEDDING_BACKENDS
+from models.embedding_store import EMBEDDING_DTYPES
+from planner import ItineraryPlanner, read_requests, write_results
+from service import PlannerService
+from utils import tracing
 
 def parse_arguments():
     """Parse command line arguments."""
     parser = argparse.ArgumentParser(description='Intelligent Itinerary Planner')
     parser.add_argument('--use-transformer', action='store_true',
                         help='Use transformer model for embeddings')
-    parser.add_argument('--days', type=int, required=True,
+    parser.add_argument('--days', type=int,
                         help='Number of days for the trip')
-    parser.add_argument('--preferences', nargs='+', required=True,
+    parser.add_argument('--preferences', nargs='+',
                         help='Travel preferences (e.g., art museum cultural)')
-    parser.add_argument('--pace', type=str, default='moderate',
+    parser.add_argument('--pace', type=str, default=None,
                         choices=['relaxed', 'moderate', 'fast'],
-                        help='Travel pace: relaxed, moderate, or fast')
-    parser.add_argument('--output', type=str, required=True,
-                        help='Output JSON file name')
+                        help='Travel pace: relaxed, moderate, or fast (default: moderate, '
+                             'or the previous pace with --replan)')
+    parser.add_argument('--output', type=str,
+                        help='Output JSON file name (JSON Lines with --batch)')
+    parser.add_argument('--batch', type=str, default=None,
+                        help='JSON Lines file of requests ({"days", "preferences", "pace", ...} '
+                             'per line) to plan in one process')
+    parser.add_argument('--replan', type=str, default=None, metavar='ITINERARY',
+                        help='Itinerary JSON file to re-plan with the changes given by '
+                             '--days, --drop-cities, --pace, --start-city and --end-city')
+    parser.add_argument('--drop-cities', nargs='+', default=None,
+                        help='Cities to leave out of the --replan itinerary')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run a planner service that keeps the model and catalog loaded')
+    parser.add_argument('--host', type=str, default='127.0.0.1',
+                        help='Interface for --serve (default: 127.0.0.1)')
+    parser.add_argument('--port', type=int, default=8765,
+                        help='Port for --serve (default: 8765)')
     parser.add_argument('--data', type=str, default=None,
                         help='Path to attraction data JSON file (default: use built-in sample data)')
+    parser.add_argument('--cities', nargs='+', default=None,
+                        help='Only load and plan these cities from the attraction data')
+    parser.add_argument('--embedding-cache', type=str, default=None,
+                        help='Directory for the persistent transformer embedding cache')
+    parser.add_argument('--embedding-cache-size', type=int, default=512,
+                        help='Maximum size of the embedding cache in MB (default: 512)')
+    parser.add_argument('--encode-batch-size', type=int, default=64,
+                        help='Batch size for the single catalog-wide encode (default: 64)')
+    parser.add_argument('--per-city-encode', action='store_true',
+                        help='Encode each city separately instead of in one batched pass')
+    parser.add_argument('--start-city', type=str, default=None,
+                        help='City the trip must start in (if it is visited)')
+    parser.add_argument('--end-city', type=str, default=None,
+                        help='City the trip must end in (if it is visited)')
+    parser.add_argument('--route-solver', type=str, default='auto',
+                        choices=sorted(ROUTE_SOLVERS),
+                        help='Solver used to order each day\'s attractions (default: auto)')
+    parser.add_argument('--route-time-limit', type=float, default=0.05,
+                        help='Time budget in seconds for each day\'s route (default: 0.05)')
+    parser.add_argument('--day-engine', type=str, default='greedy',
+                        choices=['greedy', 'ortools'],
+                        help='How attractions are split into days (default: greedy)')
+    parser.add_argument('--day-engine-time-limit', type=float, default=2.0,
+                        help='OR-Tools time limit in seconds per city (default: 2.0)')
+    parser.add_argument('--similarity', type=str, default='lazy',
+                        choices=['lazy', 'knn', 'dense'],
+                        help='Per-city similarity representation: rows computed on demand, '
+                             'sparse k-nearest-neighbour graphs or full matrices (default: lazy)')
+    parser.add_argument('--similarity-neighbors', type=int, default=10,
+                        help='Neighbours per attraction with --similarity knn (default: 10)')
+    parser.add_argument('--embedding-backend', type=str, default=None, choices=EMBEDDING_BACKENDS,
+                        help='Embedding model: per-call TF-IDF, sparse TF-IDF fitted once over the '
+                             'catalog, transformer (PyTorch) or onnx (ONNX Runtime, needs '
+                             '--onnx-model) (default: tfidf, or transformer with --use-transformer)')
+    parser.add_argument('--onnx-model', type=str, default=None, metavar='DIR',
+                        help='Exported ONNX model directory (model.onnx, tokenizer.json) '
+                             'for --embedding-backend onnx')
+    parser.add_argument('--onnx-quantize', action='store_true',
+                        help='Run the ONNX model with int8 dynamic quantization')
+    parser.add_argument('--onnx-threads', type=int, default=None,
+                        help='ONNX Runtime intra-op threads (default: all physical cores)')
+    parser.add_argument('--embedding-dtype', type=str, default=None, choices=EMBEDDING_DTYPES,
+                        help='Store the attraction embeddings as float32, float16 or per-row '
+                             'scaled int8 (default: as returned by the model)')
+    parser.add_argument('--allocator', type=str, default='dp', choices=['dp', 'greedy'],
+                        help='Day allocation across cities: dp (best value that fits the '
+                             'day budget, transition days included) or greedy (the previous '
+                             'score-proportional allocation) (default: dp)')
+    parser.add_argument('--plan-workers', type=int, default=1, metavar='N',
+                        help='Plan the cities of an itinerary with N concurrent workers '
+                             '(default: 1, one city after another)')
+    parser.add_argument('--plan-parallel', type=str, default='thread',
+                        choices=['thread', 'process'],
+                        help='Worker threads (shared caches) or processes (no GIL '
+                             'contention) for --plan-workers (default: thread)')
+    parser.add_argument('--trace', type=str, default=None, metavar='FILE',
+                        help='Record per-stage spans and write them as Chrome trace JSON')
+    parser.add_argument('--profile', type=str, default=None, metavar='DIR',
+                        help='Trace and cProfile every pipeline stage, writing trace.json, '
+                             'spans.json and one .prof file per stage to DIR')
+    parser.add_argument('--ann-index', action='store_true',
+                        help='Score cities by their best semantic matches from a vector index '
+                             'saved next to the data file (needs --use-transformer)')
+    parser.add_argument('--ann-nprobe', type=int, default=8,
+                        help='Vector index clusters scanned per query (default: 8)')
+    parser.add_argument('--search', type=int, default=None, metavar='K',
+                        help='Write the K attractions best matching --preferences across '
+                             'all cities to --output instead of planning')
     
-    return parser.parse_args()
+    args = parser.parse_args()
+    if args.embedding_backend == 'onnx' and not args.onnx_model:
+        parser.error('--embedding-backend onnx needs --onnx-model')
+    if args.serve:
+        return args
+    if not args.output:
+        parser.error('--output is required unless --serve is given')
+    if args.replan:
+        return args
+    args.pace = args.pace or 'moderate'
+    if args.search is not None:
+        if not args.preferences:
+            parser.error('--search needs --preferences')
+        return args
+    if not args.batch and (args.days is None or not args.preferences):
+        parser.error('--days and --preferences are required unless --batch or --serve is given')
+    
+    return args
+
+def write_trace(tracer, args):
+    """
+    Write the recorded spans and print where the time went.
+    
+    Args:
+        tracer (Tracer): Tracer of this run
+        args (argparse.Namespace): Parsed arguments (--trace / --profile)
+    """
+    summary = tracer.summary()
+    trace_path = args.trace
+    if args.profile:
+        trace_path = trace_path or os.path.join(args.profile, 'trace.json')
+        with open(os.path.join(args.profile, 'spans.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+    tracer.export_chrome_trace(trace_path)
+    
+    print(f"{'span':<40} {'calls':>7} {'items':>9} {'total ms':>10} {'max ms':>9}")
+    for name, stats in summary.items():
+        print(f"{name:<40} {stats['count']:>7} {stats['items']:>9} "
+              f"{stats['total_ms']:>10.1f} {stats['max_ms']:>9.1f}")
+    print(f"Trace saved to {trace_path}" + (f", profiles to {args.profile}" if args.profile else ''))
 
 def main():
     """Main execution function."""
@@ -43,9 +165,18 @@ def main():
     print("=" * 80)
     print("Intelligent Itinerary Planner")
     print("=" * 80)
-    print(f"Days: {args.days}")
-    print(f"Preferences: {', '.join(args.preferences)}")
-    print(f"Pace: {args.pace}")
+    if args.serve:
+        print(f"Service: http://{args.host}:{args.port}")
+    elif args.batch:
+        print(f"Batch requests: {args.batch}")
+    elif args.search is not None:
+        print(f"Search: top {args.search} for {', '.join(args.preferences)}")
+    elif args.replan:
+        print(f"Re-planning: {args.replan}")
+    else:
+        print(f"Days: {args.days}")
+        print(f"Preferences: {', '.join(args.preferences)}")
+        print(f"Pace: {args.pace}")
     print(f"Using Transformer: {args.use_transformer}")
     print("=" * 80)
     
@@ -57,55 +188,116 @@ def main():
         script_dir = Path(__file__).parent
         data_path = script_dir / "data" / "sample_attractions.json"
     
+    tracer = None
+    if args.trace or args.profile:
+        tracer = tracing.enable(profile_dir=args.profile)
+    
+    planner = None
     try:
-        # Step 1: Load and preprocess data
-        print("Loading and preprocessing attraction data...")
-        data_processor = AttractionDataProcessor(data_path)
-        cities_data = data_processor.get_processed_data()
-        
-        # Step 2: Initialize embedding model
-        print("Initializing embedding model...")
-        if args.use_transformer:
-            embedding_model = TransformerEmbeddingModel()
-        else:
-            embedding_model = SimpleEmbeddingModel()
-        
-        # Step 3: Calculate attraction similarities
-        print("Calculating attraction similarities...")
-        similarity_calculator = SemanticSimilarityCalculator(embedding_model)
-        similarity_matrices = similarity_calculator.calculate_similarities(
-            cities_data, args.preferences
+        # Steps 1-2: Load and preprocess data, initialize embedding model
+        print("Loading attraction data and embedding model...")
+        planner = ItineraryPlanner(
+            data_path,
+            cities=args.cities,
+            use_transformer=args.use_transformer,
+            embedding_cache_dir=args.embedding_cache,
+            embedding_cache_size=args.embedding_cache_size,
+            encode_batch_size=args.encode_batch_size,
+            per_city_encode=args.per_city_encode,
+            route_solver=args.route_solver,
+            route_time_limit=args.route_time_limit,
+            day_engine=args.day_engine,
+            day_engine_time_limit=args.day_engine_time_limit,
+            ann_index=args.ann_index,
+            ann_nprobe=args.ann_nprobe,
+            similarity_format=args.similarity,
+            similarity_neighbors=args.similarity_neighbors,
+            embedding_dtype=args.embedding_dtype,
+            embedding_backend=args.embedding_backend,
+            onnx_model_dir=args.onnx_model,
+            onnx_quantize=args.onnx_quantize,
+            onnx_threads=args.onnx_threads,
+            plan_workers=args.plan_workers,
+            plan_parallel=args.plan_parallel,
+            allocator=args.allocator
         )
         
-        # Step 4: Optimize itinerary across cities
-        print("Planning optimal city allocation...")
-        itinerary_optimizer = ItineraryOptimizer(
-            cities_data, similarity_matrices, args.preferences, args.pace
-        )
-        city_allocation = itinerary_optimizer.allocate_days(args.days)
-        
-        # Step 5: Plan routes within each city
-        print("Planning daily routes...")
-        route_planner = RoutePlanner(cities_data, similarity_matrices)
-        itinerary = route_planner.create_itinerary(city_allocation, args.preferences, args.pace)
-        
-        # Step 6: Format and save the itinerary output
-        print("Formatting itinerary output...")
-        output_itinerary = format_itinerary_output(itinerary, args.preferences, args.pace)
+        if args.serve:
+            # Build the request-independent state once, then answer from memory
+            print("Warming up planner state...")
+            planner.warm_up()
+            PlannerService(planner, host=args.host, port=args.port).serve_forever()
+            return
         
         # Save the output
         output_dir = os.path.dirname(args.output)
         if output_dir and not os.path.exists(output_dir):
             os.makedirs(output_dir)
-            
-        with open(args.output, 'w', encoding='utf-8') as f:
-            json.dump(output_itinerary, f, indent=2, ensure_ascii=False)
         
-        print(f"Itinerary successfully generated and saved to {args.output}")
+        if args.replan:
+            # Re-run allocation and routing only where the changes require it
+            with open(args.replan, 'r', encoding='utf-8') as f:
+                previous = json.load(f)
+            output_itinerary = planner.replan(
+                previous, days=args.days, drop_cities=args.drop_cities, pace=args.pace,
+                start_city=args.start_city, end_city=args.end_city
+            )
+            
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(output_itinerary, f, indent=2, ensure_ascii=False)
+            
+            reused = planner.replan_stats['reused_days']
+            planned = planner.replan_stats['planned_days']
+            print(f"Itinerary re-planned ({reused} days reused, {planned} planned) "
+                  f"and saved to {args.output}")
+        elif args.search is not None:
+            # Nearest-neighbour lookup over every attraction in the catalog
+            matches = planner.search_attractions(args.preferences, k=args.search)
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump({'preferences': args.preferences, 'results': matches},
+                          f, indent=2, ensure_ascii=False)
+            
+            print(f"{len(matches)} matches saved to {args.output}")
+        elif args.batch:
+            # Steps 3-6 for every request, sharing embeddings and distance data
+            requests = read_requests(args.batch)
+            print(f"Planning {len(requests)} itineraries...")
+            results = planner.plan_batch(requests)
+            write_results(args.output, results)
+            
+            failed = sum(1 for result in results if 'error' in result)
+            print(f"{len(results) - failed} itineraries planned, {failed} failed; "
+                  f"results saved to {args.output}")
+        else:
+            # Steps 3-6: Similarities, city allocation, daily routes, formatting
+            print("Planning itinerary...")
+            output_itinerary = planner.plan(
+                args.days, args.preferences, args.pace, args.start_city, args.end_city
+            )
+            
+            with open(args.output, 'w', encoding='utf-8') as f:
+                json.dump(output_itinerary, f, indent=2, ensure_ascii=False)
+            
+            print(f"Itinerary successfully generated and saved to {args.output}")
+            
+            route_stats = planner.stats()['routes']
+            if route_stats['routes']:
+                print(f"Walking distance: {route_stats['initial_length_km']:.1f} km before "
+                      f"route optimization, {route_stats['final_length_km']:.1f} km after")
         
+        if planner.embedding_model.cache is not None:
+            stats = planner.embedding_model.cache.stats()
+            print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses")
+    
     except Exception as e:
         print(f"Error: {str(e)}")
         sys.exit(1)
+    
+    finally:
+        if planner is not None:
+            planner.close()
+        if tracer is not None:
+            write_trace(tracing.disable(), args)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
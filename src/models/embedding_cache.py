@@ -0,0 +1,253 @@
+"""
+Persistent, content-addressed cache for text embeddings
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+class EmbeddingCache:
+    """Store embeddings on disk keyed by model name and text hash."""
+    
+    INDEX_FILE = 'index.json'
+    
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, shard_rows=4096):
+        """
+        Initialize the embedding cache.
+        
+        Args:
+            cache_dir (str or Path): Directory holding the index and .npy shards
+            max_bytes (int): Upper bound on the total size of all shards
+            shard_rows (int): Maximum number of embeddings written per shard
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.shard_rows = shard_rows
+        
+        self.hits = 0
+        self.misses = 0
+        
+        self._shards = {}  # shard name -> {'rows', 'bytes', 'last_used'}
+        self._entries = {}  # key -> (shard name, row)
+        self._open_shards = {}  # shard name -> memory-mapped array
+        self._next_shard = 0
+        self._dirty = False
+        # Shard recency changed by lookups only; written with the next change or on close
+        self._recency_changed = False
+        self._load_index()
+    
+    @staticmethod
+    def make_key(model_name, text):
+        """
+        Build the content address for a text under a given model.
+        
+        Args:
+            model_name (str): Name of the embedding model
+            text (str): Text that was embedded
+        
+        Returns:
+            str: Hex digest identifying the (model, text) pair
+        """
+        digest = hashlib.sha256()
+        digest.update(model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get_many(self, model_name, texts):
+        """
+        Look up cached embeddings for a list of texts.
+        
+        Args:
+            model_name (str): Name of the embedding model
+            texts (list): Texts to look up
+        
+        Returns:
+            list: One embedding (numpy.ndarray) per text, or None for misses
+        """
+        results = []
+        now = time.time()
+        
+        for text in texts:
+            entry = self._entries.get(self.make_key(model_name, text))
+            if entry is None:
+                self.misses += 1
+                results.append(None)
+                continue
+            
+            shard_name, row = entry
+            shard = self._open_shard(shard_name)
+            if shard is None:
+                self.misses += 1
+                results.append(None)
+                continue
+            
+            self.hits += 1
+            self._shards[shard_name]['last_used'] = now
+            self._recency_changed = True
+            results.append(shard[row])
+        
+        return results
+    
+    def put_many(self, model_name, texts, embeddings):
+        """
+        Add embeddings to the cache, evicting old shards if over budget.
+        
+        Args:
+            model_name (str): Name of the embedding model
+            texts (list): Texts that were embedded
+            embeddings (numpy.ndarray): Embeddings, one row per text
+        """
+        embeddings = np.asarray(embeddings)
+        if len(texts) == 0 or embeddings.ndim != 2:
+            return
+        
+        for start in range(0, len(texts), self.shard_rows):
+            chunk = np.ascontiguousarray(embeddings[start:start + self.shard_rows])
+            shard_name = f"shard_{self._next_shard:06d}"
+            self._next_shard += 1
+            
+            np.save(self.cache_dir / f"{shard_name}.npy", chunk)
+            self._shards[shard_name] = {
+                'rows': len(chunk),
+                'bytes': int(chunk.nbytes),
+                'last_used': time.time()
+            }
+            for row, text in enumerate(texts[start:start + self.shard_rows]):
+                self._entries[self.make_key(model_name, text)] = (shard_name, row)
+        
+        self._evict()
+        self._dirty = True
+        self.flush()
+    
+    def flush(self):
+        """
+        Write the index to disk if entries or shards have changed.
+        
+        Lookups alone do not rewrite the index; the shard recency they
+        update is written along with the next change (or by close).
+        """
+        if not self._dirty:
+            return
+        
+        index = {
+            'next_shard': self._next_shard,
+            'shards': self._shards,
+            'entries': self._entries
+        }
+        tmp_path = self.cache_dir / (self.INDEX_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.cache_dir / self.INDEX_FILE)
+        self._dirty = False
+        self._recency_changed = False
+    
+    def close(self):
+        """Write the index, including shard recency updated by lookups since the last write."""
+        self._dirty = self._dirty or self._recency_changed
+        self.flush()
+    
+    def size_bytes(self):
+        """
+        Get the total size of all cached shards.
+        
+        Returns:
+            int: Size in bytes
+        """
+        return sum(shard['bytes'] for shard in self._shards.values())
+    
+    def stats(self):
+        """
+        Get cache counters.
+        
+        Returns:
+            dict: Hits, misses, number of entries and size in bytes
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'shards': len(self._shards),
+            'bytes': self.size_bytes()
+        }
+    
+    def _load_index(self):
+        """Load the index from disk, ignoring a missing or corrupt file."""
+        index_path = self.cache_dir / self.INDEX_FILE
+        if not index_path.exists():
+            return
+        
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            print(f"Ignoring unreadable embedding cache index: {index_path}")
+            return
+        
+        self._next_shard = index.get('next_shard', 0)
+        self._shards = index.get('shards', {})
+        self._entries = {
+            key: (shard_name, row)
+            for key, (shard_name, row) in index.get('entries', {}).items()
+            if shard_name in self._shards
+        }
+    
+    def _open_shard(self, shard_name):
+        """
+        Memory-map a shard, dropping it from the index if the file is gone.
+        
+        Args:
+            shard_name (str): Name of the shard
+        
+        Returns:
+            numpy.ndarray: Memory-mapped shard, or None if unavailable
+        """
+        shard = self._open_shards.get(shard_name)
+        if shard is not None:
+            return shard
+        
+        try:
+            shard = np.load(self.cache_dir / f"{shard_name}.npy", mmap_mode='r')
+        except (OSError, ValueError):
+            self._drop_shard(shard_name)
+            return None
+        
+        self._open_shards[shard_name] = shard
+        return shard
+    
+    def _evict(self):
+        """Remove least recently used shards until the cache fits in max_bytes."""
+        total = self.size_bytes()
+        if total <= self.max_bytes:
+            return
+        
+        by_age = sorted(self._shards.items(), key=lambda item: item[1]['last_used'])
+        for shard_name, shard in by_age:
+            if total <= self.max_bytes:
+                break
+            total -= shard['bytes']
+            self._drop_shard(shard_name)
+    
+    def _drop_shard(self, shard_name):
+        """
+        Delete a shard file and every index entry pointing into it.
+        
+        Args:
+            shard_name (str): Name of the shard
+        """
+        self._open_shards.pop(shard_name, None)
+        self._shards.pop(shard_name, None)
+        self._entries = {
+            key: entry for key, entry in self._entries.items()
+            if entry[0] != shard_name
+        }
+        try:
+            os.remove(self.cache_dir / f"{shard_name}.npy")
+        except OSError:
+            pass
+        self._dirty = True
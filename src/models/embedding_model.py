@@ -2,18 +2,114 @@
 Embedding models for representing attractions semantically
 """
 
+import os
 import numpy as np
 from abc import ABC, abstractmethod
-from sentence_transformers import SentenceTransformer
-from sklearn.feature_extraction.text import TfidfVectorizer
+from pathlib import Path
+
+from utils.tracing import traced
+
+# sentence_transformers (torch), onnxruntime, tokenizers and sklearn are
+# imported by the backends that need them, so that importing this module stays cheap
+
+# Values of the --embedding-backend option
+EMBEDDING_BACKENDS = ('tfidf', 'sparse-tfidf', 'transformer', 'onnx')
 
 class BaseEmbeddingModel(ABC):
     """Abstract base class for embedding models."""
     
-    @abstractmethod
+    # Optional EmbeddingCache consulted before encoding
+    cache = None
+    
+    # True if embeddings from separate calls are not comparable (e.g. the
+    # model is re-fitted on every call), so related texts must be encoded together
+    fitted_per_call = False
+    
+    # True if embeddings are scipy sparse (CSR) rows instead of a dense array
+    sparse = False
+    
+    @property
+    def cache_namespace(self):
+        """
+        Name under which this model's embeddings are cached.
+        
+        Returns:
+            str: Namespace, or None if the embeddings must not be cached
+        """
+        return None
+    
+    @traced('embedding.get_embeddings', items='texts')
     def get_embeddings(self, texts):
         """
-        Generate embeddings for a list of texts.
+        Generate embeddings for a list of texts, reusing cached ones.
+        
+        Args:
+            texts (list): List of strings to embed
+            
+        Returns:
+            numpy.ndarray: Array of embeddings, one per input text
+        """
+        namespace = self.cache_namespace
+        if self.cache is None or namespace is None or not texts:
+            return self._encode(texts)
+        
+        cached = self.cache.get_many(namespace, texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            encoded = np.asarray(self._encode(missing_texts))
+            self.cache.put_many(namespace, missing_texts, encoded)
+            for i, embedding in zip(missing, encoded):
+                cached[i] = embedding
+        
+        return np.stack(cached)
+    
+    @traced('embedding.get_embeddings_batched', items='texts')
+    def get_embeddings_batched(self, texts, batch_size=64):
+        """
+        Generate embeddings for many texts in length-bucketed batches.
+        
+        Texts are sorted by length so that each batch holds texts of similar
+        size (less padding for transformer models), encoded batch by batch
+        and returned in the original order.
+        
+        Args:
+            texts (list): List of strings to embed
+            batch_size (int): Number of texts per batch
+            
+        Returns:
+            numpy.ndarray: Array of embeddings, one per input text
+        """
+        if not texts:
+            return np.array([])
+        if self.fitted_per_call:
+            # Separately fitted batches would not be comparable
+            return self.get_embeddings(texts)
+        
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings = None
+        
+        for start in range(0, len(order), batch_size):
+            batch_indices = order[start:start + batch_size]
+            batch_embeddings = np.asarray(
+                self.get_embeddings([texts[i] for i in batch_indices])
+            )
+            if self.fitted_per_call:
+                # The model fell back to one fitted per call: encode everything together
+                return self.get_embeddings(texts)
+            if embeddings is None:
+                embeddings = np.empty(
+                    (len(texts), batch_embeddings.shape[1]), dtype=batch_embeddings.dtype
+                )
+            embeddings[batch_indices] = batch_embeddings
+        
+        return embeddings
+    
+    @abstractmethod
+    def _encode(self, texts):
+        """
+        Encode texts with the underlying model, bypassing the cache.
         
         Args:
             texts (list): List of strings to embed
@@ -24,62 +120,330 @@ class BaseEmbeddingModel(ABC):
         pass
 
 
-class TransformerEmbeddingModel(BaseEmbeddingModel):
+class FallbackEmbeddingModel(BaseEmbeddingModel):
+    """
+    Model backed by an optional runtime, falling back to TF-IDF without it.
+    
+    Once the model fails to load or to encode, every later text is encoded
+    by one SimpleEmbeddingModel. Its vectors are only comparable within one
+    call, so from then on the model reports fitted_per_call and callers
+    must not keep embeddings from earlier calls.
+    """
+    
+    # Name of the backend in error messages
+    backend_name = 'model'
+    
+    # SimpleEmbeddingModel used once the backend is unavailable
+    fallback_model = None
+    
+    def _fall_back(self):
+        """Switch to the TF-IDF fallback model for good."""
+        if self.fallback_model is None:
+            self.fallback_model = SimpleEmbeddingModel()
+            self.fitted_per_call = True
+    
+    def get_embeddings(self, texts):
+        """
+        Generate embeddings with the backend, or with the fallback model.
+        
+        Args:
+            texts (list): List of texts to embed
+            
+        Returns:
+            numpy.ndarray: Array of embeddings
+        """
+        if self.fallback_model is None:
+            try:
+                return super().get_embeddings(texts)
+            except Exception as e:
+                print(f"Error generating {self.backend_name} embeddings: {e}")
+                self._fall_back()
+        
+        return self.fallback_model.get_embeddings(texts)
+
+
+class TransformerEmbeddingModel(FallbackEmbeddingModel):
     """Embedding model using sentence transformers."""
     
-    def __init__(self, model_name='all-MiniLM-L6-v2'):
+    backend_name = 'transformer'
+    
+    def __init__(self, model_name='all-MiniLM-L6-v2', cache=None):
         """
         Initialize the transformer model.
         
         Args:
             model_name (str): Name of the sentence transformer model to use
+            cache (EmbeddingCache): Optional on-disk embedding cache. When given,
+                the model weights are only loaded once a text misses the cache.
         """
-        print(f"Loading transformer model: {model_name}")
+        self.model_name = model_name
+        self.cache = cache
+        self.model = None
+        self._load_attempted = False
+        
+        if cache is None:
+            self._load_model()
+    
+    @property
+    def cache_namespace(self):
+        """Cache embeddings under the transformer model name."""
+        return f"sentence-transformers/{self.model_name}"
+    
+    def _load_model(self):
+        """Load the sentence transformer weights (only attempted once)."""
+        if self._load_attempted:
+            return
+        self._load_attempted = True
+        
+        print(f"Loading transformer model: {self.model_name}")
         try:
-            self.model = SentenceTransformer(model_name)
-            print(f"Successfully loaded model {model_name}")
+            from sentence_transformers import SentenceTransformer
+            self.model = SentenceTransformer(self.model_name)
+            print(f"Successfully loaded model {self.model_name}")
         except Exception as e:
             print(f"Failed to load transformer model: {e}")
             print("Falling back to simple embedding model")
             # Fallback to simple model if transformer fails
             self.model = None
+            self._fall_back()
     
-    def get_embeddings(self, texts):
+    @traced('embedding.encode_transformer', items='texts')
+    def _encode(self, texts):
         """
-        Generate embeddings using the transformer model.
+        Encode texts with the sentence transformer.
         
         Args:
             texts (list): List of texts to embed
             
         Returns:
             numpy.ndarray: Array of embeddings
+            
+        Raises:
+            RuntimeError: If the transformer model could not be loaded
         """
+        self._load_model()
         if self.model is None:
-            # Fallback to simple embedding if model failed to load
-            return SimpleEmbeddingModel().get_embeddings(texts)
+            raise RuntimeError(f"Transformer model {self.model_name} is not available")
+        
+        # Generate embeddings using the transformer model
+        return self.model.encode(texts, show_progress_bar=False)
+
+
+class OnnxEmbeddingModel(FallbackEmbeddingModel):
+    """
+    Sentence transformer exported to ONNX, run with ONNX Runtime on the CPU.
+    
+    The model directory holds the exported graph (model.onnx) and the fast
+    tokenizer (tokenizer.json), e.g. from
+    `optimum-cli export onnx --model sentence-transformers/all-MiniLM-L6-v2 DIR`;
+    nothing is downloaded. Texts are tokenized once, sorted by token count and
+    run in batches padded only to their longest text; token embeddings are
+    mean-pooled over the attention mask and normalized, as sentence-transformers
+    does for all-MiniLM-L6-v2.
+    """
+    
+    backend_name = 'ONNX'
+    
+    def __init__(self, model_dir, quantize=False, intra_op_threads=None, batch_size=64,
+                 max_length=256, cache=None):
+        """
+        Initialize the ONNX model.
+        
+        Args:
+            model_dir (str or Path): Directory with model.onnx and tokenizer.json
+            quantize (bool): Run an int8 dynamically quantized copy of the graph
+                (model.int8.onnx, created in model_dir on first use)
+            intra_op_threads (int): Threads ONNX Runtime uses within an operator,
+                or None for its default (all physical cores)
+            batch_size (int): Texts per inference run
+            max_length (int): Tokens kept per text
+            cache (EmbeddingCache): Optional on-disk embedding cache. When given,
+                the session is only created once a text misses the cache.
+        """
+        self.model_dir = Path(model_dir)
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.cache = cache
+        self.session = None
+        self.tokenizer = None
+        self._load_attempted = False
+        
+        if cache is None:
+            self._load_model()
+    
+    @property
+    def cache_namespace(self):
+        """Cache embeddings under the model directory and precision."""
+        return f"onnx/{self.model_dir.name}/{'int8' if self.quantize else 'fp32'}"
+    
+    def _load_model(self):
+        """Create the inference session and tokenizer (only attempted once)."""
+        if self._load_attempted:
+            return
+        self._load_attempted = True
         
+        print(f"Loading ONNX model from {self.model_dir}"
+              + (" (int8 quantized)" if self.quantize else ""))
         try:
-            # Generate embeddings using the transformer model
-            embeddings = self.model.encode(texts, show_progress_bar=False)
-            return embeddings
+            import onnxruntime
+            from tokenizers import Tokenizer
+            
+            model_path = self.model_dir / 'model.onnx'
+            if self.quantize:
+                model_path = self._quantized_model(model_path)
+            
+            options = onnxruntime.SessionOptions()
+            options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+            if self.intra_op_threads:
+                options.intra_op_num_threads = self.intra_op_threads
+            self.session = onnxruntime.InferenceSession(
+                str(model_path), options, providers=['CPUExecutionProvider']
+            )
+            
+            self.tokenizer = Tokenizer.from_file(str(self.model_dir / 'tokenizer.json'))
+            self.tokenizer.no_padding()
+            self.tokenizer.enable_truncation(max_length=self.max_length)
+            print(f"Successfully loaded ONNX model {model_path.name}")
         except Exception as e:
-            print(f"Error generating transformer embeddings: {e}")
-            # Fallback to simple embedding if embedding fails
-            return SimpleEmbeddingModel().get_embeddings(texts)
+            print(f"Failed to load ONNX model: {e}")
+            print("Falling back to simple embedding model")
+            self.session = None
+            self._fall_back()
+    
+    def _quantized_model(self, model_path):
+        """
+        Get the int8 dynamically quantized copy of a graph, creating it once.
+        
+        Args:
+            model_path (Path): Float32 ONNX graph
+        
+        Returns:
+            Path: Quantized graph next to the original
+        """
+        quantized_path = model_path.with_name(f"{model_path.stem}.int8.onnx")
+        if not quantized_path.exists():
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            
+            print(f"Quantizing {model_path.name} to int8...")
+            tmp_path = quantized_path.with_name(quantized_path.name + '.tmp')
+            quantize_dynamic(str(model_path), str(tmp_path), weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+        return quantized_path
+    
+    @traced('embedding.encode_onnx', items='texts')
+    def _encode(self, texts):
+        """
+        Encode texts in token-length-sorted batches.
+        
+        Args:
+            texts (list): List of texts to embed
+        
+        Returns:
+            numpy.ndarray: (len(texts), dim) float32 unit-length embeddings
+        
+        Raises:
+            RuntimeError: If the ONNX model could not be loaded
+        """
+        self._load_model()
+        if self.session is None:
+            raise RuntimeError(f"ONNX model in {self.model_dir} is not available")
+        if not texts:
+            return np.array([])
+        
+        encodings = self.tokenizer.encode_batch(list(texts))
+        order = np.argsort([len(encoding.ids) for encoding in encodings], kind='stable')
+        input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        embeddings = None
+        for start in range(0, len(order), self.batch_size):
+            batch_indices = order[start:start + self.batch_size]
+            feeds = _pad_batch([encodings[i] for i in batch_indices], input_names)
+            output = self.session.run(None, feeds)[0]
+            pooled = output if output.ndim == 2 else _mean_pool(output, feeds['attention_mask'])
+            if embeddings is None:
+                embeddings = np.empty((len(texts), pooled.shape[1]), dtype=np.float32)
+            embeddings[batch_indices] = pooled
+        
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return embeddings / norms
+
+
+def _pad_batch(encodings, input_names):
+    """
+    Pad tokenized texts to the longest of the batch.
+    
+    Args:
+        encodings (list): tokenizers Encoding objects
+        input_names (set): Inputs the ONNX graph accepts
+    
+    Returns:
+        dict: int64 arrays for input_ids, attention_mask and (if accepted) token_type_ids
+    """
+    length = max(len(encoding.ids) for encoding in encodings)
+    feeds = {
+        'input_ids': np.zeros((len(encodings), length), dtype=np.int64),
+        'attention_mask': np.zeros((len(encodings), length), dtype=np.int64),
+        'token_type_ids': np.zeros((len(encodings), length), dtype=np.int64),
+    }
+    for row, encoding in enumerate(encodings):
+        size = len(encoding.ids)
+        feeds['input_ids'][row, :size] = encoding.ids
+        feeds['attention_mask'][row, :size] = encoding.attention_mask
+        feeds['token_type_ids'][row, :size] = encoding.type_ids
+    return {name: value for name, value in feeds.items() if name in input_names}
+
+def _mean_pool(token_embeddings, attention_mask):
+    """
+    Average token embeddings over the non-padding tokens of each text.
+    
+    Args:
+        token_embeddings (numpy.ndarray): (batch, tokens, dim) model output
+        attention_mask (numpy.ndarray): (batch, tokens) 1 for real tokens
+    
+    Returns:
+        numpy.ndarray: (batch, dim) text embeddings
+    """
+    mask = attention_mask[:, :, np.newaxis].astype(token_embeddings.dtype)
+    counts = np.maximum(mask.sum(axis=1), 1e-9)
+    return (token_embeddings * mask).sum(axis=1) / counts
 
 
 class SimpleEmbeddingModel(BaseEmbeddingModel):
     """Simple embedding model using TF-IDF."""
     
+    fitted_per_call = True
+    
     def __init__(self):
         """Initialize the TF-IDF vectorizer."""
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
         self.vectorizer = TfidfVectorizer(
             max_features=100,
             stop_words='english',
             ngram_range=(1, 2)
         )
     
-    def get_embeddings(self, texts):
+    def get_embeddings_batched(self, texts, batch_size=64):
+        """
+        Generate TF-IDF embeddings for many texts with a single shared vocabulary.
+        
+        TF-IDF vectors are only comparable when fitted together, so the texts
+        are never split into batches.
+        
+        Args:
+            texts (list): List of strings to embed
+            batch_size (int): Ignored
+            
+        Returns:
+            numpy.ndarray: Array of embeddings, one per input text
+        """
+        return self.get_embeddings(texts)
+    
+    @traced('embedding.encode_tfidf', items='texts')
+    def _encode(self, texts):
         """
         Generate embeddings using TF-IDF.
         
@@ -103,4 +467,173 @@ class SimpleEmbeddingModel(BaseEmbeddingModel):
         norms[norms == 0] = 1  # Avoid division by zero
         normalized_embeddings = embeddings / norms
         
-        return normalized_embeddings
\ No newline at end of file
+        return normalized_embeddings
+
+
+class SparseTfidfEmbeddingModel(BaseEmbeddingModel):
+    """
+    TF-IDF embedding model fitted once over a whole catalog.
+    
+    Unlike SimpleEmbeddingModel, the vocabulary and inverse document
+    frequencies are learned once (and can be saved next to the catalog), so
+    every later text, such as a preference, is embedded in the same space.
+    Embeddings are L2-normalized scipy CSR rows, so large vocabularies only
+    cost memory for the terms a text actually contains.
+    """
+    
+    sparse = True
+    
+    def __init__(self, max_features=None, ngram_range=(1, 2), stop_words='english'):
+        """
+        Initialize an unfitted model.
+        
+        Args:
+            max_features (int): Largest vocabulary (most frequent terms), or None for all
+            ngram_range (tuple): Smallest and largest n-grams used as terms
+            stop_words (str): Stop word list passed to scikit-learn
+        """
+        self.max_features = max_features
+        self.ngram_range = tuple(ngram_range)
+        self.stop_words = stop_words
+        self.terms = None
+        self.idf = None
+        self.fingerprint = ''
+        self._counter = None
+    
+    @property
+    def name(self):
+        """Model settings, for fingerprinting a fitted vocabulary."""
+        return (f"sparse-tfidf/max_features={self.max_features}/"
+                f"ngram_range={self.ngram_range[0]}-{self.ngram_range[1]}/"
+                f"stop_words={self.stop_words}")
+    
+    @property
+    def fitted(self):
+        """Whether a vocabulary has been fitted or loaded."""
+        return self.idf is not None
+    
+    def fit(self, texts, fingerprint=''):
+        """
+        Learn the vocabulary and inverse document frequencies.
+        
+        Args:
+            texts (list): Catalog texts
+            fingerprint (str): Identifier of the texts, stored with the vocabulary
+        
+        Returns:
+            SparseTfidfEmbeddingModel: self
+        """
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        
+        vectorizer = TfidfVectorizer(
+            max_features=self.max_features,
+            stop_words=self.stop_words,
+            ngram_range=self.ngram_range,
+            dtype=np.float32
+        )
+        vectorizer.fit(texts)
+        self._set_vocabulary(
+            vectorizer.get_feature_names_out(), vectorizer.idf_.astype(np.float32), fingerprint
+        )
+        return self
+    
+    def save(self, path):
+        """
+        Write the fitted vocabulary to an .npz file (atomically).
+        
+        Args:
+            path (str or Path): Destination file
+        """
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp.npz')
+        np.savez(
+            tmp_path, terms=np.asarray(self.terms, dtype=str), idf=self.idf,
+            name=np.array(self.name), fingerprint=np.array(self.fingerprint)
+        )
+        os.replace(tmp_path, path)
+    
+    def load(self, path, fingerprint=None):
+        """
+        Read a vocabulary written by save with the same settings.
+        
+        Args:
+            path (str or Path): Vocabulary file
+            fingerprint (str): Expected fingerprint, or None to accept any
+        
+        Returns:
+            bool: True if loaded, False if the file is missing, unreadable or stale
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                terms, idf = data['terms'], data['idf']
+                name, stored_fingerprint = str(data['name']), str(data['fingerprint'])
+        except (OSError, KeyError, ValueError):
+            return False
+        
+        if name != self.name or (fingerprint is not None and stored_fingerprint != fingerprint):
+            return False
+        self._set_vocabulary(terms, idf, stored_fingerprint)
+        return True
+    
+    def nbytes(self):
+        """Memory held by the vocabulary's inverse document frequencies."""
+        return 0 if self.idf is None else self.idf.nbytes
+    
+    def get_embeddings_batched(self, texts, batch_size=64):
+        """
+        Generate TF-IDF embeddings for many texts in one sparse transform.
+        
+        Args:
+            texts (list): List of strings to embed
+            batch_size (int): Ignored
+        
+        Returns:
+            scipy.sparse.csr_matrix: One L2-normalized row per input text
+        """
+        return self.get_embeddings(texts)
+    
+    def _set_vocabulary(self, terms, idf, fingerprint):
+        """
+        Use a fitted vocabulary for encoding.
+        
+        Args:
+            terms (numpy.ndarray): Terms in column order
+            idf (numpy.ndarray): Inverse document frequency of each term
+            fingerprint (str): Identifier of the texts the vocabulary was fitted on
+        """
+        from sklearn.feature_extraction.text import CountVectorizer
+        
+        self.terms = terms
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.fingerprint = fingerprint
+        self._counter = CountVectorizer(
+            vocabulary={term: column for column, term in enumerate(terms)},
+            stop_words=self.stop_words,
+            ngram_range=self.ngram_range,
+            dtype=np.float32
+        )
+    
+    @traced('embedding.encode_sparse_tfidf', items='texts')
+    def _encode(self, texts):
+        """
+        Encode texts with the fitted vocabulary.
+        
+        Args:
+            texts (list): List of texts to embed
+        
+        Returns:
+            scipy.sparse.csr_matrix: One L2-normalized row per text
+        
+        Raises:
+            RuntimeError: If no vocabulary has been fitted or loaded
+        """
+        if not self.fitted:
+            raise RuntimeError("The sparse TF-IDF model must be fitted on the catalog first")
+        
+        # Term counts, weighted by idf and scaled to unit length in place
+        matrix = self._counter.transform(texts)
+        matrix.data *= self.idf[matrix.indices]
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix.data /= np.repeat(norms, np.diff(matrix.indptr)).astype(matrix.dtype)
+        return matrix
@@ -0,0 +1,226 @@
+"""
+Compact storage of unit-length embeddings (float16 or per-row int8) with cosine kernels
+"""
+
+import numpy as np
+
+EMBEDDING_DTYPES = ('float32', 'float16', 'int8')
+
+# Largest int8 magnitude; each row is scaled so that its largest entry maps to it
+_INT8_MAX = 127
+
+class EmbeddingStore:
+    """
+    Unit-length embeddings kept in their native, float16 or int8 form.
+    
+    Rows are normalized once when the store is built. float16 halves the
+    memory of float32 vectors; int8 quarters it, keeping one float32 scale
+    per row (row = scale * int8 values). Similarities are computed block by
+    block from the stored form: blocks are widened to float32 for the matrix
+    product and int8 scales are applied to the product afterwards, so no
+    full-precision copy of the store is ever made. int8 dot products of two
+    stored rows are exact in float32 up to about 1000 dimensions.
+    
+    Without a dtype the vectors are kept as the model returned them and
+    every product equals the plain numpy one. Sparse (CSR) embeddings are
+    kept sparse, in their own dtype or float32, and compared with sparse
+    matrix products.
+    """
+    
+    def __init__(self, vectors, scales=None, block_size=4096):
+        """
+        Initialize the store from already normalized (and quantized) vectors.
+        
+        Args:
+            vectors (numpy.ndarray or scipy.sparse.csr_matrix): (n, dim)
+                unit-length vectors, or their float16 or int8 form
+            scales (numpy.ndarray): (n,) float32 row scales of int8 vectors, or None
+            block_size (int): Rows widened to float32 at a time by the kernels
+        """
+        self.vectors = vectors
+        self.scales = scales
+        self.block_size = block_size
+    
+    @classmethod
+    def from_embeddings(cls, embeddings, dtype=None, block_size=4096):
+        """
+        Normalize embeddings and store them in the requested precision.
+        
+        Args:
+            embeddings (numpy.ndarray or scipy.sparse matrix): (n, dim) embeddings
+            dtype (str): 'float32', 'float16' or 'int8' (dense only); None
+                keeps the embeddings' own dtype
+            block_size (int): Rows widened to float32 at a time by the kernels
+        
+        Returns:
+            EmbeddingStore: The store
+        
+        Raises:
+            ValueError: If the dtype is unknown, or quantized for sparse embeddings
+        """
+        if dtype is not None and dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {dtype}. "
+                             f"Valid dtypes: {', '.join(EMBEDDING_DTYPES)}")
+        
+        if _is_sparse(embeddings):
+            if dtype not in (None, 'float32'):
+                raise ValueError(f"{dtype} storage needs dense embeddings")
+            vectors = embeddings.tocsr().astype(np.float32 if dtype else embeddings.dtype)
+            norms = np.sqrt(np.asarray(vectors.multiply(vectors).sum(axis=1)).ravel())
+            norms[norms == 0] = 1
+            vectors.data /= np.repeat(norms, np.diff(vectors.indptr)).astype(vectors.dtype)
+            return cls(vectors, block_size=block_size)
+        
+        embeddings = np.asarray(embeddings)
+        if dtype is not None and dtype != 'int8':
+            embeddings = embeddings.astype(np.float32, copy=False)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        norms[norms == 0] = 1  # Zero vectors are left as they are
+        normalized = embeddings / norms
+        
+        if dtype == 'float16':
+            return cls(normalized.astype(np.float16), block_size=block_size)
+        if dtype != 'int8':
+            return cls(normalized, block_size=block_size)
+        
+        scales = (np.abs(normalized).max(axis=1, initial=0) / _INT8_MAX).astype(np.float32)
+        scales[scales == 0] = 1
+        quantized = np.rint(normalized / scales[:, np.newaxis])
+        quantized = np.clip(quantized, -_INT8_MAX, _INT8_MAX).astype(np.int8)
+        return cls(quantized, scales, block_size=block_size)
+    
+    def __len__(self):
+        return self.vectors.shape[0]
+    
+    def __getitem__(self, key):
+        """
+        Select rows, e.g. one city's block.
+        
+        Args:
+            key (slice or numpy.ndarray): Rows to select (slices give views)
+        
+        Returns:
+            EmbeddingStore: Store of the selected rows
+        """
+        scales = None if self.scales is None else self.scales[key]
+        return EmbeddingStore(self.vectors[key], scales, self.block_size)
+    
+    @property
+    def shape(self):
+        """(n, dim) of the stored vectors."""
+        return self.vectors.shape
+    
+    @property
+    def dtype(self):
+        """dtype of decoded vectors and similarities (float32 unless native)."""
+        if self.quantized:
+            return np.dtype(np.float32)
+        return self.vectors.dtype
+    
+    @property
+    def storage_dtype(self):
+        """Name of the dtype the vectors are stored in."""
+        return self.vectors.dtype.name
+    
+    @property
+    def quantized(self):
+        """Whether the vectors are stored in float16 or int8."""
+        return self.vectors.dtype in (np.float16, np.int8)
+    
+    @property
+    def sparse(self):
+        """Whether the vectors are sparse CSR rows."""
+        return _is_sparse(self.vectors)
+    
+    def nbytes(self):
+        """Memory held by the vectors and row scales."""
+        if self.sparse:
+            return self.vectors.data.nbytes + self.vectors.indices.nbytes + self.vectors.indptr.nbytes
+        return self.vectors.nbytes + (0 if self.scales is None else self.scales.nbytes)
+    
+    def decode(self, rows=slice(None)):
+        """
+        Get rows as unit-length vectors.
+        
+        Args:
+            rows (slice or numpy.ndarray): Rows to decode
+        
+        Returns:
+            numpy.ndarray: (len(rows), dim) vectors of the decoded dtype
+                (sparse rows for sparse stores)
+        """
+        if not self.quantized:
+            return self.vectors[rows]
+        vectors = self.vectors[rows].astype(np.float32)
+        if self.scales is not None:
+            vectors *= self.scales[rows, np.newaxis]
+        return vectors
+    
+    def toarray(self):
+        """Decode every row into a dense array."""
+        if self.sparse:
+            return self.vectors.toarray()
+        return self.decode()
+    
+    def dot(self, queries):
+        """
+        Cosine similarities of every stored vector to unit-length queries.
+        
+        Args:
+            queries (numpy.ndarray or scipy.sparse matrix): (q, dim) or (dim,)
+                unit-length vectors
+        
+        Returns:
+            numpy.ndarray: (n, q) similarities, or (n,) for a single query
+        """
+        if self.sparse or _is_sparse(queries):
+            return _dense(self.vectors @ queries.T)
+        
+        queries = np.asarray(queries, dtype=self.dtype)
+        if not self.quantized:
+            return self.vectors @ queries.T
+        
+        single = queries.ndim == 1
+        queries = np.atleast_2d(queries)
+        out = np.empty((len(self), len(queries)), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            end = min(start + self.block_size, len(self))
+            np.matmul(self.vectors[start:end].astype(np.float32), queries.T, out=out[start:end])
+        if self.scales is not None:
+            out *= self.scales[:, np.newaxis]
+        return out[:, 0] if single else out
+    
+    def similarities(self, rows=slice(None)):
+        """
+        Cosine similarities of some stored rows to every stored row.
+        
+        Args:
+            rows (slice or numpy.ndarray): Rows to compare
+        
+        Returns:
+            numpy.ndarray: (len(rows), n) similarities
+        """
+        if self.sparse:
+            return _dense(self.vectors[rows] @ self.vectors.T)
+        if not self.quantized:
+            return self.vectors[rows] @ self.vectors.T
+        
+        # int8 rows stay unscaled so that the products are integer dot products
+        queries = self.vectors[rows].astype(np.float32)
+        out = np.empty((len(queries), len(self)), dtype=np.float32)
+        for start in range(0, len(self), self.block_size):
+            end = min(start + self.block_size, len(self))
+            np.matmul(queries, self.vectors[start:end].astype(np.float32).T,
+                      out=out[:, start:end])
+        if self.scales is not None:
+            out *= self.scales[rows, np.newaxis]
+            out *= self.scales[np.newaxis, :]
+        return out
+
+def _is_sparse(matrix):
+    """Whether a matrix is a scipy sparse matrix (without importing scipy)."""
+    return hasattr(matrix, 'tocsr')
+
+def _dense(product):
+    """Convert a (possibly sparse) matrix product to a dense array."""
+    return product.toarray() if _is_sparse(product) else np.asarray(product)
@@ -0,0 +1,332 @@
+"""
+Inverted-file (IVF) approximate nearest-neighbour index over attraction embeddings
+"""
+
+import hashlib
+import os
+from pathlib import Path
+
+import numpy as np
+
+class IVFIndex:
+    """
+    Cosine-similarity index that partitions vectors into k-means clusters.
+    
+    A query is compared with the cluster centroids first and only the vectors
+    of the nprobe closest clusters are scanned, so search cost grows with the
+    size of a few clusters rather than with the whole catalog. Every vector
+    carries the index of its city, and queries can be restricted to a set of
+    cities or countries.
+    """
+    
+    def __init__(self, centroids, list_offsets, list_rows, vectors, city_ids,
+                 city_countries, fingerprint='', nprobe=8):
+        """
+        Initialize the index from its arrays (use build or load to create one).
+        
+        Args:
+            centroids (numpy.ndarray): (nlist, dim) unit-length cluster centroids
+            list_offsets (numpy.ndarray): (nlist + 1,) start of each cluster in list_rows
+            list_rows (numpy.ndarray): Catalog rows grouped by cluster
+            vectors (numpy.ndarray): (n, dim) unit-length vectors in list_rows order
+            city_ids (numpy.ndarray): (n,) city index of each catalog row
+            city_countries (list): Country name of each city index
+            fingerprint (str): Identifies the model and texts the index was built from
+            nprobe (int): Default number of clusters scanned per query
+        """
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.vectors = vectors
+        self.city_ids = city_ids
+        self.city_countries = list(city_countries)
+        self.fingerprint = fingerprint
+        self.nprobe = nprobe
+        
+        # Position of each catalog row in list order, for exact filtered scans
+        self.row_positions = np.empty(len(list_rows), dtype=np.int64)
+        self.row_positions[list_rows] = np.arange(len(list_rows))
+    
+    def __len__(self):
+        return len(self.list_rows)
+    
+    @property
+    def nlist(self):
+        """Number of clusters."""
+        return len(self.centroids)
+    
+    @staticmethod
+    def make_fingerprint(model_name, texts):
+        """
+        Identify an index by the model and the exact texts it covers.
+        
+        Args:
+            model_name (str): Name (cache namespace) of the embedding model
+            texts (list): Embedding texts in catalog row order
+        
+        Returns:
+            str: Hex digest
+        """
+        digest = hashlib.sha256()
+        digest.update(model_name.encode('utf-8'))
+        for text in texts:
+            digest.update(b'\0')
+            digest.update(text.encode('utf-8'))
+        return digest.hexdigest()
+    
+    @classmethod
+    def build(cls, embeddings, city_ids, city_countries, nlist=None, iterations=10,
+              sample_size=None, nprobe=8, fingerprint='', seed=0):
+        """
+        Cluster embeddings with spherical k-means and build the inverted lists.
+        
+        Args:
+            embeddings (numpy.ndarray): (n, dim) embeddings in catalog row order
+            city_ids (numpy.ndarray): (n,) city index of each row
+            city_countries (list): Country name of each city index
+            nlist (int): Number of clusters (default: about 4 * sqrt(n))
+            iterations (int): k-means iterations
+            sample_size (int): Vectors used to train the centroids (default:
+                256 per cluster); all vectors are assigned afterwards
+            nprobe (int): Default number of clusters scanned per query
+            fingerprint (str): Identifies the model and texts
+            seed (int): Random seed for centroid initialisation
+        
+        Returns:
+            IVFIndex: The index
+        
+        Raises:
+            ValueError: If there are no embeddings to index
+        """
+        vectors = _normalize(np.asarray(embeddings, dtype=np.float32))
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("Cannot build a vector index without attractions")
+        if nlist is None:
+            nlist = int(round(4 * np.sqrt(n)))
+        nlist = max(1, min(nlist, n))
+        
+        rng = np.random.default_rng(seed)
+        sample_size = sample_size or 256 * nlist
+        sample = vectors if n <= sample_size else vectors[rng.choice(n, sample_size, replace=False)]
+        centroids = _spherical_kmeans(sample, nlist, iterations, rng)
+        
+        assignment = _assign(vectors, centroids)
+        list_rows = np.argsort(assignment, kind='stable')
+        list_offsets = np.searchsorted(assignment[list_rows], np.arange(nlist + 1))
+        
+        return cls(
+            centroids, list_offsets.astype(np.int64), list_rows.astype(np.int64),
+            np.ascontiguousarray(vectors[list_rows]), np.asarray(city_ids, dtype=np.int32),
+            city_countries, fingerprint=fingerprint, nprobe=nprobe
+        )
+    
+    def search(self, query, k=10, nprobe=None, cities=None, countries=None):
+        """
+        Find the catalog rows most similar to a query vector.
+        
+        Clusters are scanned in order of centroid similarity until at least
+        nprobe clusters have been scanned and k rows passing the filter were
+        found. Filters matching fewer rows than that are scanned exactly.
+        
+        Args:
+            query (numpy.ndarray): Query embedding
+            k (int): Number of results
+            nprobe (int): Minimum number of clusters to scan (default: self.nprobe)
+            cities (list): Only return rows of these city indices
+            countries (list): Only return rows of cities in these countries
+        
+        Returns:
+            numpy.ndarray: Catalog rows, best first
+            numpy.ndarray: Their cosine similarities
+        """
+        nprobe = nprobe or self.nprobe
+        query = _normalize(np.asarray(query, dtype=np.float32)[np.newaxis, :])[0]
+        
+        allowed_cities = self._allowed_cities(cities, countries)
+        if allowed_cities is not None:
+            allowed = np.isin(self.city_ids, allowed_cities)
+            allowed_count = int(allowed.sum())
+            typical_scan = nprobe * len(self) / self.nlist
+            if allowed_count <= max(k, typical_scan):
+                return self._exact_search(query, k, np.flatnonzero(allowed))
+        else:
+            allowed = None
+        
+        order = np.argsort(-(self.centroids @ query))
+        candidates = []
+        found = 0
+        for probed, cluster in enumerate(order, start=1):
+            start, end = self.list_offsets[cluster], self.list_offsets[cluster + 1]
+            positions = np.arange(start, end)
+            if allowed is not None:
+                positions = positions[allowed[self.list_rows[positions]]]
+            candidates.append(positions)
+            found += len(positions)
+            if probed >= nprobe and found >= k:
+                break
+        
+        positions = np.concatenate(candidates) if candidates else np.array([], dtype=np.int64)
+        return self._top_k(query, k, positions)
+    
+    def save(self, path):
+        """
+        Write the index to an .npz file (atomically).
+        
+        Args:
+            path (str or Path): Destination file
+        """
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp.npz')
+        np.savez(
+            tmp_path, centroids=self.centroids, list_offsets=self.list_offsets,
+            list_rows=self.list_rows, vectors=self.vectors, city_ids=self.city_ids,
+            city_countries=np.array(self.city_countries, dtype=str),
+            fingerprint=np.array(self.fingerprint), nprobe=np.array(self.nprobe)
+        )
+        os.replace(tmp_path, path)
+    
+    @classmethod
+    def load(cls, path, fingerprint=None):
+        """
+        Read an index written by save.
+        
+        Args:
+            path (str or Path): Index file
+            fingerprint (str): Expected fingerprint, or None to accept any
+        
+        Returns:
+            IVFIndex: The index, or None if the file is missing, unreadable or stale
+        """
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                index = cls(
+                    data['centroids'], data['list_offsets'], data['list_rows'],
+                    data['vectors'], data['city_ids'], data['city_countries'].tolist(),
+                    fingerprint=str(data['fingerprint']), nprobe=int(data['nprobe'])
+                )
+        except (OSError, KeyError, ValueError):
+            return None
+        
+        if fingerprint is not None and index.fingerprint != fingerprint:
+            return None
+        return index
+    
+    def _allowed_cities(self, cities, countries):
+        """
+        Combine city and country filters into a list of city indices.
+        
+        Args:
+            cities (list): City indices, or None
+            countries (list): Country names, or None
+        
+        Returns:
+            list: Allowed city indices, or None if nothing is filtered
+        """
+        if cities is None and countries is None:
+            return None
+        
+        allowed = set(range(len(self.city_countries)))
+        if cities is not None:
+            allowed &= set(cities)
+        if countries is not None:
+            countries = set(countries)
+            allowed = {city for city in allowed if self.city_countries[city] in countries}
+        return sorted(allowed)
+    
+    def _exact_search(self, query, k, rows):
+        """
+        Score a small set of catalog rows exactly.
+        
+        Args:
+            query (numpy.ndarray): Unit-length query
+            k (int): Number of results
+            rows (numpy.ndarray): Catalog rows to score
+        
+        Returns:
+            numpy.ndarray: Catalog rows, best first
+            numpy.ndarray: Their cosine similarities
+        """
+        return self._top_k(query, k, self.row_positions[rows])
+    
+    def _top_k(self, query, k, positions):
+        """
+        Pick the k best vectors among positions in list order.
+        
+        Args:
+            query (numpy.ndarray): Unit-length query
+            k (int): Number of results
+            positions (numpy.ndarray): Positions in self.vectors to score
+        
+        Returns:
+            numpy.ndarray: Catalog rows, best first
+            numpy.ndarray: Their cosine similarities
+        """
+        scores = self.vectors[positions] @ query
+        if len(scores) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+        else:
+            best = np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return self.list_rows[positions[best]], scores[best]
+
+
+def _normalize(vectors):
+    """Scale each row to unit length (zero rows are left as they are)."""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+def _assign(vectors, centroids, block_size=65536):
+    """
+    Assign each vector to its most similar centroid.
+    
+    Args:
+        vectors (numpy.ndarray): (n, dim) unit-length vectors
+        centroids (numpy.ndarray): (nlist, dim) unit-length centroids
+        block_size (int): Vectors scored at a time
+    
+    Returns:
+        numpy.ndarray: (n,) cluster of each vector
+    """
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), block_size):
+        block = vectors[start:start + block_size]
+        assignment[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+def _spherical_kmeans(vectors, nlist, iterations, rng):
+    """
+    Cluster unit-length vectors by cosine similarity.
+    
+    Args:
+        vectors (numpy.ndarray): (n, dim) unit-length training vectors
+        nlist (int): Number of clusters (at most n)
+        iterations (int): Lloyd iterations
+        rng (numpy.random.Generator): Random generator
+    
+    Returns:
+        numpy.ndarray: (nlist, dim) unit-length centroids
+    """
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids)
+        counts = np.bincount(assignment, minlength=nlist)
+        
+        # Sum the members of each cluster with one segmented reduction
+        order = np.argsort(assignment, kind='stable')
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(vectors[order], starts[nonempty], axis=0)
+        
+        # Re-seed empty clusters with random vectors
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+        
+        new_centroids = _normalize(sums)
+        if np.allclose(new_centroids, centroids):
+            break
+        centroids = new_centroids
+    return centroids
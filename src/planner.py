@@ -0,0 +1,945 @@
+"""
+Planning pipeline that keeps the catalog, embedding model and planner state loaded
+"""
+
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+
+from data.attraction_data import AttractionDataProcessor
+from models.embedding_model import (
+    TransformerEmbeddingModel, SimpleEmbeddingModel, SparseTfidfEmbeddingModel,
+    OnnxEmbeddingModel, EMBEDDING_BACKENDS
+)
+from models.embedding_cache import EmbeddingCache
+from models.embedding_store import EmbeddingStore, EMBEDDING_DTYPES
+from models.vector_index import IVFIndex
+from algorithms.similarity_calculator import SemanticSimilarityCalculator
+from algorithms.similarity_views import knn_graph
+from algorithms.itinerary_optimizer import ItineraryOptimizer, ALLOCATORS
+from algorithms.route_planner import RoutePlanner, create_planning_executor, PARALLEL_MODES
+from algorithms.distance_matrices import LazyDistanceMatrices
+from algorithms.city_sequencer import CitySequencer
+from algorithms.preference_scorer import PreferenceScorer
+from utils.helpers import format_itinerary_output, format_day_plan, assemble_itinerary_output
+from utils.latency import LatencyStats
+
+PACES = ('relaxed', 'moderate', 'fast')
+
+class ItineraryPlanner:
+    """
+    Plan itineraries for many requests against one attraction catalog.
+    
+    The catalog, embedding model, attraction embeddings, city travel matrix and
+    distance matrices are built once and shared by every request.
+    """
+    
+    def __init__(self, data_path, cities=None, use_transformer=False, embedding_cache_dir=None,
+                 embedding_cache_size=512, encode_batch_size=64, per_city_encode=False,
+                 route_solver='auto', route_time_limit=0.05, day_engine='greedy',
+                 day_engine_time_limit=2.0, ann_index=False, ann_nprobe=8,
+                 ann_candidates_per_city=5, similarity_format='lazy',
+                 similarity_neighbors=10, embedding_dtype=None, embedding_backend=None,
+                 onnx_model_dir=None, onnx_quantize=False, onnx_threads=None,
+                 plan_workers=1, plan_parallel='thread', allocator='dp'):
+        """
+        Load the catalog and embedding model.
+        
+        Args:
+            data_path (str or Path): Path to the attraction data JSON file
+            cities (list): Names of the cities to load, or None for the whole catalog
+            use_transformer (bool): Use the transformer model for embeddings
+            embedding_cache_dir (str): Directory for the persistent embedding cache
+            embedding_cache_size (int): Maximum size of the embedding cache in MB
+            encode_batch_size (int): Batch size for the catalog-wide encode
+            per_city_encode (bool): Encode each city separately for every
+                request (the original pipeline) instead of sharing embeddings
+            route_solver (str): Solver used to order each day's attractions
+            route_time_limit (float): Time budget in seconds per day route
+            day_engine (str): 'greedy' or 'ortools' day partitioning
+            day_engine_time_limit (float): OR-Tools time limit in seconds per city
+            ann_index (bool): Score cities for day allocation by their best
+                semantic matches, retrieved from an approximate nearest-neighbour
+                index saved next to the catalog (needs stable embeddings)
+            ann_nprobe (int): Index clusters scanned per query
+            ann_candidates_per_city (int): Best matches per city used for its score
+            similarity_format (str): Per-city similarity representation:
+                'lazy', 'knn' or 'dense' (see SemanticSimilarityCalculator)
+            similarity_neighbors (int): Neighbours per attraction for 'knn'
+            embedding_dtype (str): Storage of the shared attraction embeddings:
+                'float32', 'float16' or 'int8' (per-row scaled), or None to
+                keep the model's own dtype (see EmbeddingStore)
+            embedding_backend (str): 'tfidf' (re-fitted per call), 'sparse-tfidf'
+                (fitted once over the catalog and saved next to it),
+                'transformer' or 'onnx'; None picks by use_transformer
+            onnx_model_dir (str): Exported ONNX model directory for 'onnx'
+            onnx_quantize (bool): Run the ONNX model int8 dynamically quantized
+            onnx_threads (int): ONNX Runtime intra-op threads, or None for its default
+            plan_workers (int): Cities of an itinerary planned concurrently
+                (1 plans them one after another)
+            plan_parallel (str): 'thread' or 'process' workers for plan_workers > 1
+            allocator (str): Day allocation: 'dp' (optimal within the day
+                budget) or 'greedy' (see ItineraryOptimizer)
+        """
+        if embedding_backend is None:
+            embedding_backend = 'transformer' if use_transformer else 'tfidf'
+        if embedding_backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"Unknown embedding backend: {embedding_backend}. "
+                             f"Valid backends: {', '.join(EMBEDDING_BACKENDS)}")
+        if embedding_backend == 'onnx' and not onnx_model_dir:
+            raise ValueError("The onnx backend needs the exported model directory")
+        self.embedding_backend = embedding_backend
+        if embedding_dtype is not None and embedding_dtype not in EMBEDDING_DTYPES:
+            raise ValueError(f"Unknown embedding dtype: {embedding_dtype}. "
+                             f"Valid dtypes: {', '.join(EMBEDDING_DTYPES)}")
+        self.embedding_dtype = embedding_dtype
+        if plan_parallel not in PARALLEL_MODES:
+            raise ValueError(f"Unknown parallel mode: {plan_parallel}. "
+                             f"Valid modes: {', '.join(PARALLEL_MODES)}")
+        self.plan_workers = plan_workers
+        self.plan_parallel = plan_parallel
+        if allocator not in ALLOCATORS:
+            raise ValueError(f"Unknown allocator: {allocator}. "
+                             f"Valid allocators: {', '.join(ALLOCATORS)}")
+        self.allocator = allocator
+        
+        # Wall time of every pipeline stage, for monitoring long-running use
+        self.stage_stats = LatencyStats()
+        
+        self.data_path = Path(data_path)
+        with self.stage_stats.time('load_catalog'):
+            self.data_processor = AttractionDataProcessor(data_path, cities=cities)
+            self.cities_data = self.data_processor.get_processed_data()
+            self.attraction_store = self.data_processor.get_attraction_store()
+            self.preference_scorer = PreferenceScorer(self.attraction_store)
+        
+        # Filled on first use by _prepare_attraction_embeddings
+        self._attraction_texts = None
+        self._attraction_embeddings = None
+        self._city_blocks = None
+        self._base_similarities = {}
+        
+        with self.stage_stats.time('load_model'):
+            embedding_cache = None
+            if embedding_cache_dir and embedding_backend in ('transformer', 'onnx'):
+                embedding_cache = EmbeddingCache(
+                    embedding_cache_dir, max_bytes=embedding_cache_size * 1024 * 1024
+                )
+            
+            if embedding_backend == 'transformer':
+                self.embedding_model = TransformerEmbeddingModel(cache=embedding_cache)
+            elif embedding_backend == 'onnx':
+                self.embedding_model = OnnxEmbeddingModel(
+                    onnx_model_dir, quantize=onnx_quantize, intra_op_threads=onnx_threads,
+                    batch_size=encode_batch_size, cache=embedding_cache
+                )
+            elif embedding_backend == 'sparse-tfidf':
+                self.embedding_model = SparseTfidfEmbeddingModel()
+                self._fit_vocabulary()
+            else:
+                self.embedding_model = SimpleEmbeddingModel()
+        
+        if self.embedding_model.sparse and embedding_dtype not in (None, 'float32'):
+            print(f"{embedding_dtype} storage needs dense embeddings; "
+                  f"sparse TF-IDF vectors are kept as float32")
+            self.embedding_dtype = 'float32'
+        
+        self.similarity_calculator = SemanticSimilarityCalculator(
+            self.embedding_model, batch_size=encode_batch_size,
+            similarity_format=similarity_format, knn_neighbors=similarity_neighbors
+        )
+        self.per_city_encode = per_city_encode
+        
+        if ann_index and (self.embedding_model.fitted_per_call or self.embedding_model.sparse
+                          or per_city_encode):
+            print("The vector index needs shared, stable, dense embeddings; "
+                  "city scoring falls back to category matching")
+            ann_index = False
+        self.ann_index = ann_index
+        self.ann_nprobe = ann_nprobe
+        self.ann_candidates_per_city = ann_candidates_per_city
+        self._vector_index = None
+        
+        # Days reused verbatim vs. planned afresh by replan
+        self.replan_stats = {'reused_days': 0, 'planned_days': 0}
+        # Daily walking routes optimized and their summed lengths before/after
+        self.route_stats = {'routes': 0, 'initial_length_km': 0.0, 'final_length_km': 0.0}
+        
+        self.city_sequencer = CitySequencer.from_cities(self.cities_data)
+        self.distance_matrices = LazyDistanceMatrices(self.cities_data)
+        self.route_options = {
+            'route_solver': route_solver,
+            'route_time_limit': route_time_limit,
+            'day_engine': day_engine,
+            'day_engine_time_limit': day_engine_time_limit,
+        }
+        # Started on first use and kept for every request (see close)
+        self._planning_executor = None
+        
+        self.city_index = {city['name']: idx for idx, city in enumerate(self.cities_data)}
+    
+    def plan(self, days, preferences, pace='moderate', start_city=None, end_city=None):
+        """
+        Plan a single itinerary.
+        
+        Args:
+            days (int): Total number of days for the trip
+            preferences (list): Travel preferences
+            pace (str): Travel pace (relaxed, moderate, fast)
+            start_city (str): Name of the city the trip must start in, or None
+            end_city (str): Name of the city the trip must end in, or None
+        
+        Returns:
+            dict: Itinerary in the format_itinerary_output structure
+        """
+        request = {
+            'days': days,
+            'preferences': preferences,
+            'pace': pace,
+            'start_city': start_city,
+            'end_city': end_city,
+        }
+        result = self.plan_batch([request])[0]
+        if 'error' in result:
+            raise ValueError(result['error'])
+        return result['itinerary']
+    
+    def plan_batch(self, requests):
+        """
+        Plan itineraries for many requests.
+        
+        All distinct preference strings are encoded in a single call and
+        scored against every attraction with one matrix product.
+        
+        Args:
+            requests (list): Request dictionaries with 'days', 'preferences'
+                and optionally 'pace', 'start_city', 'end_city' and 'id'
+        
+        Returns:
+            list: One result per request: {'id', 'itinerary'} on success or
+                {'id', 'error'} if the request was invalid or planning failed
+        """
+        results = [None] * len(requests)
+        valid = []
+        for i, request in enumerate(requests):
+            try:
+                valid.append((i, self._validate_request(request)))
+            except ValueError as e:
+                results[i] = {'id': self._request_id(request, i), 'error': str(e)}
+        
+        if self.per_city_encode:
+            preference_scores, preference_embeddings = {}, {}
+        else:
+            preference_texts = sorted({
+                " ".join(request['preferences']) for _, request in valid
+                if request['preferences']
+            })
+            try:
+                with self.stage_stats.time('encode_preferences'):
+                    preference_scores, preference_embeddings = self._score_preferences(
+                        preference_texts
+                    )
+            except Exception as e:
+                # Every request of the batch depends on the shared encode
+                for i, _ in valid:
+                    results[i] = {'id': self._request_id(requests[i], i), 'error': str(e)}
+                return results
+        
+        for i, request in valid:
+            request_id = self._request_id(requests[i], i)
+            try:
+                itinerary = self._plan_request(request, preference_scores, preference_embeddings)
+                results[i] = {'id': request_id, 'itinerary': itinerary}
+            except Exception as e:
+                results[i] = {'id': request_id, 'error': str(e)}
+        
+        return results
+    
+    def _plan_request(self, request, preference_scores, preference_embeddings):
+        """
+        Run allocation, routing and formatting for one validated request.
+        
+        Args:
+            request (dict): Validated request
+            preference_scores (dict): Preference text -> per-attraction scores
+            preference_embeddings (dict): Preference text -> embedding
+        
+        Returns:
+            dict: Itinerary in the format_itinerary_output structure
+        """
+        preferences = request['preferences']
+        pace = request['pace']
+        
+        with self.stage_stats.time('similarities'):
+            if self.per_city_encode:
+                similarity_matrices = self.similarity_calculator.calculate_similarities(
+                    self.cities_data, preferences
+                )
+            else:
+                similarity_matrices = self._similarity_matrices(
+                    preference_scores.get(" ".join(preferences))
+                )
+        
+        with self.stage_stats.time('allocate_days'):
+            city_allocation = self._allocate_days(
+                request, similarity_matrices, preference_embeddings
+            )
+        
+        with self.stage_stats.time('plan_routes'):
+            route_planner = self._route_planner(similarity_matrices)
+            itinerary = route_planner.create_itinerary(
+                city_allocation, preferences, pace, request['start_city'], request['end_city']
+            )
+            self._record_route_stats(route_planner)
+        
+        with self.stage_stats.time('format_output'):
+            return format_itinerary_output(itinerary, preferences, pace)
+    
+    def replan(self, previous, days=None, drop_cities=None, pace=None,
+               start_city=None, end_city=None):
+        """
+        Re-plan an itinerary after a change, reusing the days it does not affect.
+        
+        Days are only re-allocated when a new number of days is given;
+        otherwise every remaining city keeps its days and the days freed by
+        dropped cities go to the remaining cities that gain most from them.
+        The trip keeps its first and last remaining cities as start and end
+        unless other ones are given. A city's days are
+        reused verbatim (only renumbered) when its number of days and the pace
+        are unchanged, and transition days are reused for cities that were
+        already adjacent, so the work done grows with the size of the change.
+        
+        Args:
+            previous (dict): Itinerary in the format_itinerary_output structure
+            days (int): New total number of days, or None to keep the allocation
+            drop_cities (list): Names of cities to leave out
+            pace (str): New travel pace, or None to keep the previous one
+            start_city (str): Name of the city the trip must start in, or None
+            end_city (str): Name of the city the trip must end in, or None
+        
+        Returns:
+            dict: Itinerary in the format_itinerary_output structure
+        
+        Raises:
+            ValueError: If the previous itinerary or the change is invalid
+        """
+        city_days, transitions, preferences, previous_pace = self._split_itinerary(previous)
+        
+        request = self._validate_request({
+            'days': days if days is not None else max(1, len(previous['daily_plans'])),
+            'preferences': preferences,
+            'pace': pace or previous_pace,
+            'start_city': start_city,
+            'end_city': end_city,
+        })
+        pace = request['pace']
+        
+        unknown = [name for name in drop_cities or () if name not in self.city_index]
+        if unknown:
+            raise ValueError(f"Unknown cities: {', '.join(unknown)}")
+        dropped = {self.city_index[name] for name in drop_cities or ()}
+        
+        # Keep the previous order of the remaining cities unless it may change
+        keep_order = days is None and start_city is None and end_city is None
+        kept = [city_idx for city_idx in city_days if city_idx not in dropped]
+        if kept:
+            if request['start_city'] is None and kept[0] != request['end_city']:
+                request['start_city'] = kept[0]
+            if request['end_city'] is None and kept[-1] != request['start_city']:
+                request['end_city'] = kept[-1]
+        
+        # Neither allocation nor routing reads the similarity matrices
+        with self.stage_stats.time('allocate_days'):
+            preference_embeddings = {}
+            if self.ann_index and preferences and (days is not None or dropped):
+                _, preference_embeddings = self._score_preferences([" ".join(preferences)])
+            if days is None:
+                city_allocation = {city_idx: len(city_days[city_idx]) for city_idx in kept}
+                # Days freed by the dropped cities and their transitions
+                extra_days = request['days'] - (sum(city_allocation.values()) + len(kept) - 1)
+                if dropped and extra_days > 0:
+                    city_allocation = self._itinerary_optimizer(
+                        request, {}, preference_embeddings
+                    ).extend_allocation(city_allocation, extra_days)
+            else:
+                city_allocation = self._allocate_days(
+                    request, {}, preference_embeddings, exclude_cities=sorted(dropped)
+                )
+        if not city_allocation:
+            raise ValueError("No cities left to visit")
+        
+        with self.stage_stats.time('plan_routes'):
+            route_planner = self._route_planner({})
+            if keep_order:
+                city_sequence = list(city_allocation)
+            else:
+                city_sequence = self.city_sequencer.sequence(
+                    list(city_allocation), request['start_city'], request['end_city']
+                )
+            
+            day_plans = []
+            prev_city_idx = None
+            for city_idx in city_sequence:
+                if prev_city_idx is not None:
+                    names = (self.cities_data[prev_city_idx]['name'], self.cities_data[city_idx]['name'])
+                    transition = transitions.get(names)
+                    if transition is None:
+                        transition = format_day_plan(route_planner._create_transition_day(
+                            len(day_plans) + 1, prev_city_idx, city_idx
+                        ))
+                        self.replan_stats['planned_days'] += 1
+                    else:
+                        self.replan_stats['reused_days'] += 1
+                    day_plans.append(dict(transition, day_number=len(day_plans) + 1))
+                
+                plans = city_days.get(city_idx)
+                if plans is not None and len(plans) == city_allocation[city_idx] and pace == previous_pace:
+                    self.replan_stats['reused_days'] += len(plans)
+                else:
+                    plans = [
+                        format_day_plan(day_data, first_in_city=(i == 0))
+                        for i, day_data in enumerate(route_planner.plan_city(
+                            city_idx, city_allocation[city_idx], preferences, pace
+                        ))
+                    ]
+                    self.replan_stats['planned_days'] += len(plans)
+                
+                for day_plan in plans:
+                    day_plans.append(dict(day_plan, day_number=len(day_plans) + 1))
+                prev_city_idx = city_idx
+            self._record_route_stats(route_planner)
+        
+        with self.stage_stats.time('format_output'):
+            return assemble_itinerary_output(day_plans, preferences, pace)
+    
+    def warm_up(self, distance_matrices=True):
+        """
+        Compute the request-independent state ahead of the first request.
+        
+        Args:
+            distance_matrices (bool): Also build every city's distance matrix
+                (up to the distance cache's memory ceiling)
+        """
+        with self.stage_stats.time('warm_up'):
+            if not self.per_city_encode:
+                self._prepare_attraction_embeddings()
+                self._similarity_matrices(None)
+            if distance_matrices:
+                for city_idx in range(len(self.cities_data)):
+                    self.distance_matrices.get(city_idx)
+    
+    def close(self):
+        """Shut down the city planning workers and write the embedding cache index."""
+        if self._planning_executor is not None:
+            self._planning_executor.shutdown()
+            self._planning_executor = None
+        if self.embedding_model.cache is not None:
+            self.embedding_model.cache.close()
+    
+    def vector_index(self):
+        """
+        Get the approximate nearest-neighbour index over all attraction embeddings.
+        
+        The index is loaded from next to the catalog if it was built from the
+        same model and texts, and built (and saved there) otherwise.
+        
+        Returns:
+            IVFIndex: The index
+        
+        Raises:
+            ValueError: If the embedding model is re-fitted on every call or
+                sparse, so its vectors cannot be indexed
+        """
+        if self._vector_index is not None:
+            return self._vector_index
+        if self.embedding_model.fitted_per_call or self.embedding_model.sparse:
+            raise ValueError("The vector index needs a model with stable, dense embeddings "
+                             "(use the transformer model)")
+        
+        with self.stage_stats.time('load_vector_index'):
+            self._prepare_attraction_texts()
+            namespace = self.embedding_model.cache_namespace or type(self.embedding_model).__name__
+            fingerprint = IVFIndex.make_fingerprint(namespace, self._attraction_texts)
+            path = self._vector_index_path(namespace)
+            
+            index = IVFIndex.load(path, fingerprint)
+            if index is None:
+                print(f"Building vector index over {len(self._attraction_texts)} attractions...")
+                if self._attraction_embeddings is None:
+                    self._prepare_attraction_embeddings()
+                index = IVFIndex.build(
+                    self._attraction_embeddings.toarray(), self.attraction_store.city_ids,
+                    [city['country'] for city in self.cities_data],
+                    nprobe=self.ann_nprobe, fingerprint=fingerprint
+                )
+                try:
+                    index.save(path)
+                except OSError as e:
+                    print(f"Could not save vector index to {path}: {e}")
+            index.nprobe = self.ann_nprobe
+            self._vector_index = index
+        
+        return self._vector_index
+    
+    def search_attractions(self, preferences, k=10, cities=None, countries=None):
+        """
+        Find the attractions anywhere in the catalog that best match preferences.
+        
+        Args:
+            preferences (list): Travel preferences
+            k (int): Number of results
+            cities (list): Only search these city names
+            countries (list): Only search cities in these countries
+        
+        Returns:
+            list: Result dictionaries ('city', 'country', 'name', 'categories',
+                'score'), best match first
+        
+        Raises:
+            ValueError: If there are no preferences or a city is unknown
+        """
+        if not preferences:
+            raise ValueError("Searching needs at least one preference")
+        
+        city_indices = None
+        if cities is not None:
+            unknown = [name for name in cities if name not in self.city_index]
+            if unknown:
+                raise ValueError(f"Unknown cities: {', '.join(unknown)}")
+            city_indices = [self.city_index[name] for name in cities]
+        
+        index = self.vector_index()
+        # Stable embeddings, so the query need not be encoded with the attractions
+        query = self.embedding_model.get_embeddings_batched([" ".join(preferences)])[0]
+        rows, scores = index.search(query, k=k, cities=city_indices, countries=countries)
+        
+        results = []
+        for row, score in zip(rows, scores):
+            city = self.cities_data[self.attraction_store.city_ids[row]]
+            results.append({
+                'city': city['name'],
+                'country': city['country'],
+                'name': self.attraction_store.names[row],
+                'categories': self.attraction_store.categories(row),
+                'score': round(float(score), 4),
+            })
+        return results
+    
+    def stats(self):
+        """
+        Get catalog size, stage latencies and cache counters.
+        
+        Returns:
+            dict: Planner statistics
+        """
+        stats = {
+            'cities': len(self.cities_data),
+            'attractions': len(self.attraction_store),
+            'attraction_store_bytes': self.attraction_store.nbytes(),
+            'embedding_dtype': (
+                self._attraction_embeddings.storage_dtype
+                if self._attraction_embeddings is not None else self.embedding_dtype
+            ),
+            'embedding_bytes': (
+                self._attraction_embeddings.nbytes()
+                if self._attraction_embeddings is not None else 0
+            ),
+            'similarity_format': self.similarity_calculator.similarity_format,
+            'similarity_bytes': sum(
+                _similarity_nbytes(base) for base in self._base_similarities.values()
+            ),
+            'stages': self.stage_stats.summary(),
+            'replan': dict(self.replan_stats),
+            'routes': dict(self.route_stats),
+            'distance_matrices': {
+                'hits': self.distance_matrices.hits,
+                'misses': self.distance_matrices.misses,
+                'evictions': self.distance_matrices.evictions,
+                'bytes': self.distance_matrices.nbytes(),
+            },
+        }
+        if self.embedding_model.cache is not None:
+            stats['embedding_cache'] = self.embedding_model.cache.stats()
+        if self.embedding_model.sparse:
+            stats['vocabulary'] = {
+                'terms': len(self.embedding_model.terms),
+                'bytes': self.embedding_model.nbytes(),
+            }
+        return stats
+    
+    def _validate_request(self, request):
+        """
+        Check a request and normalise it.
+        
+        Args:
+            request (dict): Raw request
+        
+        Returns:
+            dict: Request with 'days', 'preferences', 'pace' and city indices
+        
+        Raises:
+            ValueError: If the request is malformed
+        """
+        if not isinstance(request, dict):
+            raise ValueError("Request must be a JSON object")
+        
+        days = request.get('days')
+        if not isinstance(days, int) or isinstance(days, bool) or days <= 0:
+            raise ValueError("'days' must be a positive integer")
+        
+        preferences = request.get('preferences', [])
+        if isinstance(preferences, str):
+            preferences = preferences.split()
+        if not isinstance(preferences, list) or not all(isinstance(p, str) for p in preferences):
+            raise ValueError("'preferences' must be a list of strings")
+        
+        pace = request.get('pace') or 'moderate'
+        if pace not in PACES:
+            raise ValueError(f"'pace' must be one of: {', '.join(PACES)}")
+        
+        cities = {}
+        for key in ('start_city', 'end_city'):
+            name = request.get(key)
+            if name is not None and name not in self.city_index:
+                raise ValueError(f"Unknown {key.replace('_', ' ')}: {name}")
+            cities[key] = self.city_index.get(name)
+        
+        return {
+            'days': days,
+            'preferences': preferences,
+            'pace': pace,
+            'start_city': cities['start_city'],
+            'end_city': cities['end_city'],
+        }
+    
+    def _split_itinerary(self, itinerary):
+        """
+        Split a formatted itinerary into the days spent in each city and its transitions.
+        
+        Args:
+            itinerary (dict): Itinerary in the format_itinerary_output structure
+        
+        Returns:
+            dict: City index -> that city's day plans, in order
+            dict: (from city name, to city name) -> transition day plan
+            list: Preferences of the itinerary
+            str: Pace of the itinerary
+        
+        Raises:
+            ValueError: If the itinerary is malformed or visits unknown cities
+        """
+        city_days = {}
+        transitions = {}
+        try:
+            summary = itinerary['itinerary_summary']
+            preferences = list(summary.get('preferences') or [])
+            pace = summary.get('pace') or 'moderate'
+            
+            current_city = None
+            for day_plan in itinerary['daily_plans']:
+                if day_plan['is_transition_day']:
+                    transitions[(day_plan['from_city'], day_plan['to_city'])] = day_plan
+                    current_city = None
+                    continue
+                
+                city_idx = self.city_index.get(day_plan['city'])
+                if city_idx is None:
+                    raise ValueError(f"Previous itinerary visits an unknown city: {day_plan['city']}")
+                if city_idx != current_city and city_idx in city_days:
+                    raise ValueError(f"Previous itinerary visits {day_plan['city']} more than once")
+                city_days.setdefault(city_idx, []).append(day_plan)
+                current_city = city_idx
+        except (KeyError, TypeError, AttributeError):
+            raise ValueError("Previous itinerary is not in the planner's output format")
+        
+        return city_days, transitions, preferences, pace
+    
+    @staticmethod
+    def _request_id(request, position):
+        """Get a request's 'id', defaulting to its position in the batch."""
+        if isinstance(request, dict) and 'id' in request:
+            return request['id']
+        return position
+    
+    def _allocate_days(self, request, similarity_matrices, preference_embeddings,
+                       exclude_cities=None):
+        """
+        Allocate a request's days across cities.
+        
+        Args:
+            request (dict): Validated request
+            similarity_matrices (dict): Per-city similarities
+            preference_embeddings (dict): Preference text -> embedding
+            exclude_cities (list): Indices of cities that must not be visited
+        
+        Returns:
+            dict: Number of days allocated to each city
+        """
+        itinerary_optimizer = self._itinerary_optimizer(
+            request, similarity_matrices, preference_embeddings
+        )
+        return itinerary_optimizer.allocate_days(
+            request['days'], request['start_city'], request['end_city'], exclude_cities
+        )
+    
+    def _itinerary_optimizer(self, request, similarity_matrices, preference_embeddings):
+        """
+        Create an itinerary optimizer for a request over the shared catalog.
+        
+        Args:
+            request (dict): Validated request
+            similarity_matrices (dict): Per-city similarities
+            preference_embeddings (dict): Preference text -> embedding
+        
+        Returns:
+            ItineraryOptimizer: Optimizer scoring cities for the request
+        """
+        preferences = request['preferences']
+        preference_candidates = None
+        if self.ann_index and preferences:
+            preference_candidates = self.similarity_calculator.retrieve_candidates(
+                self.vector_index(), preference_embeddings[" ".join(preferences)],
+                k=self.ann_candidates_per_city * len(self.cities_data)
+            )
+        
+        return ItineraryOptimizer(
+            self.cities_data, similarity_matrices, preferences, request['pace'],
+            city_sequencer=self.city_sequencer,
+            attraction_store=self.attraction_store,
+            preference_scorer=self.preference_scorer,
+            preference_candidates=preference_candidates,
+            candidates_per_city=self.ann_candidates_per_city,
+            allocator=self.allocator
+        )
+    
+    def _record_route_stats(self, route_planner):
+        """Add a route planner's optimized daily routes to the route totals."""
+        for entry in route_planner.route_stats:
+            self.route_stats['routes'] += 1
+            self.route_stats['initial_length_km'] += entry['initial_length_km']
+            self.route_stats['final_length_km'] += entry['final_length_km']
+    
+    def _route_planner(self, similarity_matrices):
+        """Create a route planner sharing the planner's distance matrices, scorer and workers."""
+        route_planner = RoutePlanner(
+            self.cities_data, similarity_matrices,
+            city_sequencer=self.city_sequencer,
+            distance_matrices=self.distance_matrices,
+            attraction_store=self.attraction_store,
+            preference_scorer=self.preference_scorer,
+            executor=self._planning_executor,
+            **self.route_options
+        )
+        if self.plan_workers > 1 and self._planning_executor is None:
+            # Process workers copy this first planner; later ones differ only
+            # in similarity matrices, which city planning does not read
+            self._planning_executor = create_planning_executor(
+                route_planner, self.plan_parallel, self.plan_workers
+            )
+            route_planner.executor = self._planning_executor
+        return route_planner
+    
+    def _prepare_attraction_texts(self):
+        """Collect the embedding texts of all attractions and each city's block of rows."""
+        if self._attraction_texts is not None:
+            return
+        texts, indices = self.data_processor.get_attraction_texts()
+        self._attraction_texts = texts
+        
+        # Attractions of a city are contiguous in get_attraction_texts order
+        self._city_blocks = {}
+        for row, (city_idx, _) in enumerate(indices):
+            start, _ = self._city_blocks.get(city_idx, (row, row))
+            self._city_blocks[city_idx] = (start, row + 1)
+    
+    def _fit_vocabulary(self):
+        """
+        Load the sparse TF-IDF vocabulary saved next to the catalog, or fit it.
+        
+        The vocabulary is re-fitted (and saved) only when the catalog texts
+        or the model settings changed.
+        """
+        self._prepare_attraction_texts()
+        model = self.embedding_model
+        fingerprint = IVFIndex.make_fingerprint(model.name, self._attraction_texts)
+        path = self.data_path.with_name(f"{self.data_path.stem}.tfidf.npz")
+        
+        if model.load(path, fingerprint):
+            return
+        print(f"Fitting TF-IDF vocabulary on {len(self._attraction_texts)} attractions...")
+        model.fit(self._attraction_texts, fingerprint)
+        try:
+            model.save(path)
+        except OSError as e:
+            print(f"Could not save TF-IDF vocabulary to {path}: {e}")
+    
+    def _prepare_attraction_embeddings(self, extra_texts=()):
+        """
+        Encode every attraction once, together with any extra texts.
+        
+        Models whose vectors are only comparable within one call (TF-IDF) are
+        re-fitted on the attraction texts plus the extra texts each time. The
+        attraction embeddings are kept normalized in an EmbeddingStore of the
+        configured dtype.
+        
+        Args:
+            extra_texts (list): Additional texts to encode in the same pass
+        
+        Returns:
+            numpy.ndarray: Embeddings of the extra texts
+        """
+        self._prepare_attraction_texts()
+        extra_texts = list(extra_texts)
+        batch_size = self.similarity_calculator.batch_size
+        
+        if self._attraction_embeddings is not None and not self.embedding_model.fitted_per_call:
+            if not extra_texts:
+                return np.array([])
+            extra_embeddings = self.embedding_model.get_embeddings_batched(
+                extra_texts, batch_size=batch_size
+            )
+            if not self.embedding_model.fitted_per_call:
+                return extra_embeddings
+            # The model fell back to TF-IDF meanwhile: re-encode everything together
+        
+        all_embeddings = self.embedding_model.get_embeddings_batched(
+            self._attraction_texts + extra_texts, batch_size=batch_size
+        )
+        count = len(self._attraction_texts)
+        self._attraction_embeddings = EmbeddingStore.from_embeddings(
+            all_embeddings[:count], self.embedding_dtype
+        )
+        # New attraction embeddings invalidate the cached cosine matrices
+        self._base_similarities = {}
+        return all_embeddings[count:]
+    
+    def _score_preferences(self, preference_texts):
+        """
+        Score every attraction against every preference text.
+        
+        Args:
+            preference_texts (list): Distinct preference strings
+        
+        Returns:
+            dict: Preference text -> numpy.ndarray of per-attraction scores (0-1)
+            dict: Preference text -> unit-length preference embedding
+        """
+        preference_embeddings = self._prepare_attraction_embeddings(preference_texts)
+        if not preference_texts or len(self._attraction_texts) == 0:
+            return {}, {}
+        
+        preference_embeddings = EmbeddingStore.from_embeddings(preference_embeddings).vectors
+        
+        # (attractions x preference texts) cosine similarities in one product
+        scores = (self._attraction_embeddings.dot(preference_embeddings) + 1) / 2
+        
+        return (
+            {text: scores[:, column] for column, text in enumerate(preference_texts)},
+            dict(zip(preference_texts, preference_embeddings))
+        )
+    
+    def _similarity_matrices(self, attraction_scores):
+        """
+        Build per-city similarities, weighted by a request's preference scores.
+        
+        Args:
+            attraction_scores (numpy.ndarray): Per-attraction preference scores,
+                or None if the request has no preferences
+        
+        Returns:
+            dict: Dictionary mapping city indices to similarities in the
+                calculator's format
+        """
+        if self._attraction_embeddings is None:
+            self._prepare_attraction_embeddings()
+        
+        calculator = self.similarity_calculator
+        if calculator.similarity_format != 'dense':
+            normalized = self._attraction_embeddings
+            similarity_matrices = {}
+            for city_idx, (start, end) in self._city_blocks.items():
+                # Only the preference-independent kNN graphs are worth caching
+                graph = self._base_similarities.get(city_idx)
+                if graph is None and calculator.similarity_format == 'knn':
+                    graph = knn_graph(normalized[start:end], calculator.knn_neighbors)
+                    self._base_similarities[city_idx] = graph
+                
+                scores = None if attraction_scores is None else attraction_scores[start:end]
+                similarity_matrices[city_idx] = calculator.similarity_view(
+                    normalized[start:end], scores, graph=graph
+                )
+            return similarity_matrices
+        
+        similarity_matrices = {}
+        for city_idx, (start, end) in self._city_blocks.items():
+            base = self._base_similarities.get(city_idx)
+            if base is None:
+                base = self._attraction_embeddings[start:end].similarities()
+                self._base_similarities[city_idx] = base
+            
+            if attraction_scores is None:
+                similarity_matrices[city_idx] = base.copy()
+            else:
+                similarity_matrices[city_idx] = self.similarity_calculator._weight_by_preferences(
+                    base, attraction_scores[start:end]
+                )
+        
+        return similarity_matrices
+    
+    def _vector_index_path(self, namespace):
+        """
+        Get the file the vector index is saved to, next to the catalog.
+        
+        Args:
+            namespace (str): Name of the embedding model
+        
+        Returns:
+            Path: Index file path
+        """
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', namespace).strip('-')
+        return self.data_path.with_name(f"{self.data_path.stem}.{slug}.ivf.npz")
+
+def _similarity_nbytes(similarities):
+    """Memory held by a cached dense matrix or sparse graph."""
+    if hasattr(similarities, 'indptr'):
+        return similarities.data.nbytes + similarities.indices.nbytes + similarities.indptr.nbytes
+    return similarities.nbytes
+
+def read_requests(path):
+    """
+    Read planning requests from a JSON Lines file.
+    
+    Args:
+        path (str or Path): Path to the requests file
+    
+    Returns:
+        list: Request dictionaries (blank lines are skipped)
+    
+    Raises:
+        ValueError: If a line is not valid JSON
+    """
+    requests = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                requests.append(json.loads(line))
+            except json.JSONDecodeError:
+                raise ValueError(f"Invalid JSON on line {line_number} of {path}")
+    return requests
+
+def write_results(path, results):
+    """
+    Write planning results as JSON Lines, one result per line.
+    
+    Args:
+        path (str or Path): Path to the output file
+        results (list): Result dictionaries from ItineraryPlanner.plan_batch
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for result in results:
+            f.write(json.dumps(result, ensure_ascii=False))
+            f.write('\n')
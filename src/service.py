@@ -0,0 +1,191 @@
+"""
+Long-running planner service that keeps the model and catalog warm
+
+Endpoints (JSON over HTTP, localhost by default):
+    GET  /health      Liveness, uptime and catalog size
+    GET  /stats       Per-stage latency statistics and cache counters
+    POST /plan        One request: {"days", "preferences", "pace", ...}
+    POST /plan_batch  A list of requests, answered like --batch
+    POST /replan      {"itinerary", "days", "drop_cities", "pace", ...}, answered like --replan
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class PlannerService:
+    """Answer planning requests from an ItineraryPlanner kept in memory."""
+    
+    def __init__(self, planner, host='127.0.0.1', port=8765, max_body_bytes=1024 * 1024):
+        """
+        Initialize the service.
+        
+        Args:
+            planner (ItineraryPlanner): Loaded planner shared by all requests
+            host (str): Interface to listen on
+            port (int): Port to listen on (0 picks a free port)
+            max_body_bytes (int): Largest request body accepted
+        """
+        self.planner = planner
+        self.max_body_bytes = max_body_bytes
+        self.started = time.time()
+        self.requests_served = 0
+        
+        # The planner's caches are not thread-safe; plans run one at a time
+        # while health and stats stay responsive
+        self._plan_lock = threading.Lock()
+        
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+    
+    @property
+    def address(self):
+        """Get the (host, port) the service is listening on."""
+        return self.server.server_address[:2]
+    
+    def serve_forever(self):
+        """Serve requests until interrupted."""
+        host, port = self.address
+        print(f"Planner service listening on http://{host}:{port}")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            print("Shutting down planner service")
+        finally:
+            self.server.server_close()
+    
+    def shutdown(self):
+        """Stop a service running in another thread."""
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def health(self):
+        """
+        Get the service health.
+        
+        Returns:
+            dict: Status, uptime, request count and catalog size
+        """
+        return {
+            'status': 'ok',
+            'uptime_s': round(time.time() - self.started, 3),
+            'requests_served': self.requests_served,
+            'cities': len(self.planner.cities_data),
+        }
+    
+    def plan(self, request):
+        """
+        Plan one request.
+        
+        Args:
+            request (dict): Planning request
+        
+        Returns:
+            dict: {'id', 'itinerary'} or {'id', 'error'}
+        """
+        return self.plan_batch([request])[0]
+    
+    def plan_batch(self, requests):
+        """
+        Plan several requests.
+        
+        Args:
+            requests (list): Planning requests
+        
+        Returns:
+            list: One result per request
+        """
+        with self._plan_lock:
+            with self.planner.stage_stats.time('request'):
+                results = self.planner.plan_batch(requests)
+            self.requests_served += len(requests)
+        return results
+    
+    def replan(self, request):
+        """
+        Re-plan a previous itinerary after a change.
+        
+        Args:
+            request (dict): {'itinerary', and optionally 'days', 'drop_cities',
+                'pace', 'start_city', 'end_city'}
+        
+        Returns:
+            dict: {'itinerary'} or {'error'}
+        """
+        if not isinstance(request, dict) or 'itinerary' not in request:
+            return {'error': "Request must be a JSON object with an 'itinerary'"}
+        
+        with self._plan_lock:
+            try:
+                with self.planner.stage_stats.time('request'):
+                    itinerary = self.planner.replan(
+                        request['itinerary'], days=request.get('days'),
+                        drop_cities=request.get('drop_cities'), pace=request.get('pace'),
+                        start_city=request.get('start_city'), end_city=request.get('end_city')
+                    )
+            except Exception as e:
+                return {'error': str(e)}
+            finally:
+                self.requests_served += 1
+        return {'itinerary': itinerary}
+    
+    def _make_handler(self):
+        """Create the request handler class bound to this service."""
+        service = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            """HTTP handler for the planner endpoints."""
+            
+            def do_GET(self):
+                if self.path == '/health':
+                    self._send_json(200, service.health())
+                elif self.path == '/stats':
+                    self._send_json(200, service.planner.stats())
+                else:
+                    self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+            
+            def do_POST(self):
+                if self.path not in ('/plan', '/plan_batch', '/replan'):
+                    self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+                    return
+                
+                try:
+                    body = self._read_json()
+                except ValueError as e:
+                    self._send_json(400, {'error': str(e)})
+                    return
+                
+                if self.path in ('/plan', '/replan'):
+                    handle = service.plan if self.path == '/plan' else service.replan
+                    result = handle(body)
+                    self._send_json(400 if 'error' in result else 200, result)
+                elif not isinstance(body, list):
+                    self._send_json(400, {'error': "Expected a JSON list of requests"})
+                else:
+                    self._send_json(200, service.plan_batch(body))
+            
+            def _read_json(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length <= 0:
+                    raise ValueError("Request body is empty")
+                if length > service.max_body_bytes:
+                    raise ValueError("Request body is too large")
+                try:
+                    return json.loads(self.rfile.read(length).decode('utf-8'))
+                except (UnicodeDecodeError, json.JSONDecodeError):
+                    raise ValueError("Request body is not valid JSON")
+            
+            def _send_json(self, status, payload):
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            
+            def log_message(self, format, *args):
+                # Keep the console quiet; latency is reported through /stats
+                pass
+        
+        return Handler
@@ -0,0 +1,24 @@
+"""
+Fixed start and end cities of the city sequencer
+"""
+
+import numpy as np
+
+from algorithms.city_sequencer import CitySequencer
+from benchmarks.synthetic_catalog import iter_cities
+
+def test_heuristic_order_keeps_fixed_endpoints():
+    """Trips longer than exact_limit start and end at the fixed cities."""
+    rng = np.random.default_rng(0)
+    for seed in range(50):
+        cities = list(iter_cities(14, 1, seed=seed))
+        sequencer = CitySequencer.from_cities(cities, exact_limit=10)
+        start, end = (int(city) for city in rng.choice(14, size=2, replace=False))
+        
+        for fixed_start, fixed_end in ((start, None), (None, end), (start, end)):
+            order = sequencer.sequence(list(range(14)), fixed_start, fixed_end)
+            assert sorted(order) == list(range(14))
+            if fixed_start is not None:
+                assert order[0] == fixed_start
+            if fixed_end is not None:
+                assert order[-1] == fixed_end
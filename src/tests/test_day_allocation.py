@@ -0,0 +1,25 @@
+"""
+Day allocation invariants, checked on a few random synthetic trials
+"""
+
+from benchmarks.day_allocation import run_check
+
+def test_dp_allocator_invariants():
+    """The dp allocator respects budget, exclusions and endpoints and is optimal on small trips."""
+    report = run_check(trials=40, max_cities=30, exhaustive_cities=5, timing_cities=50,
+                       seed=0, max_allocate_ms=500.0)
+    dp = report['results']['dp']
+    
+    assert report['exhaustive_trials'] > 0
+    assert dp['over_budget'] == 0
+    assert dp['excluded_visited'] == 0
+    assert dp['empty_days'] == 0
+    assert dp['endpoint_missed'] == 0
+    assert dp['beaten_by_exhaustive'] == 0
+    assert report['passed']
+
+def test_greedy_allocator_never_visits_excluded_cities():
+    """The greedy allocator may exceed the budget but never visits an excluded city."""
+    report = run_check(trials=40, max_cities=30, exhaustive_cities=5, timing_cities=10,
+                       seed=1, max_allocate_ms=500.0)
+    assert report['results']['greedy']['excluded_visited'] == 0
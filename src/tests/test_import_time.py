@@ -0,0 +1,12 @@
+"""
+Cold import of the CLI must not load heavy optional dependencies
+"""
+
+from benchmarks.import_time import run_check
+
+def test_main_import_defers_heavy_dependencies():
+    """Importing main.py pulls in none of DEFERRED_MODULES, within a generous budget."""
+    result = run_check(budget_ms=5000, repeats=1)
+    
+    assert result['deferred_modules_imported'] == []
+    assert result['passed']
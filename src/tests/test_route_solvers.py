@@ -0,0 +1,24 @@
+"""
+Iteration budget of the exact route solver
+"""
+
+import numpy as np
+
+from algorithms.route_solvers import HeldKarpSolver
+
+def random_distances(n, seed=0):
+    """Euclidean distances between n random points."""
+    points = np.random.default_rng(seed).random((n, 2))
+    return np.linalg.norm(points[:, np.newaxis] - points[np.newaxis], axis=2)
+
+def test_held_karp_respects_state_budget():
+    """Held-Karp only runs when its 2^n subsets fit in max_iterations."""
+    distances = random_distances(8)
+    
+    exact = HeldKarpSolver(max_iterations=1 << 8).solve(distances)
+    assert exact['iterations'] == 1 << 8
+    
+    limited = HeldKarpSolver(max_iterations=(1 << 8) - 1).solve(distances)
+    assert limited['iterations'] <= (1 << 8) - 1
+    assert sorted(limited['route']) == list(range(8))
+    assert limited['final_length'] >= exact['final_length'] - 1e-9
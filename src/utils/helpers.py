@@ -14,6 +14,30 @@ def format_itinerary_output(itinerary, preferences, pace):
         preferences (list): User preferences
         pace (str): Travel pace
         
+    Returns:
+        dict: Structured itinerary output
+    """
+    # Create detailed day plans
+    days = []
+    for day_data in itinerary:
+        # City tips go on the first day in a city
+        first_in_city = (
+            day_data['day'] == 1 or
+            itinerary[day_data['day']-2].get('city', '') != day_data.get('city')
+        )
+        days.append(format_day_plan(day_data, first_in_city))
+    
+    return assemble_itinerary_output(days, preferences, pace)
+
+def assemble_itinerary_output(days, preferences, pace):
+    """
+    Wrap formatted day plans with a summary of the whole trip.
+    
+    Args:
+        days (list): Day plans as produced by format_day_plan
+        preferences (list): User preferences
+        pace (str): Travel pace
+    
     Returns:
         dict: Structured itinerary output
     """
@@ -22,8 +46,8 @@ def format_itinerary_output(itinerary, preferences, pace):
     total_attractions = 0
     countries_visited = set()
     
-    for day in itinerary:
-        if 'transition' in day and day['transition']:
+    for day in days:
+        if day['is_transition_day']:
             cities_visited.add(day['from_city'])
             cities_visited.add(day['to_city'])
             countries_visited.add(day['from_country'])
@@ -35,7 +59,7 @@ def format_itinerary_output(itinerary, preferences, pace):
     
     # Create summary
     summary = {
-        "total_days": len(itinerary),
+        "total_days": len(days),
         "cities_visited": list(cities_visited),
         "countries_visited": list(countries_visited),
         "total_attractions": total_attractions,
@@ -44,57 +68,6 @@ def format_itinerary_output(itinerary, preferences, pace):
         "generated_date": datetime.datetime.now().strftime("%Y-%m-%d"),
     }
     
-    # Create detailed day plans
-    days = []
-    for day_data in itinerary:
-        day_plan = {
-            "day_number": day_data['day'],
-            "date": None  # This would be set by the user later
-        }
-        
-        # Handle transition days specially
-        if 'transition' in day_data and day_data['transition']:
-            day_plan.update({
-                "is_transition_day": True,
-                "from_city": day_data['from_city'],
-                "from_country": day_data['from_country'],
-                "to_city": day_data['to_city'],
-                "to_country": day_data['to_country'],
-                "travel_details": {
-                    "mode": day_data['travel_mode'],
-                    "duration_hours": day_data['travel_time_hours'],
-                    "distance_km": day_data['distance_km'],
-                },
-                "travel_tips": day_data['travel_tips']
-            })
-        else:
-            # Regular day in a city
-            attractions_list = []
-            for attraction in day_data.get('attractions', []):
-                attractions_list.append({
-                    "name": attraction['name'],
-                    "category": attraction['categories'],
-                    "duration_hours": attraction['duration_hours'],
-                    "start_time": attraction['start_time'],
-                    "end_time": attraction['end_time'],
-                    "cost": attraction.get('cost', '€€'),
-                    "description": attraction['description']
-                })
-            
-            day_plan.update({
-                "is_transition_day": False,
-                "city": day_data['city'],
-                "country": day_data['country'],
-                "attractions": attractions_list,
-                "meals": day_data.get('meals', {})
-            })
-            
-            # Add city tips if it's the first day in a city
-            if day_data['day'] == 1 or itinerary[day_data['day']-2].get('city', '') != day_data['city']:
-                day_plan["city_tips"] = generate_city_tips(day_data['city'], day_data['country'])
-        
-        days.append(day_plan)
-    
     # Create full output structure
     output = {
         "itinerary_summary": summary,
@@ -103,6 +76,65 @@ def format_itinerary_output(itinerary, preferences, pace):
     
     return output
 
+def format_day_plan(day_data, first_in_city=False):
+    """
+    Format one day of the itinerary.
+    
+    Args:
+        day_data (dict): Daily itinerary from the route planner
+        first_in_city (bool): Whether this is the first day in its city
+            (city tips are added)
+    
+    Returns:
+        dict: Structured day plan
+    """
+    day_plan = {
+        "day_number": day_data['day'],
+        "date": None  # This would be set by the user later
+    }
+    
+    # Handle transition days specially
+    if 'transition' in day_data and day_data['transition']:
+        day_plan.update({
+            "is_transition_day": True,
+            "from_city": day_data['from_city'],
+            "from_country": day_data['from_country'],
+            "to_city": day_data['to_city'],
+            "to_country": day_data['to_country'],
+            "travel_details": {
+                "mode": day_data['travel_mode'],
+                "duration_hours": day_data['travel_time_hours'],
+                "distance_km": day_data['distance_km'],
+            },
+            "travel_tips": day_data['travel_tips']
+        })
+    else:
+        # Regular day in a city
+        attractions_list = []
+        for attraction in day_data.get('attractions', []):
+            attractions_list.append({
+                "name": attraction['name'],
+                "category": attraction['categories'],
+                "duration_hours": attraction['duration_hours'],
+                "start_time": attraction['start_time'],
+                "end_time": attraction['end_time'],
+                "cost": attraction.get('cost', '€€'),
+                "description": attraction['description']
+            })
+        
+        day_plan.update({
+            "is_transition_day": False,
+            "city": day_data['city'],
+            "country": day_data['country'],
+            "attractions": attractions_list,
+            "meals": day_data.get('meals', {})
+        })
+        
+        if first_in_city:
+            day_plan["city_tips"] = generate_city_tips(day_data['city'], day_data['country'])
+    
+    return day_plan
+
 def generate_city_tips(city, country):
     """
     Generate tips for a specific city.
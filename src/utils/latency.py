@@ -0,0 +1,80 @@
+"""
+Latency statistics for pipeline stages
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from utils.tracing import span
+
+class LatencyStats:
+    """Record per-stage wall times and summarise them."""
+    
+    def __init__(self, window=1000):
+        """
+        Initialize the statistics.
+        
+        Args:
+            window (int): Number of recent samples per stage kept for percentiles
+        """
+        self.window = window
+        self._lock = threading.Lock()
+        self._stages = {}
+    
+    @contextmanager
+    def time(self, stage):
+        """
+        Time the enclosed block and record it under a stage name.
+        
+        The block is also traced (and profiled, if enabled) as a span.
+        
+        Args:
+            stage (str): Name of the stage
+        """
+        start = time.perf_counter()
+        try:
+            with span(stage, profile=True):
+                yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+    
+    def record(self, stage, seconds):
+        """
+        Record one sample.
+        
+        Args:
+            stage (str): Name of the stage
+            seconds (float): Wall time in seconds
+        """
+        with self._lock:
+            stats = self._stages.get(stage)
+            if stats is None:
+                stats = {'count': 0, 'total': 0.0, 'max': 0.0,
+                         'recent': deque(maxlen=self.window)}
+                self._stages[stage] = stats
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['max'] = max(stats['max'], seconds)
+            stats['recent'].append(seconds)
+    
+    def summary(self):
+        """
+        Summarise all stages.
+        
+        Returns:
+            dict: Stage name -> count, mean, p50, p95 and max in milliseconds
+        """
+        with self._lock:
+            summary = {}
+            for stage, stats in self._stages.items():
+                recent = sorted(stats['recent'])
+                summary[stage] = {
+                    'count': stats['count'],
+                    'mean_ms': 1000 * stats['total'] / stats['count'],
+                    'p50_ms': 1000 * recent[len(recent) // 2],
+                    'p95_ms': 1000 * recent[min(len(recent) - 1, int(len(recent) * 0.95))],
+                    'max_ms': 1000 * stats['max'],
+                }
+            return summary
@@ -0,0 +1,256 @@
+"""
+Lightweight span tracing with Chrome trace export and per-stage profiling
+"""
+
+import cProfile
+import functools
+import inspect
+import json
+import numbers
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+
+# The active tracer; None while tracing is disabled
+_tracer = None
+
+_NULL_SPAN = nullcontext()
+
+class Tracer:
+    """
+    Record spans (wall time, call counts and item counts) for one run.
+    
+    Spans are stored as Chrome trace "complete" events, so a run can be
+    inspected in chrome://tracing or Perfetto. Spans opened with
+    profile=True are also run under cProfile when a profile directory is
+    set, and their stats are written there as <span>.<n>.prof files.
+    """
+    
+    def __init__(self, profile_dir=None):
+        """
+        Initialize the tracer.
+        
+        Args:
+            profile_dir (str or Path): Directory for cProfile dumps of
+                profiled spans, or None to not profile
+        """
+        self.profile_dir = Path(profile_dir) if profile_dir is not None else None
+        if self.profile_dir is not None:
+            self.profile_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.events = []
+        self.pid = os.getpid()
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+        self._profiling = False
+        self._profile_counts = {}
+    
+    @contextmanager
+    def span(self, name, items=None, profile=False):
+        """
+        Record the enclosed block as a span.
+        
+        Args:
+            name (str): Span name
+            items (int): Number of items the span processed, or None
+            profile (bool): Run the block under cProfile if a profile
+                directory is set (nested profiled spans share the outer profile)
+        """
+        profiler = None
+        if profile and self.profile_dir is not None:
+            with self._lock:
+                if not self._profiling:
+                    self._profiling = True
+                    profiler = cProfile.Profile()
+        
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if profiler is not None:
+                profiler.disable()
+                self._dump_profile(name, profiler)
+            self.add(name, start, end, items)
+    
+    def add(self, name, start, end, items=None):
+        """
+        Record a finished span.
+        
+        Args:
+            name (str): Span name
+            start (float): time.perf_counter() at the start
+            end (float): time.perf_counter() at the end
+            items (int): Number of items processed, or None
+        """
+        event = {
+            'name': name,
+            'ph': 'X',
+            'ts': (start - self._origin) * 1e6,
+            'dur': (end - start) * 1e6,
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+        }
+        if items is not None:
+            event['args'] = {'items': items}
+        with self._lock:
+            self.events.append(event)
+    
+    def summary(self):
+        """
+        Aggregate spans by name.
+        
+        Returns:
+            dict: Span name -> count, total/mean/max milliseconds and items,
+                in order of first occurrence
+        """
+        summary = {}
+        with self._lock:
+            events = list(self.events)
+        for event in sorted(events, key=lambda event: event['ts']):
+            stats = summary.setdefault(event['name'], {
+                'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'items': 0
+            })
+            duration_ms = event['dur'] / 1000
+            stats['count'] += 1
+            stats['total_ms'] += duration_ms
+            stats['max_ms'] = max(stats['max_ms'], duration_ms)
+            stats['items'] += event.get('args', {}).get('items', 0)
+        for stats in summary.values():
+            stats['mean_ms'] = stats['total_ms'] / stats['count']
+        return summary
+    
+    def export_chrome_trace(self, path):
+        """
+        Write all spans as Chrome trace-event JSON.
+        
+        Args:
+            path (str or Path): Destination file
+        """
+        with self._lock:
+            events = list(self.events)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    
+    def _dump_profile(self, name, profiler):
+        """
+        Write a profiled span's stats and allow the next profiled span.
+        
+        Args:
+            name (str): Span name
+            profiler (cProfile.Profile): Finished profiler
+        """
+        slug = re.sub(r'[^A-Za-z0-9_.-]+', '_', name)
+        with self._lock:
+            count = self._profile_counts.get(slug, 0)
+            self._profile_counts[slug] = count + 1
+        try:
+            profiler.dump_stats(self.profile_dir / f"{slug}.{count}.prof")
+        finally:
+            with self._lock:
+                self._profiling = False
+
+
+def enable(profile_dir=None):
+    """
+    Start tracing with a new tracer.
+    
+    Args:
+        profile_dir (str or Path): Directory for per-stage cProfile dumps, or None
+    
+    Returns:
+        Tracer: The active tracer
+    """
+    global _tracer
+    _tracer = Tracer(profile_dir)
+    return _tracer
+
+def disable():
+    """
+    Stop tracing.
+    
+    Returns:
+        Tracer: The tracer that was active, or None
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+def get_tracer():
+    """Get the active tracer, or None if tracing is disabled."""
+    return _tracer
+
+def span(name, items=None, profile=False):
+    """
+    Record the enclosed block as a span of the active tracer.
+    
+    When tracing is disabled this returns a shared no-op context manager.
+    
+    Args:
+        name (str): Span name
+        items (int): Number of items the span processed, or None
+        profile (bool): Also profile the block (see Tracer.span)
+    
+    Returns:
+        Context manager
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _NULL_SPAN
+    return tracer.span(name, items, profile)
+
+def traced(name, items=None):
+    """
+    Decorate a function so that each call is recorded as a span.
+    
+    When tracing is disabled the only cost is one global lookup per call.
+    
+    Args:
+        name (str): Span name
+        items (str): Name of the argument giving the number of items processed:
+            its length, or its value if it is a number (None to not count
+            items; arguments that are neither count as None)
+    
+    Returns:
+        callable: Decorator
+    """
+    def decorator(func):
+        if items is not None:
+            parameters = inspect.signature(func).parameters
+            position = list(parameters).index(items)
+            default = parameters[items].default
+        
+        def count_items(args, kwargs):
+            if items is None:
+                return None
+            if items in kwargs:
+                value = kwargs[items]
+            elif position < len(args):
+                value = args[position]
+            else:
+                value = default
+            # Counting must never turn a traced call into a failing one
+            if isinstance(value, numbers.Number):
+                return int(value)
+            try:
+                return len(value)
+            except TypeError:
+                return None
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.add(name, start, time.perf_counter(), count_items(args, kwargs))
+        return wrapper
+    return decorator